@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from snakebacon import ProxyRecord
+
+from .common import synthetic_agedepthmodel
+
+
+def _agedepth_loop(model, d):
+    """Per-depth, per-segment age-depth loop that AgeDepthModel.agedepth used before v0.0.7"""
+    x = model.mcmcfit.sediment_rate
+    deltac = model.thick
+    c0 = min(model.depth)
+    out = model.mcmcfit.headage.astype(float)
+    i = int(np.floor((d - c0) / deltac))
+    for j in range(i):
+        out += x[j] * deltac
+    ci = c0 + i * deltac
+    try:
+        next_x = x[i]
+    except IndexError:
+        next_x = x[i - 1]
+    out += next_x * (d - ci)
+    return out
+
+
+class AgeDepth:
+    params = ([20, 100, 200], [1000, 10000])
+    param_names = ['k', 'n_iter']
+
+    def setup(self, k, n_iter):
+        self.model = synthetic_agedepthmodel(k, n_iter)
+
+    def time_agedepth(self, k, n_iter):
+        self.model.agedepth(self.model.depth)
+
+    def time_agedepth_loop(self, k, n_iter):
+        np.array([_agedepth_loop(self.model, d) for d in self.model.depth])
+
+    def peakmem_agedepth(self, k, n_iter):
+        self.model.agedepth(self.model.depth)
+
+
+class Date:
+    """Dating a proxy record, scaled by number of proxy depths"""
+    params = ([1000, 100000], ['median', 'ensemble'])
+    param_names = ['n_depths', 'how']
+    timeout = 300
+
+    def setup(self, n_depths, how):
+        self.model = synthetic_agedepthmodel(20, 3000)
+        depth = np.linspace(self.model.depth.min(), self.model.depth.max(), n_depths)
+        self.proxy = ProxyRecord(pd.DataFrame({'depth': depth, 'a': np.arange(n_depths)}))
+
+    def time_date(self, n_depths, how):
+        self.model.date(self.proxy, how=how, n=500)
+
+    def peakmem_date(self, n_depths, how):
+        self.model.date(self.proxy, how=how, n=500)
@@ -0,0 +1,17 @@
+from snakebacon.mcmcbackends.bacon import calibrate_dates, fetch_calibcurve
+
+from .common import synthetic_chron
+
+
+class CalibrateDates:
+    """Calibrating a core's dates, scaled by number of dates"""
+    params = ([40, 400, 4000], [False, True])
+    param_names = ['n_dates', 'normal_distr']
+    timeout = 300
+
+    def setup(self, n_dates, normal_distr):
+        self.core = synthetic_chron(n_dates)
+        self.cc = [fetch_calibcurve('IntCal13')]
+
+    def time_calibrate_dates(self, n_dates, normal_distr):
+        calibrate_dates(self.core, calib_curve=self.cc, d_r=[0], d_std=[0], normal_distr=normal_distr)
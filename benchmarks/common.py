@@ -0,0 +1,60 @@
+"""Shared helpers for building synthetic snakebacon fits to benchmark against."""
+
+from os import path
+
+import numpy as np
+
+from snakebacon import read_chron
+from snakebacon.agedepth import AgeDepthModel
+from snakebacon.mcmc import McmcResults
+from snakebacon.records import ChronRecord
+
+
+here = path.abspath(path.dirname(__file__))
+msb2k_path = path.join(here, '..', 'snakebacon', 'tests', 'MSB2K.csv')
+
+mcmc_kws = dict(depth_min=1.5, depth_max=99.5, cc=[1],
+                cc1='IntCal13', cc2='Marine13', cc3='SHCal13', cc4='ConstCal',
+                d_r=[0], d_std=[0], t_a=[3], t_b=[4], k=20,
+                minyr=-1000, maxyr=1e6, th01=4147, th02=4145,
+                acc_mean=20, acc_shape=1.5, mem_strength=4, mem_mean=0.7)
+
+
+def synthetic_chron(n_dates, seed=123):
+    """ChronRecord with n_dates dates spread down the MSB2K core
+
+    Ages are interpolated from the MSB2K dates, with noise on the scale of their errors, so cores of any size
+    look like MSB2K to the MCMC.
+    """
+    rng = np.random.RandomState(seed)
+    msb2k = read_chron(msb2k_path)
+    depth = np.linspace(msb2k.depth.min(), msb2k.depth.max(), n_dates)
+    error = rng.choice(msb2k.error, size=n_dates)
+    age = np.round(np.interp(depth, msb2k.depth, msb2k.age) + rng.normal(0, 1, size=n_dates) * error)
+    labid = np.array(['SYN-{0}'.format(i) for i in range(n_dates)])
+    return ChronRecord(age=age, error=error, depth=depth, labid=labid)
+
+
+def synthetic_mcmcresults(k, n_iter, depth_min=1.5, depth_max=99.5, seed=123):
+    """McmcResults filled with random draws from the MSB2K priors, without running MCMC"""
+    rng = np.random.RandomState(seed)
+    out = McmcResults.__new__(McmcResults)
+    out.depth_segments = np.linspace(depth_min, depth_max, k)
+    out.headage = rng.normal(4550, 50, size=n_iter)
+    out.sediment_rate = rng.gamma(mcmc_kws['acc_shape'], mcmc_kws['acc_mean'] / mcmc_kws['acc_shape'],
+                                  size=(k, n_iter))
+    out.sediment_memory = rng.beta(2.8, 1.2, size=n_iter)
+    out.objective = rng.normal(220, 5, size=n_iter)
+    return out
+
+
+def synthetic_agedepthmodel(k, n_iter):
+    """AgeDepthModel for MSB2K with a synthetic MCMC fit of k segments and n_iter iterations"""
+    kws = dict(mcmc_kws, k=k)
+    model = AgeDepthModel(read_chron(msb2k_path), mcmc_kws=kws, hold=True)
+    model._mcmcfit = synthetic_mcmcresults(k, n_iter, kws['depth_min'], kws['depth_max'])
+    dmin = kws['depth_min']
+    dmax = kws['depth_max']
+    model._thick = (dmax - dmin) / k
+    model._depth = np.arange(dmin, dmax + 0.001)
+    return model
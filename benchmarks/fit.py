@@ -0,0 +1,19 @@
+from snakebacon.agedepth import AgeDepthModel
+
+from .common import mcmc_kws, synthetic_chron
+
+
+class Fit:
+    """Full MCMC fit, scaled by number of dates, segments and sample size"""
+    params = ([40, 160], [20, 60], [200, 1000])
+    param_names = ['n_dates', 'k', 'ssize']
+    timeout = 600
+    number = 1
+    repeat = 1
+
+    def setup(self, n_dates, k, ssize):
+        self.core = synthetic_chron(n_dates)
+        self.mcmc_kws = dict(mcmc_kws, k=k, ssize=ssize)
+
+    def time_fit(self, n_dates, k, ssize):
+        AgeDepthModel(self.core, mcmc_kws=self.mcmc_kws, burnin=0)
@@ -0,0 +1,9 @@
+class Import:
+    """Importing snakebacon in a fresh interpreter"""
+    timeout = 120
+
+    def timeraw_import_snakebacon(self):
+        return 'import snakebacon'
+
+    def timeraw_import_run_baconmcmc(self):
+        return 'from snakebacon.mcmcbackends.bacon.baconwrap import run_baconmcmc'
@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from snakebacon import mcmcbackends, read_chron
+from snakebacon.diagnostics import ess
+from snakebacon.mcmc import McmcSetup
+from snakebacon.mcmcbackends.bacon import baconwrap
+from snakebacon.mcmcbackends.bacon.Curves import here as curvespath
+
+from .common import mcmc_kws, msb2k_path, synthetic_chron
+
+
+class ProposalRate:
+    """twalk proposals per second on MSB2K-sized cores, through a built-in and a GenericCal curve"""
+    params = (['IntCal13', 'GenericCal'], [40])
+    param_names = ['curve', 'n_dates']
+    unit = 'proposals/s'
+    ssize = 200
+    number = 1
+    repeat = 1
+
+    def setup(self, curve, n_dates):
+        c = synthetic_chron(n_dates)
+        lines = baconwrap._baconin_str(core_labid=c.labid, core_age=c.age, core_error=c.error, core_depth=c.depth,
+                                       **mcmc_kws)
+        if curve == 'GenericCal':
+            generic = 'Cal 1 : GenericCal, {0};'.format(os.path.join(curvespath, '3Col_intcal13.14C'))
+            lines = [l.replace('Cal 1 : IntCal13, 0;', generic) for l in lines]
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'in.bacon')
+        with open(self.path, 'w') as fl:
+            fl.writelines(lines)
+
+    def teardown(self, curve, n_dates):
+        shutil.rmtree(self.tmpdir)
+
+    def track_proposals_per_second(self, curve, n_dates):
+        # Number of twalk iterations bacon runs for a given ssize and k, see bacon.cpp.
+        n_proposals = 20 * (mcmc_kws['k'] + 2) * 5 * (self.ssize + 200)
+        best = float('inf')
+        for _ in range(3):
+            t0 = time.perf_counter()
+            baconwrap._baconrun_blocks(self.path, self.ssize, dim=mcmc_kws['k'] + 2)
+            best = min(best, time.perf_counter() - t0)
+        return n_proposals / best
+
+
+class EffectiveSamples:
+    """Effective samples per CPU second of the twalk and the NumPy ensemble sampler, on MSB2K
+
+    The effective sample size is the smallest over theta, w and the accumulation rates. Ensemble output is split
+    into one chain per walker.
+    """
+    params = ['Bacon', 'BaconEnsemble']
+    param_names = ['backend']
+    unit = 'ESS/cpu s'
+    ssize = 2000
+    number = 1
+    repeat = 1
+    timeout = 600
+
+    def setup(self, backend):
+        self.chron = read_chron(msb2k_path)
+
+    def track_ess_per_cpu_second(self, backend):
+        setup = McmcSetup(self.chron, mcmcbackend=getattr(mcmcbackends, backend), ssize=self.ssize, **mcmc_kws)
+        t0 = time.process_time()
+        out = setup.run(seed=123)
+        cpu = time.process_time() - t0
+        draws = np.column_stack([out.headage, out.sediment_memory, out.sediment_rate.T])
+        if backend == 'BaconEnsemble':
+            n_walkers = 4 * (mcmc_kws['k'] + 2)
+            n = len(draws) // n_walkers * n_walkers
+            chains = draws[:n].reshape(-1, n_walkers, draws.shape[1]).swapaxes(0, 1)
+        else:
+            chains = draws[np.newaxis, 200:]
+        return np.min(ess(chains)) / cpu
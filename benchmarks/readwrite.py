@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from snakebacon import read_14c, read_proxy
+from snakebacon.mcmcbackends.bacon import baconwrap
+from snakebacon.mcmcbackends.bacon.Curves import here as curvespath
+
+from .common import mcmc_kws, synthetic_chron, synthetic_mcmcresults
+
+
+class ReadBaconout:
+    """Reading twalk output files, scaled by segments and sample size"""
+    params = ([20, 100], [2000, 20000])
+    param_names = ['k', 'ssize']
+
+    def setup(self, k, ssize):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'out.bacon')
+        fit = synthetic_mcmcresults(k, ssize)
+        values = np.column_stack([fit.headage, fit.sediment_rate.T, fit.sediment_memory, fit.objective])
+        np.savetxt(self.path, values, fmt='%13.6g', delimiter='\t')
+
+    def teardown(self, k, ssize):
+        shutil.rmtree(self.tmpdir)
+
+    def time_read_baconout(self, k, ssize):
+        baconwrap.read_baconout(self.path)
+
+
+class BaconinStr:
+    """Writing the .bacon input, scaled by number of dates"""
+    params = [40, 400, 4000]
+    param_names = ['n_dates']
+
+    def setup(self, n_dates):
+        c = synthetic_chron(n_dates)
+        self.kws = dict(mcmc_kws, core_labid=c.labid, core_age=c.age, core_error=c.error, core_depth=c.depth)
+
+    def time_baconin_str(self, n_dates):
+        baconwrap._baconin_str(**self.kws)
+
+
+class Read14c:
+    """Parsing the shipped calibration curve text files"""
+    params = ['intcal13.14C', 'marine13.14C', 'shcal13.14C']
+    param_names = ['curve']
+
+    def time_read_14c(self, curve):
+        read_14c(os.path.join(curvespath, curve))
+
+
+class ReadProxy:
+    """Reading a proxy table, scaled by rows, from comma-separated text and NumPy archives"""
+    params = ([10000, 1000000], ['csv', 'npz'])
+    param_names = ['n_rows', 'fmt']
+    timeout = 300
+
+    def setup(self, n_rows, fmt):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'proxy.' + fmt)
+        rng = np.random.RandomState(123)
+        df = pd.DataFrame({'depth': np.linspace(1.5, 99.5, n_rows), 'd18O': rng.randn(n_rows),
+                           'mgca': rng.rand(n_rows)})
+        if fmt == 'csv':
+            df.to_csv(self.path, index=False, sep=',', float_format='%.6f')
+        else:
+            np.savez(self.path, **{c: df[c].values for c in df.columns})
+
+    def teardown(self, n_rows, fmt):
+        shutil.rmtree(self.tmpdir)
+
+    def time_read_proxy(self, n_rows, fmt):
+        read_proxy(self.path)
+
+    def time_read_proxy_chunks(self, n_rows, fmt):
+        for proxy in read_proxy(self.path, chunksize=100000):
+            pass
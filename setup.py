@@ -43,7 +43,7 @@ bacon = Extension("snakebacon.mcmcbackends.bacon.baconwrap",
                   language="c++",
                   libraries=["gsl", "openblas"],
                   # Below for clang, need -fopenmp if using gcc
-                  extra_compile_args=["-xc++", "-lstdc++", "-shared-libgcc", "-O2"],
+                  extra_compile_args=["-xc++", "-std=c++11", "-lstdc++", "-shared-libgcc", "-O2"],
                   )
 
 setup_kwargs = dict(name='snakebacon',
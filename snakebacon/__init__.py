@@ -1,4 +1,6 @@
 from .agedepth import AgeDepthModel
+from .batch import FitResult, fit_many
+from .cache import FitCache
 from .records import CalibCurve, ChronRecord, ProxyRecord, DatedProxyRecord
 from .records import read_14c, read_chron, read_proxy
 from .utils import suggest_accumulation_rate
@@ -1,26 +1,73 @@
+import functools
 import logging as logging
 
-import scipy
-import matplotlib.pylab as plt
-from matplotlib.collections import PatchCollection
-from matplotlib.patches import Polygon
 import numpy as np
 
-from .mcmc import McmcSetup
-from .records import DatedProxyRecord
+import snakebacon.mcmcbackends
+from snakebacon import profiling
+from .cache import _read_arraydir, _write_arraydir
+from .mcmc import McmcSetup, _dump_results, _load_results, _saved_kws
+from .records import ChronRecord, DatedProxyRecord
+from .utils import binned_kde
 
 
 log = logging.getLogger(__name__)
 
+# Version of the directory layout written by AgeDepthModel.save().
+_SAVE_FORMAT = 1
+
 
 class AgeDepthModel:
-    def __init__(self, coredates, *, mcmc_kws, hold=False, burnin=200):
+    def __init__(self, coredates, *, mcmc_kws, hold=False, burnin=200, keep_ensemble=True,
+                 summary_q=(2.5, 97.5), depth_grid=1.0, cache=None):
+        """Age-depth model of a sediment core
+
+        Parameters
+        ----------
+        coredates : ChronRecord-like
+            Dates down the core.
+        mcmc_kws : dict
+            MCMC parameters.
+        hold : bool, optional
+            If True, do not fit() the model yet.
+        burnin : int, optional
+            Number of earliest MCMC ensemble members to drop.
+        keep_ensemble : bool, optional
+            If True (default), the full age ensemble is kept once computed. If False, only the median and percentiles
+            of age at each depth are kept, computed a chunk of depths at a time. The full ensemble is then computed
+            again whenever `age_ensemble` is used.
+        summary_q : sequence of floats, optional
+            Percentiles (0 - 100) of age computed along with the median if `keep_ensemble` is False. Other
+            percentiles are computed from the MCMC fit when asked for.
+        depth_grid : scalar or 1d array, optional
+            Depths for `age_ensemble`, `age_median()` and `age_percentile()`. A scalar is the spacing of a grid
+            from the top to the bottom of the core segments. Default is 1.
+        cache : FitCache or str, optional
+            Cache, or cache directory, of MCMC fits for fit(). See `McmcSetup.run()`.
+
+        Attributes
+        ----------
+        timings : snakebacon.profiling.Timings
+            Timings of fit() stages, including the MCMC stages, and of computing ages on the depth grid.
+
+        Notes
+        -----
+        fit() only runs the MCMC. Ages on the depth grid are computed when first used.
+        """
         self.burnin = int(burnin)
+        self.keep_ensemble = bool(keep_ensemble)
+        self.summary_q = tuple(summary_q)
+        self.depth_grid = depth_grid
+        self.cache = cache
+        self.timings = profiling.Timings()
         self.mcmcsetup = McmcSetup(coredates, **mcmc_kws)
         self._mcmcfit = None
         self._thick = None
         self._depth = None
         self._age_ensemble = None
+        self._age_summary = {}
+        self._age_histograms = {}
+        self._knot_ages = None
         if not hold:
             self.fit()
 
@@ -47,31 +94,183 @@ class AgeDepthModel:
 
     @property
     def age_ensemble(self):
+        """2d array (depth, iteration) of ages at each depth in `depth`
+
+        Computed on first use. If the model does not keep its ensemble, it is computed again on each use.
+        """
         if self._age_ensemble is not None:
             return self._age_ensemble
-        else:
-            raise NeedFitError('AgeDepthModel instance needs to be fit() first')
+        with profiling.record(self.timings), profiling.stage('age_ensemble'):
+            age_ensemble = self.agedepth(d=self.depth)
+        if self.keep_ensemble:
+            self._age_ensemble = age_ensemble
+        return age_ensemble
+
+    def age_window(self, depth_min=None, depth_max=None):
+        """Get the age ensemble for depths in `depth` between depth_min and depth_max
+
+        Only ages in the window are computed, unless the full ensemble is already kept.
+
+        Parameters
+        ----------
+        depth_min : scalar, optional
+            Shallowest depth in the window. Default is the top of `depth`.
+        depth_max : scalar, optional
+            Deepest depth in the window. Default is the bottom of `depth`.
+
+        Returns
+        -------
+        depth : ndarray
+            Depths in the window.
+        ages : 2d array
+            Ages (depth, iteration) at each depth in the window.
+        """
+        depth = self.depth
+        mask = np.ones(len(depth), dtype=bool)
+        if depth_min is not None:
+            mask &= depth >= depth_min
+        if depth_max is not None:
+            mask &= depth <= depth_max
+        if self._age_ensemble is not None:
+            return depth[mask], self._age_ensemble[mask]
+        return depth[mask], self.agedepth(d=depth[mask])
 
     def __repr__(self):
         return '%s(coredates=%r, mcmc_kws=%r, burnin=%r)' % (type(self).__name__, self.mcmcsetup.coredates, self.mcmcsetup.mcmc_kws, self.burnin)
 
     def age_median(self):
-        return np.median(self.age_ensemble, axis=1)
+        """Get median age at each depth in `depth`"""
+        if 'median' not in self._age_summary:
+            self._summarize_ages({'median': _median})
+        return self._age_summary['median']
 
     def age_percentile(self, p):
-        return np.percentile(self.age_ensemble, q=p, axis=1)
+        """Get percentiles p (0 - 100) of age at each depth in `depth`
+
+        Results are kept, so repeated calls do not sort the ensemble again.
+        """
+        key = _percentile_key(p)
+        if key not in self._age_summary:
+            self._summarize_ages({key: functools.partial(_percentile, q=p)})
+        return self._age_summary[key]
+
+    def _summarize_missing(self, funcs):
+        """Summarize ages with those of funcs whose keys are not in the age summary yet, in a single pass"""
+        funcs = {key: f for key, f in funcs.items() if key not in self._age_summary}
+        if funcs:
+            self._summarize_ages(funcs)
+
+    def _summarize_ages(self, funcs):
+        """Apply funcs to the age ensemble along iterations, and keep the results in the age summary
+
+        funcs maps summary keys to functions of a 2d array (depth, iteration). If the model does not keep its
+        ensemble, ages are computed a chunk of depths at a time, and funcs are applied to each chunk. The median
+        and `summary_q` percentiles are computed in the same pass, if they are not kept yet.
+        """
+        if self._age_ensemble is not None or self.keep_ensemble:
+            for key, f in funcs.items():
+                self._age_summary[key] = f(self.age_ensemble)
+            return
+        funcs = dict(funcs)
+        funcs.setdefault('median', _median)
+        for p in self.summary_q:
+            funcs.setdefault(_percentile_key(p), functools.partial(_percentile, q=p))
+        funcs = {key: f for key, f in funcs.items() if key not in self._age_summary}
+        depth = self.depth
+        chunksize = _depth_chunksize(self.mcmcfit.n_members())
+        out = {key: [] for key in funcs}
+        with profiling.record(self.timings), profiling.stage('age_summary'):
+            for start in range(0, len(depth), chunksize):
+                ages = self.agedepth(depth[start:start + chunksize])
+                for key, f in funcs.items():
+                    out[key].append(f(ages))
+        for key, v in out.items():
+            self._age_summary[key] = np.concatenate(v, axis=-1)
 
     def fit(self):
         """Fit MCMC AgeDepthModel"""
-        self._mcmcfit = self.mcmcsetup.run()
-        self._mcmcfit.burnin(self.burnin)
+        with profiling.record(self.timings):
+            with profiling.stage('mcmc'):
+                self._mcmcfit = self.mcmcsetup.run(cache=self.cache)
+            with profiling.stage('burnin'):
+                self._mcmcfit.burnin(self.burnin)
+            self._set_depth()
+
+    def _set_depth(self):
+        """Set the depth grid from the MCMC fit, and drop ages computed on the old grid"""
         dmin = min(self._mcmcfit.depth_segments)
         dmax = max(self._mcmcfit.depth_segments)
         self._thick = (dmax - dmin) / len(self.mcmcfit.depth_segments)
-        self._depth = np.arange(dmin, dmax + 0.001)
-        self._age_ensemble = np.array([self.agedepth(d=dx) for dx in self.depth])
+        if np.ndim(self.depth_grid) == 0:
+            self._depth = np.arange(dmin, dmax + 0.001, self.depth_grid)
+        else:
+            self._depth = np.asarray(self.depth_grid, dtype=float)
+        self._age_ensemble = None
+        self._age_summary = {}
+        self._age_histograms = {}
+        self._knot_ages = None
+
+    def save(self, path, ensemble=False):
+        """Save the fitted model to a new directory
+
+        The directory holds 'meta.json', with the core dates, MCMC parameters (including the seed) and model
+        options, and one .npy file for each array of the MCMC fit. The directory is written under a temporary name
+        and then renamed, so an interrupted save leaves no partial model at path.
+
+        Parameters
+        ----------
+        path : str
+            Directory to save to. Must not exist yet.
+        ensemble : bool, optional
+            If True, also save `age_ensemble`, computing it if needed.
+        """
+        arrays, mcmcfit_meta = _dump_results(self.mcmcfit)
+        arrays['depth'] = self.depth
+        if ensemble:
+            arrays['age_ensemble'] = self.age_ensemble
+        coredates = self.mcmcsetup.coredates
+        meta = {'format': _SAVE_FORMAT,
+                'coredates': {'labid': coredates.labid, 'age': coredates.age, 'error': coredates.error,
+                              'depth': coredates.depth},
+                'mcmc_kws': _saved_kws(self.mcmcsetup.mcmc_kws),
+                'mcmcbackend': self.mcmcsetup.mcmcbackend.__name__,
+                'burnin': self.burnin,
+                'keep_ensemble': self.keep_ensemble,
+                'summary_q': self.summary_q,
+                'depth_grid': self.depth_grid,
+                'mcmcfit': mcmcfit_meta}
+        _write_arraydir(path, arrays, meta)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a model written by `save()`, without running the MCMC again
 
-    def date(self, proxy, how='median', n=500):
+        Parameters
+        ----------
+        path : str
+            Directory the model was saved to.
+        mmap_mode : str or None, optional
+            Memory-map mode for the arrays, passed to `numpy.load()`. Default maps them read-only, so only the pages
+            that are used are read from disk. If None, arrays are read into memory.
+
+        Returns
+        -------
+        AgeDepthModel
+        """
+        arrays, meta = _read_arraydir(path, mmap_mode=mmap_mode)
+        if meta.get('format') != _SAVE_FORMAT:
+            raise ValueError('{0} is not a saved AgeDepthModel, or has an unknown format'.format(path))
+
+        model = cls(ChronRecord(**meta['coredates']), mcmc_kws=meta['mcmc_kws'], hold=True, burnin=meta['burnin'],
+                    keep_ensemble=meta['keep_ensemble'], summary_q=meta['summary_q'], depth_grid=meta['depth_grid'])
+        model.mcmcsetup.mcmcbackend = getattr(snakebacon.mcmcbackends, meta['mcmcbackend'])
+        model._mcmcfit = _load_results(model.mcmcsetup, arrays, meta['mcmcfit'])
+        model._set_depth()
+        model._depth = arrays['depth']
+        model._age_ensemble = arrays.get('age_ensemble')
+        return model
+
+    def date(self, proxy, how='median', n=500, q=(2.5, 50, 97.5), chunksize=None):
         """Date a proxy record
 
         Parameters
@@ -79,34 +278,112 @@ class AgeDepthModel:
         proxy : ProxyRecord
         how : str
             How to perform the dating. 'median' returns the average of the MCMC ensemble. 'ensemble' returns a 'n'
-            randomly selected members of the MCMC ensemble. Default is 'median'.
+            randomly selected members of the MCMC ensemble. 'quantiles' returns the 'q' percentiles of the MCMC
+            ensemble. Default is 'median'.
         n : int
             If 'how' is 'ensemble', the function will randomly select 'n' MCMC ensemble members, with replacement.
+        q : sequence of floats
+            If 'how' is 'quantiles', percentiles (0 - 100) of the MCMC ensemble to return for each depth.
+        chunksize : int, optional
+            Number of proxy depths to date at once. Default keeps each chunk of the age ensemble around 32 MB.
 
         Returns
         -------
         DatedProxyRecord
         """
-        assert how in ['median', 'ensemble']
+        assert how in ['median', 'ensemble', 'quantiles']
         ens_members = self.mcmcfit.n_members()
+        select_idx = None
         if how == 'ensemble':
             select_idx = np.random.choice(range(ens_members), size=n, replace=True)
-        out = []
-        for d in proxy.data.depth.values:
-            age = self.agedepth(d)
-            if how == 'median':
-                age = np.median(age)
-            elif how == 'ensemble':
-                age = age[select_idx]
-            out.append(age)
+        depth = np.asarray(proxy.data.depth.values, dtype=float)
+
+        if how == 'median':
+            out = np.empty(len(depth))
+        elif how == 'ensemble':
+            out = np.empty((len(depth), n))
+        elif how == 'quantiles':
+            q = np.atleast_1d(np.asarray(q, dtype=float))
+            out = np.empty((len(depth), len(q)))
+
+        if chunksize is None:
+            chunksize = _depth_chunksize(ens_members if select_idx is None else len(select_idx))
+        with profiling.record(self.timings), profiling.stage('date'):
+            for start in range(0, len(depth), chunksize):
+                chunk = slice(start, start + chunksize)
+                ages = self.agedepth(depth[chunk], members=select_idx)
+                if how == 'median':
+                    out[chunk] = np.median(ages, axis=1)
+                elif how == 'ensemble':
+                    out[chunk] = ages
+                elif how == 'quantiles':
+                    out[chunk] = np.percentile(ages, q=q, axis=1).T
+
+        if how == 'quantiles':
+            return DatedProxyRecord(proxy.data.copy(), out, quantiles=q)
         return DatedProxyRecord(proxy.data.copy(), out)
 
+    def age_histogram(self, agebins=50, age_range=None):
+        """Get histogram of ages at each depth in `depth`
+
+        Ages are binned a chunk of depths at a time, without copying the age ensemble. Results are kept, so repeated
+        calls do not bin the ensemble again.
+
+        Parameters
+        ----------
+        agebins : int, optional
+            Number of age bins.
+        age_range : (float, float), optional
+            Lower and upper edge of the age bins. Default is the range of the age ensemble. Ages outside the range
+            are not counted.
+
+        Returns
+        -------
+        counts : 2d array
+            Number of ensemble members (depth, age bin) in each age bin at each depth in `depth`.
+        age_edges : ndarray
+            Edges of the age bins, agebins + 1 values.
+        """
+        agebins = int(agebins)
+        if age_range is None:
+            self._summarize_missing({'min': _min, 'max': _max})
+            age_range = (np.min(self._age_summary['min']), np.max(self._age_summary['max']))
+        key = agebins, float(age_range[0]), float(age_range[1])
+        if key in self._age_histograms:
+            return self._age_histograms[key]
+
+        age_edges = np.linspace(key[1], key[2], agebins + 1)
+        depth = self.depth
+        counts = np.empty((len(depth), agebins), dtype=np.intp)
+        chunksize = _depth_chunksize(self.mcmcfit.n_members())
+        age_ensemble = None
+        if self._age_ensemble is not None or self.keep_ensemble:
+            age_ensemble = self.age_ensemble
+        with profiling.record(self.timings), profiling.stage('age_histogram'):
+            for start in range(0, len(depth), chunksize):
+                chunk = slice(start, start + chunksize)
+                if age_ensemble is not None:
+                    ages = age_ensemble[chunk]
+                else:
+                    ages = self.agedepth(depth[chunk])
+                counts[chunk] = _bin_ages(ages, age_edges)
+        self._age_histograms[key] = counts, age_edges
+        return counts, age_edges
+
     def plot(self, agebins=50, p=(2.5, 97.5), ax=None):
-        """Age-depth plot"""
+        """Age-depth plot
+
+        The age density is drawn from `age_histogram()`, and the median and percentiles p from `age_median()` and
+        `age_percentile()`, so all are kept for reuse.
+        """
         if ax is None:
+            import matplotlib.pyplot as plt
             ax = plt.gca()
-        ax.hist2d(np.repeat(self.depth, self.age_ensemble.shape[1]), self.age_ensemble.flatten(),
-                   (len(self.depth), agebins), cmin=1)
+        self._summarize_missing({'median': _median, 'min': _min, 'max': _max,
+                                 _percentile_key(p[0]): functools.partial(_percentile, q=p[0]),
+                                 _percentile_key(p[1]): functools.partial(_percentile, q=p[1])})
+        counts, age_edges = self.age_histogram(agebins)
+        ax.pcolormesh(_bin_edges(self.depth), age_edges, np.ma.masked_less(counts.T, 1))
         ax.step(self.depth, self.age_median(), where='mid', color='red')
         ax.step(self.depth, self.age_percentile(p[0]), where='mid', color='red', linestyle=':')
         ax.step(self.depth, self.age_percentile(p[1]), where='mid', color='red', linestyle=':')
@@ -115,45 +392,63 @@ class AgeDepthModel:
         ax.grid(True)
         return ax
 
-    def agedepth(self, d):
+    def agedepth(self, d, members=None):
         """Get calendar age for a depth
 
         Parameters
         ----------
-        d : float
+        d : float or array_like
             Sediment depth (in cm).
+        members : array_like, optional
+            Indices of MCMC ensemble members (iterations) to use. Default uses all members.
 
         Returns
         -------
-        Numeric giving true age at given depth.
+        Numeric giving true age at given depth. If `d` is array_like, a 2d array (depth, iteration) of ages for each
+        depth in `d`.
         """
         # TODO(brews): Function cannot handle hiatus
         # See lines 77 - 100 of hist2.cpp
+        scalar = np.ndim(d) == 0
+        d = np.atleast_1d(np.asarray(d, dtype=float))
         x = self.mcmcfit.sediment_rate
-        theta0 = self.mcmcfit.headage  # Age abscissa (in yrs).  If array, dimension should be iterations or realizations of the sediment
         deltac = self.thick
-        c0 = min(self.depth)  # Uniform depth segment abscissa (in cm).
-        assert d > c0 or np.isclose(c0, d, atol = 1e-4)
-        out = theta0.astype(float)
-        i = int(np.floor((d - c0) / deltac))
-        for j in range(i):
-            out += x[j] * deltac
+        c0 = min(self.mcmcfit.depth_segments)  # Uniform depth segment abscissa (in cm).
+        if not np.all((d > c0) | np.isclose(c0, d, atol=1e-4)):
+            raise ValueError('depths must not be above the top of the core, at {0} cm'.format(c0))
+        knots = self._knots()
+        i = np.maximum(np.floor((d - c0) / deltac).astype(int), 0)
         ci = c0 + i * deltac
-        assert ci < d or np.isclose(ci, d, atol = 1e-4)
-        try:
-            next_x = x[i]
-        except IndexError:
-            # Extrapolating
-            next_x = x[i - 1]
-        out += next_x * (d - ci)
+        # Extrapolating past the last segment uses the last segment's rate.
+        seg = np.minimum(i, len(x) - 1)
+        if members is None:
+            out = knots[i] + x[seg] * (d - ci)[:, np.newaxis]
+        else:
+            members = np.asarray(members)
+            out = knots[np.ix_(i, members)] + x[np.ix_(seg, members)] * (d - ci)[:, np.newaxis]
+        if scalar:
+            out = out[0]
         return out
 
+    def _knots(self):
+        """Get `knot_ages()` of the MCMC fit, computed once and kept until the fit's ensemble changes"""
+        fit = self.mcmcfit
+        cached = self._knot_ages
+        # burnin() and extend() of the fit replace its arrays, so a kept result for other arrays is stale.
+        if cached is None or cached[0] is not fit.headage or cached[1] is not fit.sediment_rate:
+            knots = knot_ages(fit.headage, fit.sediment_rate, self.thick)
+            self._knot_ages = cached = (fit.headage, fit.sediment_rate, knots)
+        return cached[2]
+
     def prior_dates(self):
         return self.mcmcsetup.prior_dates()
 
     def plot_prior_dates(self, dwidth=30, ax=None):
         """Plot prior chronology dates in age-depth plot"""
+        from matplotlib.collections import PatchCollection
+        from matplotlib.patches import Polygon
         if ax is None:
+            import matplotlib.pyplot as plt
             ax = plt.gca()
         depth, probs = self.prior_dates()
         pat = []
@@ -178,19 +473,52 @@ class AgeDepthModel:
     def prior_sediment_rate(self):
         return self.mcmcsetup.prior_sediment_rate()
 
+    def posterior_density(self, param, x=None, gridsize=2 ** 12):
+        """Get the posterior density of sediment rate or sediment memory
+
+        Uses `binned_kde()`, with a bandwidth of 0.25 standard deviations.
+
+        Parameters
+        ----------
+        param : {'sediment_rate', 'sediment_memory'}
+            Sediment accumulation rate (yr/cm) over all segments, or sediment memory per cm (sediment memory to the
+            power 1 / `thick`).
+        x : array-like, optional
+            Values to evaluate the density at. Default is the values the prior density is evaluated at.
+        gridsize : int, optional
+            Number of grid points the posterior is binned onto.
+
+        Returns
+        -------
+        y : ndarray
+            Array giving the density.
+        x : ndarray
+            Array of values over which the density was evaluated.
+        """
+        if param == 'sediment_rate':
+            posterior = self.mcmcfit.sediment_rate
+            prior = self.prior_sediment_rate
+        elif param == 'sediment_memory':
+            posterior = self.mcmcfit.sediment_memory ** (1 / self.thick)
+            prior = self.prior_sediment_memory
+        else:
+            raise ValueError("param must be 'sediment_rate' or 'sediment_memory', not {0!r}".format(param))
+        if x is None:
+            _, x = prior()
+        x = np.asarray(x, dtype=float)
+        return binned_kde(posterior, x, bw_factor=0.25, gridsize=gridsize), x
+
     def plot_sediment_rate(self, ax=None):
         """Plot sediment accumulation rate prior and posterior distributions"""
         if ax is None:
+            import matplotlib.pyplot as plt
             ax = plt.gca()
 
         y_prior, x_prior = self.prior_sediment_rate()
         ax.plot(x_prior, y_prior, label='Prior')
 
-        y_posterior = self.mcmcfit.sediment_rate
-        density = scipy.stats.gaussian_kde(y_posterior.flat)
-        density.covariance_factor = lambda: 0.25
-        density._compute_covariance()
-        ax.plot(x_prior, density(x_prior), label='Posterior')
+        y_posterior, _ = self.posterior_density('sediment_rate', x_prior)
+        ax.plot(x_prior, y_posterior, label='Posterior')
 
         acc_shape = self.mcmcsetup.mcmc_kws['acc_shape']
         acc_mean = self.mcmcsetup.mcmc_kws['acc_mean']
@@ -210,16 +538,14 @@ class AgeDepthModel:
     def plot_sediment_memory(self, ax=None):
         """Plot sediment memory prior and posterior distributions"""
         if ax is None:
+            import matplotlib.pyplot as plt
             ax = plt.gca()
 
         y_prior, x_prior = self.prior_sediment_memory()
         ax.plot(x_prior, y_prior, label='Prior')
 
-        y_posterior = self.mcmcfit.sediment_memory
-        density = scipy.stats.gaussian_kde(y_posterior ** (1/self.thick))
-        density.covariance_factor = lambda: 0.25
-        density._compute_covariance()
-        ax.plot(x_prior, density(x_prior), label='Posterior')
+        y_posterior, _ = self.posterior_density('sediment_memory', x_prior)
+        ax.plot(x_prior, y_posterior, label='Posterior')
 
         mem_mean = self.mcmcsetup.mcmc_kws['mem_mean']
         mem_strength = self.mcmcsetup.mcmc_kws['mem_strength']
@@ -234,5 +560,77 @@ class AgeDepthModel:
         return ax
 
 
+def _depth_chunksize(ncols):
+    """Number of depths to compute ages for at once, keeping each chunk of the age ensemble around 32 MB"""
+    return max(1, 2 ** 22 // max(ncols, 1))
+
+
+def _median(ages):
+    return np.median(ages, axis=1)
+
+
+def _percentile(ages, q):
+    return np.percentile(ages, q=q, axis=1)
+
+
+def _min(ages):
+    return np.min(ages, axis=1)
+
+
+def _max(ages):
+    return np.max(ages, axis=1)
+
+
+def _bin_ages(ages, edges):
+    """Count ages (depth, iteration) in bins with sorted edges at each depth
+
+    Same counts as `numpy.histogram()` on each row of ages, from a single bincount over the chunk.
+    """
+    n, nbins = ages.shape[0], len(edges) - 1
+    idx = np.searchsorted(edges, ages, side='right')
+    idx -= 1
+    # The last bin includes its upper edge.
+    idx[ages == edges[-1]] = nbins - 1
+    valid = (idx >= 0) & (idx < nbins)
+    idx += np.arange(n)[:, np.newaxis] * nbins
+    return np.bincount(idx[valid], minlength=n * nbins).reshape(n, nbins)
+
+
+def _bin_edges(x):
+    """Get edges of cells centered on sorted values x, halfway between neighbours"""
+    x = np.asarray(x, dtype=float)
+    if len(x) < 2:
+        return np.concatenate([x - 0.5, x + 0.5])
+    mid = (x[1:] + x[:-1]) / 2
+    return np.concatenate([[2 * x[0] - mid[0]], mid, [2 * x[-1] - mid[-1]]])
+
+
+def _percentile_key(p):
+    """Age summary key for percentiles p"""
+    p = np.asarray(p, dtype=float)
+    return 'percentile', p.shape, tuple(p.flat)
+
+
+def knot_ages(headage, sediment_rate, thick):
+    """Get calendar age at each segment boundary of an MCMC ensemble
+
+    Parameters
+    ----------
+    headage : ndarray
+        Array (i) of calendar age at the core head for i MCMC iterations.
+    sediment_rate : ndarray
+        2d array (j, i) of sediment accumulation rates (yr/cm) for j segments and i MCMC iterations.
+    thick : float
+        Segment thickness (cm).
+
+    Returns
+    -------
+    2d array (j + 1, i) of calendar ages at the top of each segment, and the bottom of the last segment.
+    """
+    # A sequential cumsum down the core, adding the head age first, so values match a running sum of segment ages.
+    increments = np.vstack([np.asarray(headage, dtype=float)[np.newaxis, :], sediment_rate * thick])
+    return np.cumsum(increments, axis=0)
+
+
 class NeedFitError(Exception):
     pass
@@ -0,0 +1,131 @@
+import logging
+import pathlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .agedepth import AgeDepthModel
+from .records import ChronRecord, read_chron
+
+
+log = logging.getLogger(__name__)
+
+
+class FitResult:
+    def __init__(self, index, core, model=None, error=None):
+        """Outcome of fitting a single core in a batch
+
+        Parameters
+        ----------
+        index : int
+            Position of the core in the iterable given to `fit_many()`.
+        core : ChronRecord or str
+            Core dates that were fit, or the path given for the core if it could not be read.
+        model : AgeDepthModel, optional
+            Fitted model. None if the fit failed.
+        error : Exception, optional
+            Exception raised while reading or fitting the core. None if the fit succeeded.
+        """
+        self.index = index
+        self.core = core
+        self.model = model
+        self.error = error
+
+    @property
+    def ok(self):
+        """Whether the core was fit without error"""
+        return self.error is None
+
+    def __repr__(self):
+        return '%s(index=%r, model=%r, error=%r)' % (type(self).__name__, self.index, self.model, self.error)
+
+
+def fit_many(cores, mcmc_kws, executor=None, max_workers=None, burnin=200, cache=None):
+    """Fit age-depth models for many cores, yielding results as they finish
+
+    Parameters
+    ----------
+    cores : iterable
+        ChronRecords, or paths to files for `read_chron()`.
+    mcmc_kws : dict or iterable of dicts
+        MCMC run parameters, as for `AgeDepthModel`. A single dict is used for all cores, otherwise give one dict
+        for each core.
+    executor : concurrent.futures.Executor, optional
+        Executor to run fits on. If None (default), a ProcessPoolExecutor with `max_workers` is opened and shut
+        down afterwards. A given executor is left open.
+    max_workers : int, optional
+        Number of worker processes if `executor` is None. Default is the number of CPUs.
+    burnin : int, optional
+        Burn-in passed to each `AgeDepthModel`.
+    cache : FitCache or str, optional
+        Cache, or cache directory, of MCMC fits, shared by all workers. See `McmcSetup.run()`.
+
+    Yields
+    ------
+    FitResult for each core, in the order that fits finish. Cores that fail to read or fit give a FitResult with
+    the exception in `error`, and the rest of the batch carries on. If the generator is closed early, fits that
+    have not started are cancelled.
+
+    Notes
+    -----
+    Fits are submitted largest first, going by `k`, `ssize` and the number of dates in each core, so long runs
+    do not end up trailing at the end of the batch.
+    """
+    cores = list(cores)
+    if isinstance(mcmc_kws, dict):
+        mcmc_kws = [mcmc_kws] * len(cores)
+    else:
+        mcmc_kws = list(mcmc_kws)
+    if len(mcmc_kws) != len(cores):
+        raise ValueError('mcmc_kws must be a dict or have one dict for each core')
+
+    jobs = []
+    failed = []
+    for i, (core, kws) in enumerate(zip(cores, mcmc_kws)):
+        try:
+            if isinstance(core, (str, pathlib.PurePath)):
+                core = read_chron(core)
+            core = ChronRecord(core)
+            cost = fit_cost(core, kws)
+        except Exception as e:
+            log.warning('Could not read core %d: %r', i, e)
+            failed.append(FitResult(i, core, error=e))
+            continue
+        jobs.append((cost, i, core, kws))
+    jobs.sort(key=lambda job: job[0], reverse=True)
+
+    yield from failed
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    futures = {}
+    try:
+        for _, i, core, kws in jobs:
+            futures[executor.submit(_fit_one, core, kws, burnin, cache)] = (i, core)
+        for future in as_completed(futures):
+            i, core = futures[future]
+            try:
+                yield FitResult(i, core, model=future.result())
+            except Exception as e:
+                log.warning('Fit failed for core %d: %r', i, e)
+                yield FitResult(i, core, error=e)
+    finally:
+        # Drop fits that have not started if the caller stopped early.
+        for future in futures:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=True)
+
+
+def fit_cost(core, mcmc_kws):
+    """Rough relative cost of fitting core with mcmc_kws
+
+    The twalk runs about (k + 2) * (ssize + burn-in) proposals, each of which evaluates k segments and every date.
+    """
+    k = int(mcmc_kws['k'])
+    ssize = int(mcmc_kws.get('ssize', 2000))
+    return (k + 2) * (ssize + 200) * (k + len(core.depth))
+
+
+def _fit_one(core, mcmc_kws, burnin, cache=None):
+    """Fit a single AgeDepthModel, run in executor workers"""
+    return AgeDepthModel(core, mcmc_kws=mcmc_kws, burnin=burnin, cache=cache)
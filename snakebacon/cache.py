@@ -0,0 +1,164 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+
+log = logging.getLogger(__name__)
+
+# Hidden temporary directories older than this (in seconds) were left by killed processes, and are removed.
+_STALE_AGE = 24 * 3600
+
+
+class FitCache:
+    def __init__(self, directory, max_bytes=None):
+        """On-disk cache of MCMC fits, keyed by a hash of the core dates and MCMC settings
+
+        Each entry is a directory of .npy arrays and a 'meta.json', named by its key. Entries are written under a
+        temporary name and renamed into place, and evicted entries are renamed away before they are removed, so
+        several processes can share a cache directory.
+
+        Parameters
+        ----------
+        directory : str
+            Cache directory. Created if it does not exist.
+        max_bytes : int, optional
+            Size limit of the cache. After each new entry, least recently used entries are evicted until the cache
+            is under the limit. Default is no limit.
+        """
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __repr__(self):
+        return '%s(directory=%r, max_bytes=%r)' % (type(self).__name__, self.directory, self.max_bytes)
+
+    @staticmethod
+    def key(**parts):
+        """Get cache key from JSON-able parts, with NumPy arrays and scalars allowed"""
+        s = json.dumps(parts, sort_keys=True, default=_json_default)
+        return hashlib.sha256(s.encode('utf-8')).hexdigest()
+
+    def get(self, key, mmap_mode='r'):
+        """Get (arrays, meta) for key, or None if key is not in the cache
+
+        A hit marks the entry as recently used. Arrays are memory-mapped with `mmap_mode`, see `numpy.load()`.
+        """
+        path = os.path.join(self.directory, key)
+        try:
+            out = _read_arraydir(path, mmap_mode=mmap_mode)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing, or evicted while reading.
+            return None
+        return out
+
+    def put(self, key, arrays, meta):
+        """Store dict of arrays and JSON-able dict meta under key, then evict entries over the size limit"""
+        try:
+            _write_arraydir(os.path.join(self.directory, key), arrays, meta)
+        except FileExistsError:
+            # Another process stored the same entry first.
+            pass
+        self.evict()
+
+    def entries(self):
+        """Get list of (last used time, size in bytes, key) for entries, least recently used first"""
+        out = []
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.stat(path).st_mtime
+                if name.startswith('.'):
+                    if now - mtime > _STALE_AGE:
+                        shutil.rmtree(path, ignore_errors=True)
+                    continue
+                size = sum(os.path.getsize(os.path.join(path, fl)) for fl in os.listdir(path))
+            except OSError:
+                continue
+            out.append((mtime, size, name))
+        out.sort()
+        return out
+
+    def size(self):
+        """Get total size of the cache entries in bytes"""
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self, max_bytes=None):
+        """Remove least recently used entries until the cache is under max_bytes, by default `self.max_bytes`"""
+        if max_bytes is None:
+            max_bytes = self.max_bytes
+        if max_bytes is None:
+            return
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+    def clear(self):
+        """Remove all entries"""
+        for name in os.listdir(self.directory):
+            self._remove(name)
+
+    def _remove(self, name):
+        """Remove an entry, renaming it away first so readers never see it half removed"""
+        trash = os.path.join(self.directory, '.evict-{0}-{1}'.format(os.getpid(), name.lstrip('.')))
+        try:
+            os.rename(os.path.join(self.directory, name), trash)
+        except OSError:
+            # Already removed by another process.
+            return
+        log.debug('Evicting %s from %s', name, self.directory)
+        shutil.rmtree(trash, ignore_errors=True)
+
+
+def _json_default(obj):
+    """Convert NumPy arrays and scalars for json.dump()"""
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError('Object of type {0} is not JSON serializable'.format(type(obj).__name__))
+
+
+def _write_arraydir(path, arrays, meta):
+    """Write dict of arrays as .npy files, and JSON-able dict meta as 'meta.json', to new directory path
+
+    The directory is written under a temporary name and then renamed, so an interrupted write leaves nothing at
+    path. Raises FileExistsError if path exists.
+    """
+    if os.path.exists(path):
+        raise FileExistsError('{0} already exists'.format(path))
+    tmpdir = tempfile.mkdtemp(prefix='.tmp-', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        for name, a in arrays.items():
+            np.save(os.path.join(tmpdir, name + '.npy'), np.asarray(a), allow_pickle=False)
+        with open(os.path.join(tmpdir, 'meta.json'), 'w') as fl:
+            json.dump(meta, fl, default=_json_default, indent=1)
+        try:
+            os.rename(tmpdir, path)
+        except OSError as e:
+            if os.path.isdir(path):
+                raise FileExistsError('{0} already exists'.format(path)) from e
+            raise
+    except BaseException:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+
+def _read_arraydir(path, mmap_mode='r'):
+    """Read (arrays, meta) written by `_write_arraydir()`, memory-mapping arrays with mmap_mode"""
+    with open(os.path.join(path, 'meta.json')) as fl:
+        meta = json.load(fl)
+    arrays = {}
+    for name in os.listdir(path):
+        if name.endswith('.npy'):
+            arrays[name[:-4]] = np.load(os.path.join(path, name), mmap_mode=mmap_mode, allow_pickle=False)
+    return arrays, meta
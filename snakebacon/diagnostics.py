@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def rhat(chains):
+    """Split R-hat convergence diagnostic
+
+    Parameters
+    ----------
+    chains : array-like
+        Array (m, n, ...) of n draws from each of m chains. Any trailing dimensions are treated as separate variables.
+
+    Returns
+    -------
+    Split R-hat, a float or an array with the shape of the trailing dimensions. Values close to 1 suggest the chains
+    have mixed. Each chain is split in half, so this also picks up drift within a single chain.
+
+    See Gelman et al. (2013) "Bayesian Data Analysis", 3rd ed., pp. 284-285.
+    """
+    chains = np.asarray(chains, dtype='float64')
+    half = chains.shape[1] // 2
+    if half < 2:
+        raise ValueError('need at least 4 draws in each chain')
+    split = np.concatenate([chains[:, :half], chains[:, -half:]], axis=0)
+    within = split.var(axis=1, ddof=1).mean(axis=0)
+    between = split.mean(axis=1).var(axis=0, ddof=1)
+    var_plus = (half - 1) / half * within + between
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = np.sqrt(var_plus / within)
+    return out[()]
+
+
+def ess(chains):
+    """Effective sample size
+
+    Parameters
+    ----------
+    chains : array-like
+        Array (m, n, ...) of n draws from each of m chains. Any trailing dimensions are treated as separate variables.
+
+    Returns
+    -------
+    Effective sample size, a float or an array with the shape of the trailing dimensions.
+
+    Autocorrelations are combined across chains and truncated with Geyer's initial monotone sequence, as in Stan.
+    """
+    chains = np.asarray(chains, dtype='float64')
+    m, n = chains.shape[:2]
+    if n < 4:
+        raise ValueError('need at least 4 draws in each chain')
+    trailing = chains.shape[2:]
+    chains = chains.reshape(m, n, -1)
+
+    acov = _autocovariance(chains)
+    chain_var = acov[:, 0] * n / (n - 1)
+    mean_var = chain_var.mean(axis=0)
+    var_plus = mean_var * (n - 1) / n
+    if m > 1:
+        var_plus = var_plus + chains.mean(axis=1).var(axis=0, ddof=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho = 1 - (mean_var - acov.mean(axis=0)) / var_plus
+    rho[0] = 1
+
+    out = np.empty(rho.shape[1])
+    npairs = n // 2
+    for j in range(rho.shape[1]):
+        if not np.isfinite(var_plus[j]) or var_plus[j] == 0:
+            out[j] = np.nan
+            continue
+        pairs = rho[0:2 * npairs:2, j] + rho[1:2 * npairs:2, j]
+        negative = np.flatnonzero(pairs < 0)
+        if negative.size:
+            pairs = pairs[:negative[0]]
+        pairs = np.minimum.accumulate(pairs)
+        tau = max(-1 + 2 * pairs.sum(), 1 / np.log10(m * n))
+        out[j] = m * n / tau
+    return out.reshape(trailing)[()]
+
+
+def _autocovariance(x):
+    """Biased autocovariance along axis 1 of x, using FFT"""
+    n = x.shape[1]
+    x = x - x.mean(axis=1, keepdims=True)
+    nfft = 2 ** int(np.ceil(np.log2(2 * n)))
+    f = np.fft.rfft(x, n=nfft, axis=1)
+    return np.fft.irfft(f * np.conjugate(f), n=nfft, axis=1)[:, :n] / n
@@ -1,13 +1,23 @@
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 
 import snakebacon.mcmcbackends
+from snakebacon import profiling
+from snakebacon.cache import FitCache
+from snakebacon.diagnostics import ess, rhat
 from snakebacon.records import ChronRecord
 
 
 log = logging.getLogger(__name__)
 
+# Version of the MCMC fit layout in FitCache entries. Bump to stop using old entries.
+_CACHE_FORMAT = 1
+# MCMC parameters that do not change the MCMC output. They are left out of cache keys and saved models.
+_REPORTING_KWS = ('progress', 'progress_every', 'silent')
+
 
 class McmcSetup:
     def __init__(self, coredates, mcmcbackend=snakebacon.mcmcbackends.Bacon, **kwargs):
@@ -32,24 +42,149 @@ class McmcSetup:
         # TODO(brews): Write mcmc config validation
         pass
 
-    def run(self):
+    def run(self, n_chains=1, seed=None, executor=None, checkpoint=None, checkpoint_every=None, target_ess=None,
+            max_iterations=None, time_budget=None, cache=None):
+        """Run MCMC
+
+        Parameters
+        ----------
+        n_chains : int, optional
+            Number of independent chains to run. If more than 1, returns McmcChains.
+        seed : int, optional
+            Seed for the MCMC. Chain i gets `seed + i`. If None, the 'seed' MCMC parameter is used, if given, or
+            else a random seed is drawn for multiple chains.
+        executor : concurrent.futures.Executor, optional
+            Executor to run chains on. Default runs each chain on its own thread.
+        checkpoint : str, optional
+            Path of a checkpoint file, where the MCMC state and output are saved as the run goes. If the file
+            exists, the run is resumed from it. Chain i of several chains uses `checkpoint + '.i'`.
+        checkpoint_every : int, optional
+            Number of ensemble members between checkpoints. Default only checkpoints at the end of the run.
+        target_ess : float, optional
+            Stop each chain once the effective sample size of its parameters, after burn-in, reaches target_ess.
+            The 'ssize' MCMC parameter and `max_iterations` then only cap the run length.
+        max_iterations : int, optional
+            Maximum number of MCMC iterations in each chain. The run is cut short if 'ssize' would give more.
+        time_budget : float, optional
+            Stop each chain after about time_budget seconds.
+        cache : FitCache or str, optional
+            Cache, or cache directory, of earlier fits. If a fit with the same core dates, MCMC parameters, backend,
+            calibration curves, seed and run options is in the cache, it is returned instead of running the MCMC.
+            Otherwise the new fit is stored. Runs with a `time_budget` are not cached.
+
+        Returns
+        -------
+        McmcResults, or McmcChains if n_chains > 1.
+
+        Notes
+        -----
+        Runs without a seed are cached too. A cache hit then gives the earlier draw, not a new one.
+        """
         self.validate()
-        return McmcResults(self)
+        run_kws = dict(checkpoint_every=checkpoint_every, target_ess=target_ess, max_iterations=max_iterations,
+                       time_budget=time_budget)
+        if time_budget is not None or self.mcmc_kws.get('time_budget') is not None:
+            cache = None
+        if cache is not None:
+            if not isinstance(cache, FitCache):
+                cache = FitCache(cache)
+            key = self._cache_key(n_chains=n_chains, seed=seed, **run_kws)
+            with profiling.record() as lookup, profiling.stage('cache_get'):
+                hit = cache.get(key)
+            if hit is not None:
+                log.debug('MCMC fit %s found in %r', key, cache)
+                out = _load_results(self, *hit)
+                out.timings.stages.extend(lookup.stages)
+                return out
+
+        if n_chains > 1:
+            out = McmcChains(self, n_chains=n_chains, seed=seed, executor=executor, checkpoint=checkpoint, **run_kws)
+        else:
+            out = McmcResults(self, seed=seed, checkpoint=checkpoint, **run_kws)
+        if cache is not None:
+            with profiling.record(out.timings), profiling.stage('cache_put'):
+                cache.put(key, *_dump_results(out))
+        return out
+
+    def _cache_key(self, **run_kws):
+        """Get FitCache key for a run of this setup with run_kws"""
+        backend = self.mcmcbackend
+        curves = None
+        if hasattr(backend, 'curve_versions'):
+            curves = backend.curve_versions(**self.mcmc_kws)
+        coredates = self.coredates
+        mcmc_kws = {k: v for k, v in self.mcmc_kws.items() if k not in _REPORTING_KWS}
+        return FitCache.key(format=_CACHE_FORMAT, backend=backend.__name__, mcmc_kws=mcmc_kws, curves=curves,
+                            run_kws=run_kws, coredates=[coredates.labid, coredates.age, coredates.error,
+                                                        coredates.depth])
 
 
 class McmcResults:
-    def __init__(self, setup):
-        mcmcout = setup.mcmcbackend.runmcmc(core_labid=setup.coredates.labid,
-                                            core_age=setup.coredates.age,
-                                            core_error=setup.coredates.error,
-                                            core_depth=setup.coredates.depth,
-                                            **setup.mcmc_kws)
+    def __init__(self, setup, seed=None, **run_kws):
+        """Run MCMC
+
+        Parameters
+        ----------
+        setup : McmcSetup
+        seed : int, optional
+            Seed for the MCMC. If None, the 'seed' MCMC parameter is used, if given.
+        **run_kws :
+            Run options for the MCMC backend, such as `checkpoint` or `target_ess`. See `McmcSetup.run()`.
+            Options that are None are not passed.
+
+        Attributes
+        ----------
+        timings : snakebacon.profiling.Timings
+            Timings of the MCMC stages.
+        """
+        mcmc_kws = dict(setup.mcmc_kws)
+        if seed is not None:
+            mcmc_kws['seed'] = seed
+        self._setup = setup
+        self._mcmc_kws = mcmc_kws
+        self.timings = profiling.Timings()
+        with profiling.record(self.timings):
+            mcmcout = self._runmcmc(**run_kws)
         self.depth_segments = np.linspace(setup.mcmc_kws['depth_min'], setup.mcmc_kws['depth_max'],
                                           setup.mcmc_kws['k'])
         self.headage = mcmcout['theta']
         self.sediment_rate = mcmcout['x']
         self.sediment_memory = mcmcout['w']
         self.objective = mcmcout['objective']
+        self.state = mcmcout.get('state')
+
+    def _runmcmc(self, **kwargs):
+        """Run the MCMC backend, with extra run parameters in kwargs. Parameters that are None are not passed"""
+        mcmc_kws = dict(self._mcmc_kws)
+        mcmc_kws.update({k: v for k, v in kwargs.items() if v is not None})
+        setup = self._setup
+        return setup.mcmcbackend.runmcmc(core_labid=setup.coredates.labid,
+                                         core_age=setup.coredates.age,
+                                         core_error=setup.coredates.error,
+                                         core_depth=setup.coredates.depth,
+                                         **mcmc_kws)
+
+    def extend(self, ssize, **run_kws):
+        """Continue the MCMC from where it stopped, appending about ssize ensemble members
+
+        There is no new burn-in. The extended results are the same as a single longer run.
+
+        Parameters
+        ----------
+        ssize : int
+            Number of ensemble members to add, as the MCMC 'ssize' parameter.
+        **run_kws :
+            Run options for the extension, such as `checkpoint` or `target_ess`. See `McmcSetup.run()`.
+        """
+        if getattr(self, 'state', None) is None:
+            raise ValueError('MCMC backend did not return a state to continue from')
+        with profiling.record(self.timings):
+            mcmcout = self._runmcmc(ssize=ssize, state=self.state, **run_kws)
+        self.headage = np.concatenate([self.headage, mcmcout['theta']])
+        self.sediment_rate = np.concatenate([self.sediment_rate, mcmcout['x']], axis=1)
+        self.sediment_memory = np.concatenate([self.sediment_memory, mcmcout['w']])
+        self.objective = np.concatenate([self.objective, mcmcout['objective']])
+        self.state = mcmcout.get('state')
 
     def burnin(self, n):
         """Remove the earliest n ensemble members from the MCMC output"""
@@ -65,3 +200,173 @@ class McmcResults:
     def plot(self):
         # TODO(brews): Write function to plot raw Mcmc results.
         pass
+
+
+class McmcChains(McmcResults):
+    def __init__(self, setup, n_chains, seed=None, executor=None, checkpoint=None, **run_kws):
+        """Run several independent MCMC chains and stack them
+
+        The stacked `headage`, `sediment_rate`, `sediment_memory` and `objective` hold every chain in turn, each
+        cut to the length of the shortest chain, so this can be used like McmcResults. Individual chains are in
+        `chains`, in full and each with its own `timings`.
+
+        Parameters
+        ----------
+        setup : McmcSetup
+        n_chains : int
+            Number of chains to run.
+        seed : int, optional
+            Chain i gets seed `seed + i`. If None, the 'seed' MCMC parameter is used, if given, or else a random
+            seed is drawn.
+        executor : concurrent.futures.Executor, optional
+            Executor to run chains on. Default runs each chain on its own thread.
+        checkpoint : str, optional
+            Chain i is checkpointed to `checkpoint + '.i'`. See `McmcSetup.run()`.
+        **run_kws :
+            Run options for the MCMC backend, such as `target_ess`, applied to each chain. See `McmcSetup.run()`.
+        """
+        if seed is None:
+            seed = setup.mcmc_kws.get('seed')
+        if seed is None:
+            seed = int(np.random.randint(1, 2 ** 31 - n_chains))
+        seeds = [int(seed) + i for i in range(n_chains)]
+        checkpoints = [None if checkpoint is None else '{0}.{1}'.format(checkpoint, i) for i in range(n_chains)]
+
+        run = functools.partial(_run_chain, setup, **run_kws)
+        self.timings = profiling.Timings()
+        with profiling.record(self.timings), profiling.stage('chains'):
+            if executor is None:
+                with ThreadPoolExecutor(max_workers=n_chains) as pool:
+                    self.chains = list(pool.map(run, seeds, checkpoints))
+            else:
+                self.chains = list(executor.map(run, seeds, checkpoints))
+        self.seeds = seeds
+        self.depth_segments = self.chains[0].depth_segments
+        self._stack()
+
+    def _n_common(self):
+        """Get length of the shortest chain"""
+        return min(c.n_members() for c in self.chains)
+
+    def _stack(self):
+        """Stack the chains, cut to the length of the shortest chain, into the ensemble attributes"""
+        n = self._n_common()
+        self.headage = np.concatenate([c.headage[:n] for c in self.chains])
+        self.sediment_rate = np.concatenate([c.sediment_rate[:, :n] for c in self.chains], axis=1)
+        self.sediment_memory = np.concatenate([c.sediment_memory[:n] for c in self.chains])
+        self.objective = np.concatenate([c.objective[:n] for c in self.chains])
+
+    def burnin(self, n):
+        """Remove the earliest n ensemble members from each chain"""
+        for c in self.chains:
+            c.burnin(n)
+        self._stack()
+
+    def extend(self, ssize, checkpoint=None, **run_kws):
+        """Continue each chain from where it stopped, appending about ssize ensemble members
+
+        Chains are extended on threads, each from the end of its own full run, and then stacked again. Chain i is
+        checkpointed to `checkpoint + '.i'`. See `McmcResults.extend()`.
+        """
+        def extend_chain(i):
+            self.chains[i].extend(ssize, checkpoint=None if checkpoint is None else '{0}.{1}'.format(checkpoint, i),
+                                  **run_kws)
+
+        with profiling.record(self.timings), profiling.stage('chains'):
+            with ThreadPoolExecutor(max_workers=self.n_chains()) as pool:
+                list(pool.map(extend_chain, range(self.n_chains())))
+        self._stack()
+
+    def n_chains(self):
+        """Get number of chains"""
+        return len(self.chains)
+
+    def _chain_arrays(self):
+        """Get dict of arrays (chain, iteration, ...) for each variable, cut to the length of the shortest chain"""
+        n = self._n_common()
+        return {'headage': np.stack([c.headage[:n] for c in self.chains]),
+                'sediment_rate': np.stack([c.sediment_rate[:, :n].T for c in self.chains]),
+                'sediment_memory': np.stack([c.sediment_memory[:n] for c in self.chains])}
+
+    def rhat(self):
+        """Get split R-hat for 'headage', 'sediment_rate' (one per segment) and 'sediment_memory'"""
+        return {k: rhat(v) for k, v in self._chain_arrays().items()}
+
+    def ess(self):
+        """Get effective sample size for 'headage', 'sediment_rate' (one per segment) and 'sediment_memory'"""
+        return {k: ess(v) for k, v in self._chain_arrays().items()}
+
+
+def _dump_results(results):
+    """Get dict of arrays and JSON-able dict of metadata to save McmcResults or McmcChains
+
+    Ensemble arrays get a leading chain dimension, with a single chain for McmcResults. Chains shorter than the
+    longest are padded with NaN, and the length of each chain is in the 'n_members' metadata.
+    """
+    if isinstance(results, McmcChains):
+        chains = results.chains
+        meta = {'n_chains': len(chains), 'seeds': list(results.seeds)}
+    else:
+        chains = [results]
+        meta = {'n_chains': None}
+    arrays = {'depth_segments': results.depth_segments}
+    n_members = [c.n_members() for c in chains]
+    n = max(n_members)
+    for name in ('headage', 'sediment_rate', 'sediment_memory', 'objective'):
+        padded = []
+        for c in chains:
+            a = np.asarray(getattr(c, name), dtype='float64')
+            pad = [(0, 0)] * (a.ndim - 1) + [(0, n - a.shape[-1])]
+            padded.append(np.pad(a, pad, mode='constant', constant_values=np.nan))
+        arrays[name] = np.stack(padded)
+    meta['n_members'] = n_members
+    meta['mcmc_kws'] = [_saved_kws(getattr(c, '_mcmc_kws', None)) for c in chains]
+    states = [getattr(c, 'state', None) for c in chains]
+    if all(s is not None for s in states):
+        arrays['state_x'] = np.stack([s['x'] for s in states])
+        arrays['state_xp'] = np.stack([s['xp'] for s in states])
+        arrays['state_rng'] = np.stack([np.frombuffer(s['rng'], dtype='uint8') for s in states])
+        meta['acc_it'] = [int(s['acc_it']) for s in states]
+    return arrays, meta
+
+
+def _saved_kws(mcmc_kws):
+    """Get MCMC parameters to save, without the reporting parameters"""
+    if mcmc_kws is None:
+        return None
+    return {k: v for k, v in mcmc_kws.items() if k not in _REPORTING_KWS}
+
+
+def _load_results(setup, arrays, meta):
+    """Create McmcResults or McmcChains for setup from arrays and metadata written by `_dump_results()`"""
+    chains = []
+    for i, mcmc_kws in enumerate(meta['mcmc_kws']):
+        n = meta['n_members'][i] if 'n_members' in meta else None
+        c = McmcResults.__new__(McmcResults)
+        c._setup = setup
+        c._mcmc_kws = dict(setup.mcmc_kws) if mcmc_kws is None else mcmc_kws
+        c.depth_segments = arrays['depth_segments']
+        c.headage = arrays['headage'][i, :n]
+        c.sediment_rate = arrays['sediment_rate'][i, :, :n]
+        c.sediment_memory = arrays['sediment_memory'][i, :n]
+        c.objective = arrays['objective'][i, :n]
+        c.state = None
+        c.timings = profiling.Timings()
+        if 'acc_it' in meta:
+            c.state = {'x': np.array(arrays['state_x'][i]), 'xp': np.array(arrays['state_xp'][i]),
+                       'acc_it': meta['acc_it'][i], 'rng': arrays['state_rng'][i].tobytes()}
+        chains.append(c)
+    if meta['n_chains'] is None:
+        return chains[0]
+    out = McmcChains.__new__(McmcChains)
+    out.chains = chains
+    out.seeds = meta['seeds']
+    out.depth_segments = arrays['depth_segments']
+    out.timings = profiling.Timings()
+    out._stack()
+    return out
+
+
+def _run_chain(setup, seed, checkpoint, **run_kws):
+    """Run one chain of McmcChains, with its own seed and checkpoint"""
+    return McmcResults(setup, seed=seed, checkpoint=checkpoint, **run_kws)
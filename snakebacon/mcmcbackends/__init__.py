@@ -1,12 +1,36 @@
+import hashlib
+
 import numpy as np
-import scipy.stats as stats
 
-from .bacon import run_baconmcmc, fetch_calibcurve, calibrate_dates
+from .bacon import fetch_calibcurve, calibrate_dates
 
 
 class Bacon:
     def runmcmc(*args, **kwargs):
-        return run_baconmcmc(*args, **kwargs)
+        """Run bacon MCMC, see `run_baconmcmc()`. The twalk state at the end of the run is in 'state'"""
+        from .bacon.baconwrap import run_baconmcmc
+        if not kwargs.get('in_memory', True):
+            return run_baconmcmc(*args, **kwargs)
+        out, state = run_baconmcmc(*args, return_state=True, **kwargs)
+        out['state'] = state
+        return out
+
+    def curve_versions(*args, **kwargs):
+        """Get the name and a digest of each calibration curve ('cc1' to 'cc4') the MCMC parameters use"""
+        out = {}
+        defaults = {'cc1': 'IntCal13', 'cc2': 'Marine13', 'cc3': 'SHCal13', 'cc4': 'ConstCal'}
+        for k, default in defaults.items():
+            curvename = str(kwargs.get(k, default))
+            try:
+                curve = fetch_calibcurve(curvename)
+            except KeyError:
+                out[k] = [curvename, None]
+                continue
+            h = hashlib.sha256()
+            for a in (curve.calbp, curve.c14age, curve.error):
+                h.update(np.ascontiguousarray(a, dtype='float64').tobytes())
+            out[k] = [curvename, h.hexdigest()]
+        return out
 
     def prior_dates(*args, **kwargs):
         """Get the prior distribution of calibrated radiocarbon dates"""
@@ -62,6 +86,7 @@ class Bacon:
         # PlotAccPrior @ Bacon.R ln 113 -> ln 1097-1115
         # alpha = acc_shape, beta = acc_shape / acc_mean
         # TODO(brews): Check that these stats are correctly translated to scipy.stats distribs.
+        import scipy.stats as stats
         acc_mean = kwargs['acc_mean']
         acc_shape = kwargs['acc_shape']
         x = np.linspace(0, 6 * np.max(acc_mean), 100)
@@ -84,6 +109,7 @@ class Bacon:
         # PlotMemPrior @ Bacon.R ln 114 -> ln 1119 - 1141
         # w_a = mem_strength * mem_mean, w_b = mem_strength * (1 - mem_mean)
         # TODO(brews): Check that these stats are correctly translated to scipy.stats distribs.
+        import scipy.stats as stats
         mem_shape = kwargs['mem_strength']  # aka. `mem_shape`
         mem_mean = kwargs['mem_mean']
         x = np.linspace(0, 1, 100)
@@ -91,3 +117,13 @@ class Bacon:
                            b=mem_shape * (1 - mem_mean))
         return y, x
 
+
+class BaconEnsemble(Bacon):
+    def runmcmc(*args, **kwargs):
+        """Run the Bacon age-depth model with a NumPy ensemble sampler, see `ensemble.run_ensemblemcmc()`
+
+        Takes the same MCMC parameters as Bacon, and gives the same output, without a twalk 'state'. Priors are
+        those of Bacon.
+        """
+        from .ensemble import run_ensemblemcmc
+        return run_ensemblemcmc(*args, **kwargs)
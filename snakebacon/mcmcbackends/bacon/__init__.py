@@ -3,6 +3,6 @@ Cython wrapper for the C/C++ from Bacon age-modelling software (http://chrono.qu
 Maarten Blaauw (maarten.blaauw@qub.ac.uk) and  Andres Christen (jac@cimat.mx).
 """
 
-from .baconwrap import run_baconmcmc
 from .calibcurves import fetch_calibcurve
-from .utils import calibrate_dates
\ No newline at end of file
+from .utils import calibrate_dates
+
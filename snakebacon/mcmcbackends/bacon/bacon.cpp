@@ -47,7 +47,96 @@ the files:
 #define ACCEP_EV 20
 
 
-int notmain(int argc, char *argv[]) {// Command line: bacon inputfile outputfile  
+//Silences informational messages in this thread while in scope
+class SilentScope {
+    int old;
+public:
+    SilentScope(int silent) : old(Silent()) { SetSilent(silent); }
+
+    ~SilentScope() { SetSilent(old); }
+};
+
+
+//Open a bacon run on inputfile: read the input and calibration curves and set up the twalk, once for all the
+//blocks of the run.  The twalk starts from the initial points in the input file.  incremental=0 recomputes the
+//full energy at each move, see BaconFix::evalinc.  If silent, informational messages are not printed.
+//The number of twalk parameters is left in dim.  Close the run with closebacon.
+Input *openbacon(char *inputfile, const char *curvesdir, int incremental, int silent, int *dim) {
+
+    SilentScope quiet(silent);
+
+    //Read everything from the program file
+    Input *All = new Input(inputfile, MAXNUMOFCURVES, MAXNUMOFDETS, curvesdir);
+    All->SetIncremental(incremental);
+
+    *dim = All->Dim();
+    return All;
+}
+
+
+//Print the warnings of run All and free it
+void closebacon(Input *All) {
+
+    All->PrintNumWarnings();
+    delete All;
+}
+
+
+//Copy the current twalk points of run All into x and xp, if not NULL, and the rng state of this thread into
+//rngstate, of size rngsize.  Returns the size of the rng state; it is not copied if rngsize is too small.
+int getbaconstate(Input *All, double *x, double *xp, unsigned char *rngstate, int rngsize) {
+
+    if (x != NULL)
+        cp_vector(All->Getx0(), x, All->Dim());
+    if (xp != NULL)
+        cp_vector(All->Getxp0(), xp, All->Dim());
+    return GetRngState(rngstate, rngsize);
+}
+
+
+//Set the twalk points of run All to x and xp, of size Dim, to resume a run from them.
+void setbaconstate(Input *All, const double *x, const double *xp) {
+
+    cp_vector((double *) x, All->Getx0(), All->Dim());
+    cp_vector((double *) xp, All->Getxp0(), All->Dim());
+}
+
+
+//Run it twalk iterations of run All, a block of a longer run, keeping the thinned output in out, rows of
+//x[0], ..., x[Dim-1], U.  The first row of out is the starting point.  The twalk points carry on from the end
+//of the last block, or from setbaconstate.
+//The count of accepted iterations, used for thinning, starts from and is left in acc_it.  The rng of this
+//thread is set from rngstate, of size rngsize, and the state at the end of the block is left there, so that
+//runs sharing a thread keep their own random numbers.
+//If silent, informational messages are not printed.  progress is called every progress_every iterations,
+//see twalk::simulation; if it stops the block, the output and state are up to there.
+//Returns Dim, 0 if the rng state does not have the right size (nothing is run), or -1 if memory for the output
+//could not be allocated.
+int runbaconblock(Input *All, twalk_bufferoutput *out, int it, int *acc_it, unsigned char *rngstate, int rngsize,
+                  int silent, twalk_progress progress, void *progress_data, int progress_every) {
+
+    SilentScope quiet(silent);
+
+    if (SetRngState(rngstate, rngsize) == 0)
+        return 0;
+
+    int every = -1 * EVERY_MULT * All->Dim(); // only accepted iterations
+
+    if (!out->Reserve(it / (ACCEP_EV * EVERY_MULT * All->Dim()) + 1, All->Dim()))
+        return -1;
+
+    //Run the twalk
+    All->RunTwalk(out, it, every, 0, acc_it, progress, progress_data, progress_every);
+
+    GetRngState(rngstate, rngsize);
+
+    if (out->Failed())
+        return -1;
+    return All->Dim();
+}
+
+
+int notmain(int argc, char *argv[]) {// Command line: bacon inputfile outputfile ssize [curvesdir]
 
 /*
 
@@ -61,7 +150,7 @@ int notmain(int argc, char *argv[]) {// Command line: bacon inputfile outputfile
 */
 
     if (argc < 4) {
-        printf("Usage: bacon inputfile outputfile ssize\n");
+        printf("Usage: bacon inputfile outputfile ssize [curvesdir]\n");
 
         exit(0);
     }
@@ -72,7 +161,7 @@ int notmain(int argc, char *argv[]) {// Command line: bacon inputfile outputfile
     //sprintf( ax, "Cores/%s/%s.bacon", argv[1], argv[2]);
     sprintf(ax, "%s", argv[1]);
     //Read everything from the program file
-    Input All(ax, MAXNUMOFCURVES, MAXNUMOFDETS);
+    Input All(ax, MAXNUMOFCURVES, MAXNUMOFDETS, (argc > 4) ? argv[4] : CURVESDIR);
 
 
 
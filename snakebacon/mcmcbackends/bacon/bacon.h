@@ -81,7 +81,41 @@ protected:
 
     double U, Uprior, Uli;
 
-    void AccPars(int prime) { /*fprintf( F, "%f  %f  %f\n", Uprior, Uli, U);*/ }
+    //Incremental energy: for each walker (prime= 0 for x, 1 for xp) keep the last accepted point
+    //with its prior and likelihood terms.  eval only recomputes the terms that depend on the
+    //coordinates that moved, and adds all the terms up in the same order as the full eval, so
+    //both give exactly the same energy.  The terms of the last evaluated point are in [2], and
+    //are swapped into the walker's cache when the point is accepted.
+    int incremental; //=1 to use the incremental energy, =0 to always recompute every term
+    double *cx[3], *cprior[3], *cli[3]; //point, prior terms (w in [0], alpha_k in [k]) and likelihood terms
+    int cvalid[3], clast; //cache holds a point, walker evaluated last
+    int *detlast; //index of the last coordinate each determination depends on, through G
+    int *forget, *secl; //prior for x[k] is a hiatus jump, and the inter hiatus section of x[k]
+
+    void AccPars(int prime) {
+        //fprintf( F, "%f  %f  %f\n", Uprior, Uli, U);
+        if (incremental && (clast == prime) && cvalid[2]) {
+            double *ax;
+            ax = cx[prime]; cx[prime] = cx[2]; cx[2] = ax;
+            ax = cprior[prime]; cprior[prime] = cprior[2]; cprior[2] = ax;
+            ax = cli[prime]; cli[prime] = cli[2]; cli[2] = ax;
+            cvalid[prime] = 1;
+            cvalid[2] = 0;
+        }
+    }
+
+    //Prior for x[k], 0 < k < K, in section secl[k]
+    double priorkU(int k, const double *x) {
+        if (forget[k])
+            return priorHU(secl[k], x[k]); //prior for the hiatus jump
+        return prioracU(secl[k], (x[k] - w * x[k + 1]) / (1.0 - w)); //prior for e_k
+    }
+
+    double detU(int j, const double *x) {
+        if (useT)
+            return dets->Ut(j, G(dets->d(j), x));
+        return dets->U(j, G(dets->d(j), x));
+    }
 
     double *alpha, *beta; //prior pars for the acc gamma prior in each inter hiatus section
     double prioracU(int i, const double al) { return (1.0 - alpha[i]) * log(al) + beta[i] * al; }
@@ -166,6 +200,15 @@ public:
         x0 = new double[get_dim()];
         xp0 = new double[get_dim()];
 
+        for (int i = 0; i < 3; i++) {
+            cx[i] = new double[K + 2];
+            cprior[i] = new double[K + 1];
+            cli[i] = new double[m];
+            cvalid[i] = 0;
+        }
+        clast = -1;
+        incremental = 1;
+
         //These will hold the cal. years at each node
         //The translation from x's to thetas's is done in method insupport
         theta = new double[K + 1];
@@ -245,6 +288,24 @@ public:
 
         }
 
+        //Sections for the incremental energy, as in eval
+        forget = new int[K + 1];
+        secl = new int[K + 1];
+        int l = 0;
+        for (int k = K - 1; k > 0; k--) {
+            secl[k] = l;
+            if ((H > 0) && (fcmp(c(k - 1), h[l]) == -1) && (fcmp(h[l], c(k)) != 1)) { //forgets
+                forget[k] = 1;
+                l++;
+            } else
+                forget[k] = 0;
+        }
+        detlast = new int[m];
+        for (int j = 0; j < m; j++) {
+            int i = (int) floor((dets->d(j) - c0) / Dc);
+            //G uses theta[i], ie x[0], ..., x[i], and x[i+1].  Outside the sections depend on everything.
+            detlast[j] = ((0 <= i) && (i <= K)) ? i + 1 : K + 1;
+        }
 
     }
 
@@ -260,7 +321,8 @@ public:
             return 0;
 
 
-        if (fcmp(x[K], 0.0) != 1) //acc. rate alpha_{K} <= 0, out of support
+        //NB: fcmp(v, 0.0) == 1 is the same as v > 0.0, so the plain comparisons below are used in this hot path
+        if (!(x[K] > 0.0)) //acc. rate alpha_{K} <= 0, out of support
             return 0;
 
         if (H == 0) {
@@ -269,7 +331,7 @@ public:
 
 
                 //printf("B: %d  %f  %f\n", k, x[k], (x[k]-w*x[k+1])/(1.0-w));
-                if (fcmp((x[k] - w * x[k + 1]) / (1.0 - w), 0.0) != 1) { //e_k <= 0
+                if (!((x[k] - w * x[k + 1]) / (1.0 - w) > 0.0)) { //e_k <= 0
                     return 0;
                 }
 
@@ -277,16 +339,13 @@ public:
         } else {
             //printf("A: %d  %f  %d\n", 0, x[0], K);
 
-            //we go backwards until we find the hiatus
-            int l = 0;
-
+            //we go backwards until we find the hiatus, the sections are precomputed in forget
             for (int k = K - 1; k > 0; k--) {
                 //printf("B: %d  %f  %f\n", k, x[k], (x[k]-w*x[k+1])/(1.0-w));
-                if ((fcmp(c(k - 1), h[l]) == -1) && (fcmp(h[l], c(k)) != 1)) { //forgets
-                    if (fcmp(x[k], 0.0) != 1) //we only require x[k] greater than 0
+                if (forget[k]) { //forgets
+                    if (!(x[k] > 0.0)) //we only require x[k] greater than 0
                         return 0;
-                    l++; //jump to next hiatus, but max one hiatus in each section.
-                } else if (fcmp((x[k] - w * x[k + 1]) / (1.0 - w), 0.0) != 1) { //e_k <= 0
+                } else if (!((x[k] - w * x[k + 1]) / (1.0 - w) > 0.0)) { //e_k <= 0
                     return 0;
                 }
             }
@@ -326,20 +385,35 @@ public:
 
 
     ~BaconFix() {
-        delete x0;
-        delete xp0;
-        delete theta;
+        delete[] x0;
+        delete[] xp0;
+        delete[] theta;
+        for (int i = 0; i < 3; i++) {
+            delete[] cx[i];
+            delete[] cprior[i];
+            delete[] cli[i];
+        }
+        delete[] forget;
+        delete[] secl;
+        delete[] detlast;
         delete dets;
     }
 
+    //=1 to only recompute the energy terms affected by the moved coordinates (default), =0 to recompute all
+    void SetIncremental(int on) {
+        incremental = on;
+        for (int i = 0; i < 3; i++)
+            cvalid[i] = 0;
+    }
+
 
     double Getc0() { return c(0); }
 
     double GetcK() { return c(K); }
 
     virtual void ShowDescrip() {
-        printf("BaconFixed: Bacon jumps model with fixed c's.\n");
-        printf("            K= %d, H= %d, dim= %d, Seed= %ld, Dc=%f, c(0)= %f, c(K)= %f\n",
+        msgprintf("BaconFixed: Bacon jumps model with fixed c's.\n");
+        msgprintf("            K= %d, H= %d, dim= %d, Seed= %ld, Dc=%f, c(0)= %f, c(K)= %f\n",
                K, H, get_dim(), GetSeed(), Dc, c(0), c(K));
     }
 
@@ -356,6 +430,9 @@ public:
 
     virtual double eval(double *x, int prime) {
 
+        if (incremental)
+            return evalinc(x, prime);
+
         Uprior = 0.0;
         Uli = 0.0;
 
@@ -421,6 +498,76 @@ public:
 
         return (U = Uprior + Uli);
     }
+
+    //Same energy as the full eval, recomputing only the terms that depend on coordinates that
+    //differ from the walker's last accepted point.  Keeps the terms in cache [2] for AccPars.
+    double evalinc(double *x, int prime) {
+
+        int n = K + 2, moved = n, wmoved = 1;
+        double *px = cx[2], *pprior = cprior[2], *pli = cli[2];
+
+        if (cvalid[prime]) {
+            const double *ox = cx[prime];
+            for (int i = 0; i < n; i++)
+                if (x[i] != ox[i]) {
+                    moved = i; //first moved coordinate
+                    break;
+                }
+            wmoved = (x[K + 1] != ox[K + 1]);
+
+            cp_vector(cprior[prime], pprior, K + 1);
+            cp_vector(cli[prime], pli, m);
+
+            //prior for the acc. rates
+            if (moved <= K) {
+                for (int k = (moved > 1) ? moved - 1 : 1; k < K; k++)
+                    if ((x[k] != ox[k]) || (!forget[k] && (x[k + 1] != ox[k + 1])))
+                        pprior[k] = priorkU(k, x);
+                if (x[K] != ox[K])
+                    pprior[K] = prioracU(0, x[K]);
+            }
+            //e_k depend on w, hiatus jumps do not
+            if (wmoved) {
+                pprior[0] = priorwU(w);
+                for (int k = 1; k < K; k++)
+                    if (!forget[k])
+                        pprior[k] = priorkU(k, x);
+            }
+
+            //likelihood: only determinations below the first moved coordinate
+            for (int j = 0; j < m; j++)
+                if (detlast[j] >= moved)
+                    pli[j] = detU(j, x);
+        } else {
+            pprior[0] = priorwU(w);
+            for (int k = 1; k < K; k++)
+                pprior[k] = priorkU(k, x);
+            pprior[K] = prioracU(0, x[K]);
+            for (int j = 0; j < m; j++)
+                pli[j] = detU(j, x);
+        }
+        cp_vector(x, px, n);
+        cvalid[2] = 1;
+        clast = prime;
+
+        //Add up in the same order as the full eval
+        Uli = 0.0;
+        for (int j = 0; j < m; j++)
+            Uli += pli[j];
+
+        Uprior = 0.0;
+        Uprior += pprior[0];
+        Uprior += pprior[K];
+        if (H == 0) {
+            for (int k = 1; k < K; k++)
+                Uprior += pprior[k];
+        } else {
+            for (int k = K - 1; k > 0; k--)
+                Uprior += pprior[k];
+        }
+
+        return (U = Uprior + Uli);
+    }
 };
 
 
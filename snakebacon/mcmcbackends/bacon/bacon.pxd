@@ -1,2 +1,20 @@
 cdef extern from "bacon.cpp":
-    int notmain(int argc, char *argv[])
+    ctypedef int (*twalk_progress)(void *data, int it, int acc_it, double U)
+
+    cdef cppclass twalk_bufferoutput:
+        twalk_bufferoutput()
+        double *Data()
+        int NRows()
+        int NCols()
+        int Failed()
+
+    cdef cppclass Input:
+        pass
+
+    int notmain(int argc, char *argv[]) nogil
+    Input *openbacon(char *inputfile, const char *curvesdir, int incremental, int silent, int *dim) nogil
+    void closebacon(Input *run) nogil
+    int getbaconstate(Input *run, double *x, double *xp, unsigned char *rngstate, int rngsize) nogil
+    void setbaconstate(Input *run, const double *x, const double *xp) nogil
+    int runbaconblock(Input *run, twalk_bufferoutput *out, int it, int *acc_it, unsigned char *rngstate, int rngsize,
+                      int silent, twalk_progress progress, void *progress_data, int progress_every) nogil
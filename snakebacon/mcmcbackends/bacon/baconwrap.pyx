@@ -1,65 +1,118 @@
+import logging
 import os
 import datetime
-import shutil
-import contextlib
 import tempfile
+import time
 import numpy as np
 import pandas as pd
-from bacon cimport notmain
+from bacon cimport (Input, notmain, openbacon, closebacon, getbaconstate, setbaconstate, runbaconblock,
+                    twalk_bufferoutput, twalk_progress)
 from libc.stdlib cimport malloc, free
 from .Curves import here as curvespath
+from snakebacon import profiling
+from snakebacon.diagnostics import ess
 
 
-@contextlib.contextmanager
-def try_chdir(path):
-    """Use in `with as`, returning to CWD afterwards"""
-    curdir = os.getcwd()
-    try:
-        os.chdir(path)
-        yield
-    finally:
-        os.chdir(curdir)
+log = logging.getLogger(__name__)
+
 
+# Run length constants from bacon.cpp. Each output sample takes ACCEP_EV * EVERY_MULT * Dim twalk iterations, and
+# a run has BURN_IN_MULT samples of burn-in.
+_ACCEP_EV = 20
+_EVERY_MULT = 5
+_BURN_IN_MULT = 200
+# Samples between effective sample size checks, when running to a target ESS.
+_ESS_BLOCK = 100
 
-def run_baconmcmc(ssize=2000, **kwargs):
+
+def run_baconmcmc(ssize=2000, in_memory=True, incremental=True, state=None, checkpoint=None, checkpoint_every=None,
+                  return_state=False, target_ess=None, max_iterations=None, time_budget=None, progress=None,
+                  progress_every=None, silent=False, **kwargs):
     """Run bacon MCMC, given parameters.
 
     Parameters
     ----------
         ssize : int
         ???  # TODO(brews): I have no idea what this actually does.
+        in_memory : bool, optional
+        If True (default), the twalk passes its samples straight back in a NumPy array. If False, samples are
+        written to a text file and then read back with `read_baconout()`, as in earlier versions.
+        incremental : bool, optional
+        If True (default), each twalk move only recomputes the prior and likelihood terms that depend on the moved
+        parameters. If False, the full energy is recomputed at every move. Both give the same draws. Only used
+        with `in_memory`.
+        state : dict, optional
+        twalk state at the end of an earlier run with the same parameters, as returned with `return_state`. The run
+        continues from there for ssize more samples, without burn-in or the starting point.
+        checkpoint : str, optional
+        Path of a checkpoint file. The run state and samples are written there after every `checkpoint_every`
+        samples. If the file exists, the run is resumed from it.
+        checkpoint_every : int, optional
+        Number of samples between checkpoints. Default only checkpoints at the end of the run.
+        return_state : bool, optional
+        If True, also return the twalk state at the end of the run.
+        target_ess : float, optional
+        Stop the run once the effective sample size of theta, w and every segment accumulation rate, after burn-in,
+        reaches target_ess. It is checked every `checkpoint_every` samples, or every 100 samples. `ssize` and
+        `max_iterations` then only cap the run length.
+        max_iterations : int, optional
+        Maximum number of twalk iterations. The run is cut short if `ssize` would give more.
+        time_budget : float, optional
+        Stop the run at the first check (every `checkpoint_every` or 100 samples) after time_budget seconds.
+        progress : callable, optional
+        Called with a TwalkProgress every `progress_every` twalk iterations, and at the end of each block. The
+        twalk waits while it runs. If it raises, the run stops and the exception is raised from here.
+        progress_every : int, optional
+        Number of twalk iterations between calls to `progress`. Default is the number of iterations for 100
+        samples.
+        silent : bool, optional
+        If True, the bacon C++ code does not print informational messages. Errors and warnings are still printed.
         **kwargs :
-        Bacon MCMC run parameters passed to `write_baconin()`.
+        Bacon MCMC run parameters passed to `write_baconin()`. Pass `seed` to get a reproducible run.
 
     Returns
     -------
-    Output from bacon MCMC.
+    Output from bacon MCMC. See `read_baconout()`. If `return_state`, a tuple of the output and the twalk state.
+
+    Notes
+    -----
+    The MCMC releases the GIL and does not change the working directory, so several runs may go at once on
+    different threads.
+
+    A run that is checkpointed, stopped and resumed, or continued from its state, gives the same samples as a
+    single longer run. A run that stops early for `target_ess` or `time_budget` gives the first samples of the full
+    run.
     """
-    cwd = os.getcwd()
-    infile_str = 'intobacon.txt'
-    outfile_str = 'outofbacon.bacon'
-    curves_dir = os.path.basename(curvespath)
+    run_opts = (state, checkpoint, target_ess, max_iterations, time_budget, progress)
+    if not in_memory and (return_state or silent or any(opt is not None for opt in run_opts)):
+        raise ValueError('`state`, `checkpoint`, `return_state`, `target_ess`, `max_iterations`, `time_budget`, '
+                         '`progress` and `silent` need `in_memory=True`')
     with tempfile.TemporaryDirectory() as tmpdir:
-        write_baconin(os.path.join(tmpdir, infile_str), **kwargs)
-        shutil.copytree(curvespath, os.path.join(tmpdir, curves_dir))
-        with try_chdir(tmpdir):
-            _baconmain(infile_str, outfile_str, ssize)
-            out = read_baconout(outfile_str)
+        infile_str = os.path.join(tmpdir, 'intobacon.txt')
+        outfile_str = os.path.join(tmpdir, 'outofbacon.bacon')
+        with profiling.stage('write_baconin'):
+            write_baconin(infile_str, **kwargs)
+        if in_memory:
+            values, state = _baconrun_blocks(infile_str, ssize, dim=int(kwargs['k']) + 2, incremental=incremental,
+                                             state=state, checkpoint=checkpoint, checkpoint_every=checkpoint_every,
+                                             target_ess=target_ess, max_iterations=max_iterations,
+                                             time_budget=time_budget, progress=progress,
+                                             progress_every=progress_every, silent=silent)
+            with profiling.stage('split_baconout'):
+                out = _split_baconout(values)
+        else:
+            with profiling.stage('twalk'):
+                _baconmain(infile_str, outfile_str, ssize)
+            with profiling.stage('read_baconout'):
+                out = read_baconout(outfile_str)
+    if return_state:
+        return out, state
     return out
 
 
 def run_baconmcmcfiles(inpath, outpath, ssize=2000):
     """Run bacon MCMC using bacon file at inpath and write results to outpath"""
-    cwd = os.getcwd()
-    inpath_fl = os.path.basename(inpath)
-    outpath_fl = os.path.basename(outpath)
-    curves_dir = os.path.basename(curvespath)
-    with tempfile.TemporaryDirectory() as tmpdir:
-        shutil.copytree(curvespath, os.path.join(tmpdir, curves_dir))
-        shutil.copy2(inpath, tmpdir)
-        with try_chdir(tmpdir):
-            _baconmain(inpath_fl, outpath_fl, ssize)
-        shutil.copy2(os.path.join(tmpdir, outpath_fl), outpath)
+    _baconmain(inpath, outpath, ssize)
     print('Done.')
 
 
@@ -80,17 +133,25 @@ def read_baconout(path):
     function values used in the twalk MCMC.
     """
     d = pd.read_csv(path, delim_whitespace=True, header=None)
+    return _split_baconout(d.values)
+
+
+def _split_baconout(values):
+    """Split 2d array (i, j) of bacon MCMC output, one row per MCMC iteration, into a dictionary
+
+    See `read_baconout()` for the dictionary members.
+    """
     # TODO(brews): Function cannot handle hiatus
-    out = {'theta': d.iloc[:, 0].values,  # `theta0` or often just `theta`, array (i) of Age of sedimentation core head.
-           'x': d.iloc[:, 1:-2].values.T,  # `x`, 2d array (i, j) of sediment accumulation rates for each segment (i) down the sediment core of each MCMC iteration (j).
-           'w': d.iloc[:, -2].values,  # `w`, array (i) of memory or coherence of accumulation rates along sediment core.
-           'objective': d.iloc[:, -1].values}  # `Us`, array (i) of objective or energy function used in the twalk MCMC.
+    out = {'theta': values[:, 0],  # `theta0` or often just `theta`, array (i) of Age of sedimentation core head.
+           'x': values[:, 1:-2].T,  # `x`, 2d array (i, j) of sediment accumulation rates for each segment (i) down the sediment core of each MCMC iteration (j).
+           'w': values[:, -2],  # `w`, array (i) of memory or coherence of accumulation rates along sediment core.
+           'objective': values[:, -1]}  # `Us`, array (i) of objective or energy function used in the twalk MCMC.
     return out
 
 
 def _baconin_str(*, core_labid, core_age, core_error, core_depth, depth_min, depth_max, cc, d_r, d_std, k, th01, th02,
                  mem_strength, mem_mean, acc_shape, acc_mean, t_a=None, t_b=None, cc1='IntCal13', cc2='Marine13',
-                 cc3='SHCal13', cc4='ConstCal', minyr=-1000, maxyr=1e6, normal=False, postbomb=0):
+                 cc3='SHCal13', cc4='ConstCal', minyr=-1000, maxyr=1e6, normal=False, postbomb=0, seed=None):
     """Make list of strings to write to .bacon file
 
     Parameters
@@ -158,6 +219,9 @@ def _baconin_str(*, core_labid, core_age, core_error, core_depth, depth_min, dep
         Integer indicating which post-bomb curve to use for radiocarbon calibration. `0` is no curve. `1` is
         'postbomb_NH1.14C'. `2` is 'postbomb_NH2.14C'. `3` is 'postbomb_NH3.14C'. `4` is 'postbomb_SH1-2.14C'.
         `5` is 'postbomb_SH3.14C'.
+    seed: int, optional
+        Positive integer seed for the MCMC random number generator. If `None` (default), the seed is taken from
+        'dmax', as in earlier versions.
 
     Returns
     -------
@@ -232,11 +296,14 @@ def _baconin_str(*, core_labid, core_age, core_error, core_depth, depth_min, dep
     if normal:
         dist_opt = 'FixNor'
     wrapup_body = 'Bacon 0: {dist_opt}, {k}, {minyr}, {maxyr}, {th0}, {th0p}, {w_a}, {w_b}, {alpha}, {beta}, {dmin}, {dmax};\n'
-    outlines.append(wrapup_body.format(dist_opt=dist_opt, k=k, minyr=minyr, maxyr=maxyr,
-                                       th0=th01, th0p=th02,
-                                       w_a=mem_strength * mem_mean, w_b=mem_strength * (1 - mem_mean),
-                                       alpha=acc_shape, beta=acc_shape / acc_mean,
-                                       dmin=depth_min, dmax=depth_max))
+    wrapup_body = wrapup_body.format(dist_opt=dist_opt, k=k, minyr=minyr, maxyr=maxyr,
+                                     th0=th01, th0p=th02,
+                                     w_a=mem_strength * mem_mean, w_b=mem_strength * (1 - mem_mean),
+                                     alpha=acc_shape, beta=acc_shape / acc_mean,
+                                     dmin=depth_min, dmax=depth_max)
+    if seed is not None:
+        wrapup_body = wrapup_body.replace(';\n', ', {0};\n'.format(int(seed)))
+    outlines.append(wrapup_body)
     return outlines
 
 
@@ -250,10 +317,9 @@ def write_baconin(path, **kwargs):
 
 def _baconmain(str infile, str outfile, int ssize):
     """Run bacon MCMC on input file, and put output into outfile
-    
-    The underlying C/C++ from Bacon assumes there is a directory, 'Curve' in runtime CWD that holds special format 
-    calibration curve. 
-    
+
+    Calibration curves are read from the package 'Curves' directory. The GIL is released while the MCMC runs.
+
     Parameters
     ----------
         infile : str
@@ -274,7 +340,9 @@ def _baconmain(str infile, str outfile, int ssize):
     cdef char* cinfile
     cdef char* coutfile
     cdef char* cssize
-    cdef int argcount = 4
+    cdef bytes bcurves = curvespath.encode('utf8')
+    cdef int argcount = 5
+    cdef int burnin
     outgoing_argv = <char**> malloc(argcount * sizeof(char*))
     try:
         binfile = infile.encode('utf8')
@@ -289,9 +357,352 @@ def _baconmain(str infile, str outfile, int ssize):
         outgoing_argv[1] = cinfile
         outgoing_argv[2] = coutfile
         outgoing_argv[3] = cssize
-        return notmain(argcount, outgoing_argv)
+        outgoing_argv[4] = bcurves
+        with nogil:
+            burnin = notmain(argcount, outgoing_argv)
+        return burnin
     finally:
         free(outgoing_argv)
 
 
-# _baconmain('MSB2K_20.bacon', 'out.bacon', 2000)
\ No newline at end of file
+def _baconrun_blocks(infile, ssize, dim, incremental=True, state=None, checkpoint=None, checkpoint_every=None,
+                     target_ess=None, max_iterations=None, time_budget=None, progress=None, progress_every=None,
+                     silent=False):
+    """Run bacon MCMC on input file in blocks, optionally writing a checkpoint after each block
+
+    The input file and calibration curves are read once, and the twalk carries on from one block to the next. The
+    run stops early, between blocks, once `target_ess` is reached or `time_budget` is spent.
+
+    Parameters
+    ----------
+        infile : str
+            Path of existing bacon-format file to be input into MCMC.
+        ssize : int
+            Sample size of input data.
+        dim : int
+            Number of twalk parameters, k + 2.
+        incremental, state, checkpoint, checkpoint_every, target_ess, max_iterations, time_budget, progress,
+        progress_every, silent :
+            See `run_baconmcmc()`.
+
+    Returns
+    -------
+    2d array (i, j) of bacon MCMC output, with the same columns as the output file read by `read_baconout()`, and
+    the twalk state at the end of the run.
+    """
+    with open(infile) as fl:
+        baconin = fl.read()
+    per_sample = _ACCEP_EV * _EVERY_MULT * dim
+    if state is None:
+        n_iter = per_sample * (ssize + _BURN_IN_MULT)
+        n_burnin = _BURN_IN_MULT + 1  # Samples of burn-in, and the starting point.
+    else:
+        n_iter = per_sample * ssize
+        n_burnin = 0
+    if max_iterations is not None:
+        n_iter = min(n_iter, int(max_iterations))
+
+    values = np.empty((0, dim + 1))
+    n_done = 0
+    if checkpoint is not None and os.path.exists(checkpoint):
+        values, state, ck_baconin, ck_n_iter, n_done = _read_checkpoint(checkpoint)
+        if _strip_comments(ck_baconin) != _strip_comments(baconin) or ck_n_iter != n_iter:
+            raise ValueError('checkpoint {0} is for a different bacon run'.format(checkpoint))
+        log.info('Resuming bacon run from %s, %d of %d iterations done', checkpoint, n_done, n_iter)
+
+    if checkpoint_every is not None:
+        block = per_sample * int(checkpoint_every)
+    elif target_ess is not None or time_budget is not None:
+        block = per_sample * _ESS_BLOCK
+    else:
+        block = n_iter
+    start = time.monotonic()
+    reporter = None
+    if progress is not None:
+        if progress_every is None:
+            progress_every = per_sample * _ESS_BLOCK
+        reporter = _ProgressReporter(progress, n_iter, n_done, start)
+    run = _BaconRun(infile, dim, incremental=incremental, silent=silent)
+    if state is not None:
+        run.set_state(state)
+    resumed = state is not None
+    while n_done < n_iter:
+        if target_ess is not None:
+            with profiling.stage('ess'):
+                run_ess = _baconout_ess(values[n_burnin:])
+            if run_ess >= target_ess:
+                log.info('bacon run reached effective sample size %.1f after %d iterations', run_ess, n_done)
+                break
+        if time_budget is not None and n_done > 0 and time.monotonic() - start > time_budget:
+            log.info('bacon run stopped after %d iterations, its time budget of %g s is spent', n_done, time_budget)
+            break
+        n = min(block, n_iter - n_done)
+        with profiling.stage('twalk'):
+            block_values = run.block(n, reporter=reporter, progress_every=progress_every or 0)
+        if resumed:
+            block_values = block_values[1:]  # First row is the point we resumed from.
+        resumed = True
+        values = np.concatenate([values, block_values])
+        n_done += n
+        if checkpoint is not None:
+            with profiling.stage('checkpoint'):
+                _write_checkpoint(checkpoint, values, run.state(), baconin, n_iter, n_done)
+
+    if target_ess is not None:
+        run_ess = _baconout_ess(values[n_burnin:])
+        if not run_ess >= target_ess:
+            log.warning('bacon run stopped with effective sample size %.1f, below the target of %g', run_ess,
+                        target_ess)
+    return values, run.state()
+
+
+def _strip_comments(baconin):
+    """Drop comment lines, such as the time of the run, from bacon input file contents"""
+    return ''.join(line for line in baconin.splitlines(True) if not line.lstrip().startswith('#'))
+
+
+def _baconout_ess(values):
+    """Smallest effective sample size of the twalk parameters in 2d array (i, j) of bacon MCMC output"""
+    if len(values) < 4:
+        return 0.0
+    run_ess = ess(values[np.newaxis, :, :-1])  # Leave out the objective.
+    if np.all(np.isnan(run_ess)):
+        return 0.0
+    return float(np.nanmin(run_ess))
+
+
+def _write_checkpoint(path, values, state, baconin, n_iter, n_done):
+    """Write bacon run checkpoint to path, replacing any earlier checkpoint atomically"""
+    fd, tmppath = tempfile.mkstemp(suffix='.npz', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as fl:
+            np.savez(fl, values=values, x=state['x'], xp=state['xp'], acc_it=state['acc_it'],
+                     rng=np.frombuffer(state['rng'], dtype='uint8'), baconin=baconin, n_iter=n_iter, n_done=n_done)
+        os.replace(tmppath, path)  # Atomic, so a run killed while writing leaves the last checkpoint intact.
+    except BaseException:
+        os.remove(tmppath)
+        raise
+
+
+def _read_checkpoint(path):
+    """Read bacon run checkpoint
+
+    Returns
+    -------
+    Output values so far, twalk state, bacon input file contents, total and done number of twalk iterations.
+    """
+    with np.load(path, allow_pickle=False) as ck:
+        state = {'x': ck['x'], 'xp': ck['xp'], 'acc_it': int(ck['acc_it']), 'rng': ck['rng'].tobytes()}
+        return ck['values'], state, str(ck['baconin']), int(ck['n_iter']), int(ck['n_done'])
+
+
+class TwalkProgress:
+    def __init__(self, iteration, n_iterations, accepted, energy, elapsed):
+        """Progress of a bacon twalk run, passed to the `progress` callback of `run_baconmcmc()`
+
+        Parameters
+        ----------
+        iteration : int
+            twalk iterations done in the run, including those of a resumed checkpoint.
+        n_iterations : int
+            twalk iterations in the full run.
+        accepted : int
+            Accepted twalk iterations since the run started or resumed.
+        energy : float
+            Current value of the objective (energy) function, U.
+        elapsed : float
+            Seconds since the run started or resumed.
+        """
+        self.iteration = iteration
+        self.n_iterations = n_iterations
+        self.accepted = accepted
+        self.energy = energy
+        self.elapsed = elapsed
+        self._n_since_start = 0
+
+    def __repr__(self):
+        return '%s(iteration=%r, n_iterations=%r, accepted=%r, energy=%r, elapsed=%r)' % (
+            type(self).__name__, self.iteration, self.n_iterations, self.accepted, self.energy, self.elapsed)
+
+    @property
+    def acceptance_rate(self):
+        """Fraction of twalk iterations accepted since the run started or resumed"""
+        if self._n_since_start == 0:
+            return 0.0
+        return self.accepted / self._n_since_start
+
+    @property
+    def iterations_per_second(self):
+        """twalk iterations per second since the run started or resumed"""
+        if self.elapsed <= 0:
+            return 0.0
+        return self._n_since_start / self.elapsed
+
+    @property
+    def eta(self):
+        """Estimated seconds to the end of the run, at the current speed. None if not known yet"""
+        rate = self.iterations_per_second
+        if rate <= 0:
+            return None
+        return (self.n_iterations - self.iteration) / rate
+
+
+class _ProgressReporter:
+    """Turn twalk progress calls from the blocks of a bacon run into TwalkProgress for a callback"""
+    def __init__(self, callback, n_iter, n_done, start):
+        self.callback = callback
+        self.n_iter = n_iter
+        self.n_resumed = n_done  # Iterations done before this process started the run.
+        self.n_blocks = 0  # Iterations in finished blocks.
+        self.acc_blocks = 0  # Accepted iterations in finished blocks.
+        self.start = start
+        self.last = (0, 0)  # Last (iterations, accepted iterations) reported in the current block.
+        self.error = None
+
+    def report(self, it, acc_it, energy):
+        """Report it iterations and acc_it accepted iterations into the current block"""
+        out = TwalkProgress(self.n_resumed + self.n_blocks + it, self.n_iter, self.acc_blocks + acc_it, energy,
+                            time.monotonic() - self.start)
+        out._n_since_start = self.n_blocks + it
+        self.callback(out)
+
+    def end_block(self, n, acc_it):
+        """Finish a block of n iterations with acc_it accepted iterations"""
+        self.n_blocks += n
+        self.acc_blocks += acc_it
+
+
+cdef int _twalk_progress(void *data, int it, int acc_it, double energy) with gil:
+    """twalk progress callback into a _ProgressReporter. Returns 1 to stop the twalk if the reporter raised"""
+    reporter = <object> data
+    reporter.last = (it, acc_it)
+    try:
+        reporter.report(it, acc_it, energy)
+    except BaseException as e:
+        reporter.error = e
+        return 1
+    return 0
+
+
+cdef class _BaconRun:
+    """bacon MCMC run on an input file, kept open across the blocks of a longer run
+
+    The input file and calibration curves are read, and the twalk is set up, once. The twalk points stay in the
+    run from one block to the next. The random number generator state is kept here and swapped in for each block,
+    so runs that share a thread do not share random numbers.
+
+    Parameters
+    ----------
+        infile : str
+            Path of existing bacon-format file to be input into MCMC.
+        dim : int
+            Number of twalk parameters, k + 2.
+        incremental : bool, optional
+            Only recompute the energy terms affected by each twalk move.
+        silent : bool, optional
+            Do not print informational messages from the C++ code.
+    """
+    cdef Input *run
+    cdef int dim
+    cdef int acc_it
+    cdef unsigned char[::1] rng
+    cdef int rngsize
+    cdef bint silent
+
+    def __cinit__(self, str infile, int dim, bint incremental=True, bint silent=False):
+        cdef bytes binfile = infile.encode('utf8')
+        cdef bytes bcurves = curvespath.encode('utf8')
+        cdef char *cinfile = binfile
+        cdef char *ccurves = bcurves
+        cdef int rundim = 0
+        self.run = NULL
+        with nogil:
+            self.run = openbacon(cinfile, ccurves, incremental, silent, &rundim)
+        if rundim != dim:
+            raise ValueError('bacon run has {0} parameters, not {1}'.format(rundim, dim))
+        self.dim = dim
+        self.silent = silent
+        self.acc_it = 0
+        self.rng = np.zeros(256, dtype='uint8')
+        self.rngsize = getbaconstate(self.run, NULL, NULL, &self.rng[0], self.rng.shape[0])
+        if self.rngsize > self.rng.shape[0]:
+            raise ValueError('random number generator state has more than {0} bytes'.format(self.rng.shape[0]))
+
+    def __dealloc__(self):
+        if self.run != NULL:
+            closebacon(self.run)
+
+    def state(self):
+        """Get twalk state: dict with walkers 'x' and 'xp', number of accepted iterations 'acc_it' and random
+        number generator state 'rng'
+        """
+        cdef double[::1] x = np.zeros(self.dim)
+        cdef double[::1] xp = np.zeros(self.dim)
+        getbaconstate(self.run, &x[0], &xp[0], NULL, 0)
+        return {'x': np.asarray(x), 'xp': np.asarray(xp), 'acc_it': self.acc_it,
+                'rng': np.asarray(self.rng)[:self.rngsize].tobytes()}
+
+    def set_state(self, state):
+        """Continue the run from twalk state, as returned by `state()`"""
+        cdef double[::1] x
+        cdef double[::1] xp
+        if len(state['x']) != self.dim or len(state['xp']) != self.dim:
+            raise ValueError('twalk state does not match this bacon run')
+        if len(state['rng']) != self.rngsize:
+            raise ValueError('random number generator state should have {0} bytes'.format(self.rngsize))
+        x = np.array(state['x'], dtype='float64')
+        xp = np.array(state['xp'], dtype='float64')
+        setbaconstate(self.run, &x[0], &xp[0])
+        self.acc_it = state['acc_it']
+        np.asarray(self.rng)[:self.rngsize] = np.frombuffer(state['rng'], dtype='uint8')
+
+    def block(self, int n_iter, reporter=None, int progress_every=0):
+        """Run n_iter twalk iterations, carrying on from the end of the last block
+
+        Parameters
+        ----------
+            n_iter : int
+                Number of twalk iterations.
+            reporter : _ProgressReporter, optional
+                Reports twalk progress every progress_every iterations, and at the end of the block. If its
+                callback raises, the block stops and the exception is raised here.
+            progress_every : int, optional
+                Number of twalk iterations between progress reports. If 0, only report at the end of the block.
+
+        Returns
+        -------
+        2d array (i, j) of bacon MCMC output as `_baconrun_blocks()`, where the first row is the starting point.
+        """
+        cdef twalk_bufferoutput *buffer
+        cdef double[:, ::1] samples
+        cdef twalk_progress progress_fn = NULL
+        cdef void *progress_data = NULL
+        cdef int rt
+        if reporter is not None:
+            progress_fn = _twalk_progress
+            progress_data = <void *> reporter
+            reporter.last = (0, 0)  # Nothing reported yet in this block.
+
+        buffer = new twalk_bufferoutput()
+        try:
+            with nogil:
+                rt = runbaconblock(self.run, buffer, n_iter, &self.acc_it, &self.rng[0], self.rngsize, self.silent,
+                                   progress_fn, progress_data, progress_every)
+            if reporter is not None:
+                if reporter.error is not None:
+                    error, reporter.error = reporter.error, None
+                    raise error
+                reporter.end_block(*reporter.last)
+            if rt == 0:
+                raise ValueError('random number generator state should have {0} bytes'.format(self.rngsize))
+            if rt < 0:
+                raise MemoryError('could not allocate memory for the bacon MCMC output')
+            if buffer.NRows() == 0:
+                return np.empty((0, self.dim + 1))
+            samples = <double[:buffer.NRows(), :buffer.NCols()]> buffer.Data()
+            return np.array(samples, copy=True)
+        finally:
+            del buffer
+
+
+# _baconmain('MSB2K_20.bacon', 'out.bacon', 2000)
@@ -10,15 +10,18 @@
 #include "ranfun.h"
 #include "Matrix.h"
 
-#define IntCal13FNAM "Curves/3Col_intcal13.14C"
+//Curve file names, relative to the curves directory (CURVESDIR by default)
+#define CURVESDIR "Curves"
+
+#define IntCal13FNAM "3Col_intcal13.14C"
 #define IntCal13ROWS 5142
 #define IntCal13COLS 3
 
-#define Marine13FNAM "Curves/3Col_marine13.14C"
+#define Marine13FNAM "3Col_marine13.14C"
 #define Marine13ROWS 4801
 #define Marine13COLS 3
 
-#define SHCal13FNAM "Curves/3Col_shcal13.14C"
+#define SHCal13FNAM "3Col_shcal13.14C"
 #define SHCal13ROWS 5142
 #define SHCal13COLS 3
 
@@ -26,11 +29,19 @@
 #define GENCCCOLS 3
 
 #define POSTBOMBFNAMS	"None", \
-						"Curves/postbomb_NH1.14C", \
-						"Curves/postbomb_NH2.14C", \
-						"Curves/postbomb_NH3.14C", \
-						"Curves/postbomb_SH1-2.14C", \
-						"Curves/postbomb_SH3.14C"
+						"postbomb_NH1.14C", \
+						"postbomb_NH2.14C", \
+						"postbomb_NH3.14C", \
+						"postbomb_SH1-2.14C", \
+						"postbomb_SH3.14C"
+
+#define CURVEPATHLEN 1024
+
+//Put the path of curve file fnam in curves directory dir into path
+inline char *CurvePath(char *path, const char *dir, const char *fnam) {
+	snprintf( path, CURVEPATHLEN, "%s/%s", dir, fnam);
+	return path;
+}
 
 
 
@@ -47,6 +58,8 @@ public:
 
 	Cal(int kk) { k = kk; }
 
+	virtual ~Cal() {}
+
 	double GetSig() { return sig; }
 	double GetMu() { return mu; }
 
@@ -68,7 +81,7 @@ class ConstCal : public Cal {
 public:
 
 	ConstCal() : Cal(0) {
-		printf("Constant calibration curve.\n");
+		msgprintf("Constant calibration curve.\n");
 	}
 
 	double cal(double theta) {
@@ -90,6 +103,108 @@ public:
 
 
 
+//Knots of a calibration curve, with precomputed slopes and a uniform grid index for knot lookup.
+//The grid has about 4 buckets per knot, so on (nearly) regularly spaced curves a bucket
+//spans at most one knot and the lookup is O(1).  Irregular stretches with many knots in a bucket
+//fall back to a binary search within the bucket.
+#define CALKNOTSBUCKETS 4
+#define CALKNOTSSCAN 8
+
+class CalKnots {
+
+protected:
+
+	int n; //number of knots
+	double *x, *mu, *sig; //knot cal. BP, c14 mean and sd
+	double *dmu, *dsig; //slopes from knot k to k+1
+
+	double x0, h; //grid origin and bucket width
+	int nb; //number of buckets
+	int *bucket; //bucket[b] is the last knot k with x[k] <= x0 + b*h
+
+public:
+
+	CalKnots(SubMatrix &CC, int numrows) {
+
+		n = numrows;
+		x = new double[n];
+		mu = new double[n];
+		sig = new double[n];
+		dmu = new double[n];
+		dsig = new double[n];
+
+		for (int k=0; k<n; k++) {
+			x[k] = CC(k,0);
+			mu[k] = CC(k,1);
+			sig[k] = CC(k,2);
+		}
+		for (int k=0; k<n-1; k++) {
+			dmu[k] = (mu[k+1] - mu[k])/(x[k+1] - x[k]);
+			dsig[k] = (sig[k+1] - sig[k])/(x[k+1] - x[k]);
+		}
+		dmu[n-1] = dmu[n-2];
+		dsig[n-1] = dsig[n-2];
+
+		x0 = x[0];
+		nb = CALKNOTSBUCKETS*n;
+		h = (x[n-1] - x0)/(nb - 1);
+		bucket = new int[nb];
+		int k = 0;
+		for (int b=0; b<nb; b++) {
+			while ((k < n-2) && (x[k+1] <= x0 + b*h))
+				k++;
+			bucket[b] = k;
+		}
+	}
+
+	~CalKnots() {
+		delete[] x;
+		delete[] mu;
+		delete[] sig;
+		delete[] dmu;
+		delete[] dsig;
+		delete[] bucket;
+	}
+
+	//Find k such that x[k] <= theta < x[k+1], or the first or last segment to extrapolate
+	int Find(double theta) {
+
+		if (theta <= x0)
+			return 0;
+		int b = (int) ((theta - x0)/h);
+		if (b >= nb - 1)
+			return n-2;
+
+		int k = bucket[b], hi = bucket[b+1];
+		//Guard against rounding in the bucket arithmetic
+		while ((k > 0) && (x[k] > theta))
+			k--;
+		while ((hi < n-2) && (x[hi+1] <= theta))
+			hi++;
+		if (hi - k <= CALKNOTSSCAN) {
+			while ((k < hi) && (x[k+1] <= theta))
+				k++;
+		}
+		else {
+			//Binary search:  x[k] <= theta < x[hi+1]
+			while (k < hi) {
+				int mid = (k + hi + 1)/2;
+				if (x[mid] <= theta)
+					k = mid;
+				else
+					hi = mid - 1;
+			}
+		}
+		return k;
+	}
+
+	double Mu(int k, double theta) { return mu[k] + (theta - x[k])*dmu[k]; }
+	double Sig(int k, double theta) { return sig[k] + (theta - x[k])*dsig[k]; }
+	double Sig(int k) { return sig[k]; }
+};
+
+
+
 //Generic Cal. curve.  Three columns, no header, first col. ascending order BP
 class GenericCal : public Cal {
 
@@ -98,7 +213,8 @@ protected:
 	Matrix *CCB;
 	SubMatrix CC;
 	SubMatrix A;
-	int numrows, min, max, mid;
+	CalKnots *knots;
+	int numrows;
 	char name[1024];
 	double mincal, maxcal, const2;
 
@@ -129,7 +245,7 @@ public:
 
 		CC.Set( CCB, CCB->nRow(), CCB->nCol());
 
-		printf("GenericCal: Reading from file: %s, %d rows, 3 cols.\n", fnam, numrows);
+		msgprintf("GenericCal: Reading from file: %s, %d rows, 3 cols.\n", fnam, numrows);
 
 		if (CC.filescan(fnam) == 0) {
 			printf("Cal: ERROR: Could not find generic cal. curve, file not found: %s\n", fnam);
@@ -143,10 +259,13 @@ public:
 
 		const2 = 0.5*log(2.0 * M_PI); //M_PI defined in gsl library
 
+		knots = new CalKnots( CC, numrows);
+
 		sprintf( name, "Generic cal. curve %s", fnam);
 	}
 
 	~GenericCal() {
+		delete knots;
 		A.~SubMatrix();
 		CC.~SubMatrix();
 		delete CCB;
@@ -157,38 +276,11 @@ public:
 
 
 		//Find k, the correct knot.
-		//We need k such that:  CC(k,0) <= theta < CC(k+1,0)
-
-
-		if (fcmp(theta, mincal) == -1)
-			//fprintf( stderr, "WARNING: Calibration attempted beyond Generic cal. curve %s limits, theta= %f\n", fnam, theta);
-			k = 0; //extrapolation
-		else
-			if (fcmp(theta, maxcal) == -1) {
-				//Binary search:
-
-				min = 0;
-				max = numrows-1;
-				mid = (min + max)/2; //Integer division
-				            //CC( mid, 0) <= theta < CC( mid+1, 0)
-				while (!( (fcmp(CC( mid, 0), theta) <= 0) && (fcmp(theta, CC( mid+1, 0)) == -1) )) {
-
-					if (fcmp(theta, CC( mid, 0)) == 1) //theta > CC( mid, 0)
-						min = mid + 1;
-					else
-						max = mid - 1;
-					mid = (min + max)/2;
-				}
-				k = mid;
-			}
-			else
-			//fprintf( stderr, "WARNING: Calibration attempted beyond Generic cal. curve %s limits, theta= %f\n", fnam, theta);
-				k = numrows-2; //extrapolation
+		//We need k such that:  CC(k,0) <= theta < CC(k+1,0), or extrapolate from the first or last knots
+		k = knots->Find(theta);
 
-		//printf(" %d: %6.3f %6.3f %6.3f\n", k, CC( k, 0), theta, CC( k+1, 0));
-
-		mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/(CC(k+1,0)-CC(k,0));
-		sig =CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/(CC(k+1,0)-CC(k,0));
+		mu = knots->Mu( k, theta);
+		sig = knots->Sig( k, theta);
 
 		return mu;
 	}
@@ -229,6 +321,7 @@ protected:
 	Matrix *CCB;
 	SubMatrix CC;
 	SubMatrix A;
+	CalKnots *knots; //knots with precomputed slopes
 	int Bomb;
 	Cal *bombcc;
 	char name[255];
@@ -236,18 +329,23 @@ protected:
 
 public:
 
-	IntCal13(int bomb) : Cal(IntCal13ROWS) {
+	IntCal13(int bomb, const char *curvesdir = CURVESDIR) : Cal(IntCal13ROWS) {
+
+		char fnam[CURVEPATHLEN];
+		CurvePath( fnam, curvesdir, IntCal13FNAM);
 
 		CCB = new Matrix( IntCal13ROWS, IntCal13COLS);
 		CC.Set( CCB, CCB->nRow(), CCB->nCol());
 
-		printf("IntCal13: Reading from file: %s\n", IntCal13FNAM);
+		msgprintf("IntCal13: Reading from file: %s\n", fnam);
 
-			if (CC.filescan(IntCal13FNAM) == 0) {
-				printf("Cal: ERROR: Could not find IntCal13 cal. curve, file not found: %s\n", IntCal13FNAM);
+			if (CC.filescan(fnam) == 0) {
+				printf("Cal: ERROR: Could not find IntCal13 cal. curve, file not found: %s\n", fnam);
 			exit(0);
 		}
 
+		knots = new CalKnots( CC, IntCal13ROWS);
+
 		const2 = 0.5*log(2.0 * M_PI); //M_PI defined in gsl library
 
 		char *postbombfnam[] = { POSTBOMBFNAMS };
@@ -261,7 +359,7 @@ public:
 		else
 			if (Bomb < 5) {
 
-			bombcc = new GenericCal(postbombfnam[Bomb]);
+			bombcc = new GenericCal(CurvePath( fnam, curvesdir, postbombfnam[Bomb]));
 			mincal = bombcc->MinCal();
 			sprintf( name, "IntCal13+%s", postbombfnam[Bomb]);
 			}
@@ -274,9 +372,12 @@ public:
 	}
 
 	~IntCal13() {
+		delete knots;
 		A.~SubMatrix();
 		CC.~SubMatrix();
 		delete CCB;
+		if (Bomb != 0)
+			delete bombcc;
 	}
 
 
@@ -291,13 +392,13 @@ public:
 //int fcmp (double x, double y, double epsilon = 0.00000000001);
 	double cal(double theta)
 	{
-        if (fcmp(theta, -5.0) == -1)
+        if (theta < -5.0)
         {
 			if (Bomb == 0) {
 				//fprintf( stderr, "WARNING: Calibration attempted beyond IntCal13 cal. curve limits, theta= %f\n",theta);
 				k = 0; //Extrapolation
-				mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/5.0;
-				sig =CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/5.0;
+				mu = knots->Mu( k, theta);
+				sig = knots->Sig( k, theta);
 			}
 			else {
 				bombcc->cal(theta);
@@ -307,25 +408,25 @@ public:
 
         }
         else
-                if (fcmp(theta, 13900.0) != 1)
+                if (theta <= 13900.0)
                 {				//************** NB: In the official IntCal13 year 0 is node 1 (node 0 is -5)
                         k = 1 + (int) floor(theta/5.0);
-                        mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/5.0;
-                        sig =CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/5.0;
+                        mu = knots->Mu( k, theta);
+                        sig = knots->Sig( k, theta);
                 }
                 else
-                        if (fcmp(theta, 25000.0) != 1)
+                        if (theta <= 25000.0)
                         {
                                 k = 2781 + (int) floor((theta-13900.0)/10.0);
-                                mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/10.0;
-                                sig = CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/10.0;
+                                mu = knots->Mu( k, theta);
+                                sig = knots->Sig( k, theta);
                         }
                         else
-                                if (fcmp(theta, 50000.0) != 1)
+                                if (theta <= 50000.0)
                                 {
                                         k = 3891 + (int) floor((theta-25000.0)/20.0);
-                                        mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/20.0;
-                                        sig = CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/20.0;
+                                        mu = knots->Mu( k, theta);
+                                        sig = knots->Sig( k, theta);
                                 }
 					else
 						{
@@ -368,30 +469,37 @@ protected:
 	Matrix *CCB;
 	SubMatrix CC;
 	SubMatrix A;
+	CalKnots *knots; //knots with precomputed slopes
 	double const2;
 
 public:
 
-	Marine13() : Cal(Marine13ROWS) {
+	Marine13(const char *curvesdir = CURVESDIR) : Cal(Marine13ROWS) {
+
+		char fnam[CURVEPATHLEN];
+		CurvePath( fnam, curvesdir, Marine13FNAM);
 
 		CCB = new Matrix( Marine13ROWS, Marine13COLS);
 
 		CC.Set( CCB, CCB->nRow(), CCB->nCol());
 
-		printf("Marine13: Reading from file: %s\n", Marine13FNAM);
+		msgprintf("Marine13: Reading from file: %s\n", fnam);
 
-		if (CC.filescan(Marine13FNAM) == 0) {
-			printf("Cal: ERROR: Could not find Marine13 cal. curve, file not found: %s\n", Marine13FNAM);
+		if (CC.filescan(fnam) == 0) {
+			printf("Cal: ERROR: Could not find Marine13 cal. curve, file not found: %s\n", fnam);
 
 			exit(0);
 		}
 
+		knots = new CalKnots( CC, Marine13ROWS);
+
 		const2 = 0.5*log(2.0 * M_PI); //M_PI defined in gsl library
 
 
 	}
 
 	~Marine13() {
+		delete knots;
 		A.~SubMatrix();
 		CC.~SubMatrix();
 		delete CCB;
@@ -411,33 +519,33 @@ public:
 //int fcmp (double x, double y, double epsilon = 0.00000000001);
 	double cal(double theta)
 	{
-        if (fcmp(theta, 0.0) == -1)
+        if (theta < 0.0)
         {
                 //fprintf( stderr, "WARNING: Calibration attempted beyond marine09 cal. curve limits, theta= %f\n",theta);
                 k = 0;
-                mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/5;
-                sig <- CC(k,2);
+                mu = knots->Mu( k, theta);
+                sig = knots->Sig(k);
         }
         else
-                if (fcmp(theta, 10500.0) != 1)
+                if (theta <= 10500.0)
                 {				//************** NB: 0 is the number of rows before cal year 0
                         k = 0 + (int) floor(theta/5.0);
-                        mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/5.0;
-                        sig =CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/5.0;
+                        mu = knots->Mu( k, theta);
+                        sig = knots->Sig( k, theta);
                 }
                 else
-                        if (fcmp(theta, 25000.0) != 1)
+                        if (theta <= 25000.0)
                         {
                                 k = 2100 + (int) floor((theta-10500.0)/10.0);
-                                mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/10.0;
-                                sig =CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/10.0;
+                                mu = knots->Mu( k, theta);
+                                sig = knots->Sig( k, theta);
                         }
                         else
-                                if (fcmp(theta, 50000.0) != 1)
+                                if (theta <= 50000.0)
                                 {
                                         k = 3550 + (int) floor((theta-25000.0)/20.0);
-                                        mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/20.0;
-                                        sig =CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/20.0;
+                                        mu = knots->Mu( k, theta);
+                                        sig = knots->Sig( k, theta);
                                 }
                                 else
 /*									if (fcmp(theta, 40000.0) != 1)
@@ -498,6 +606,7 @@ protected:
 	Matrix *CCB;
 	SubMatrix CC;
 	SubMatrix A;
+	CalKnots *knots; //knots with precomputed slopes
 	int Bomb;
 	Cal *bombcc;
 	char name[255];
@@ -505,18 +614,23 @@ protected:
 
 public:
 
-	SHCal13(int bomb) : Cal(SHCal13ROWS) {
+	SHCal13(int bomb, const char *curvesdir = CURVESDIR) : Cal(SHCal13ROWS) {
+
+		char fnam[CURVEPATHLEN];
+		CurvePath( fnam, curvesdir, SHCal13FNAM);
 
 		CCB = new Matrix( SHCal13ROWS, SHCal13COLS);
 		CC.Set( CCB, CCB->nRow(), CCB->nCol());
 
-		printf("SHCal13: Reading from file: %s\n", IntCal13FNAM);
+		msgprintf("SHCal13: Reading from file: %s\n", fnam);
 
-			if (CC.filescan(SHCal13FNAM) == 0) {
-				printf("Cal: ERROR: Could not find SHCal13 cal. curve, file not found: %s\n", SHCal13FNAM);
+			if (CC.filescan(fnam) == 0) {
+				printf("Cal: ERROR: Could not find SHCal13 cal. curve, file not found: %s\n", fnam);
 			exit(0);
 		}
 
+		knots = new CalKnots( CC, SHCal13ROWS);
+
 		const2 = 0.5*log(2.0 * M_PI); //M_PI defined in gsl library
 
 		char *postbombfnam[] = { POSTBOMBFNAMS };
@@ -530,7 +644,7 @@ public:
 		else
 			if (Bomb < 5) {
 
-			bombcc = new GenericCal(postbombfnam[Bomb]);
+			bombcc = new GenericCal(CurvePath( fnam, curvesdir, postbombfnam[Bomb]));
 			mincal = bombcc->MinCal();
 			sprintf( name, "SHCal13+%s", postbombfnam[Bomb]);
 			}
@@ -543,9 +657,12 @@ public:
 	}
 
 	~SHCal13() {
+		delete knots;
 		A.~SubMatrix();
 		CC.~SubMatrix();
 		delete CCB;
+		if (Bomb != 0)
+			delete bombcc;
 	}
 
 
@@ -560,13 +677,13 @@ public:
 //int fcmp (double x, double y, double epsilon = 0.00000000001);
 	double cal(double theta)
 	{
-        if (fcmp(theta, -5.0) == -1)
+        if (theta < -5.0)
         {
 			if (Bomb == 0) {
 				//fprintf( stderr, "WARNING: Calibration attempted beyond SHCal13 cal. curve limits, theta= %f\n",theta);
 				k = 0; //Extrapolation
-				mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/5.0;
-				sig =CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/5.0;
+				mu = knots->Mu( k, theta);
+				sig = knots->Sig( k, theta);
 			}
 			else {
 				bombcc->cal(theta);
@@ -576,25 +693,25 @@ public:
 
         }
         else
-                if (fcmp(theta, 13900.0) != 1)
+                if (theta <= 13900.0)
                 {				//************** NB: In the official SHCal13 year 0 is node 1 (node 0 is -5)
                         k = 1 + (int) floor(theta/5.0);
-                        mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/5.0;
-                        sig = CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/5.0;
+                        mu = knots->Mu( k, theta);
+                        sig = knots->Sig( k, theta);
                 }
                 else
-                        if (fcmp(theta, 25000.0) != 1)
+                        if (theta <= 25000.0)
                         {
                                 k = 2781 + (int) floor((theta-13900.0)/10.0);
-                                mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/10.0;
-                                sig = CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/10.0;
+                                mu = knots->Mu( k, theta);
+                                sig = knots->Sig( k, theta);
                         }
                         else
-                                if (fcmp(theta, 50000.0) != 1)
+                                if (theta <= 50000.0)
                                 {
                                         k = 3891 + (int) floor((theta-25000.0)/20.0);
-                                        mu = CC(k,1) + (theta-CC(k,0))*(CC(k+1,1)-CC(k,1))/20.0;
-                                        sig = CC(k,2) + (theta-CC(k,0))*(CC(k+1,2)-CC(k,2))/20.0;
+                                        mu = knots->Mu( k, theta);
+                                        sig = knots->Sig( k, theta);
                                 }
 					else
 						{
@@ -676,8 +793,10 @@ public:
 
 	}
 
+	~Det() { free(nm); }
+
 	void ShortOut() {
-		printf("%s: %6.0f+-%-6.0f  d=%-g  ResCorr= %6.1f+-%-6.1f  a=%-g b=%-g   cc=%s\n",
+		msgprintf("%s: %6.0f+-%-6.0f  d=%-g  ResCorr= %6.1f+-%-6.1f  a=%-g b=%-g   cc=%s\n",
 				nm, y, std, x, deltaR, deltaSTD, a, b, cc->Name());
 	}
 
@@ -725,6 +844,13 @@ public:
 		det = new Det * [max_m];
 	}
 
+	~Dets() {
+
+		for (int j=0; j<m; j++)
+			delete det[j];
+		delete[] det;
+	}
+
 	void AddDet(Det *de) {
 
 		if (m == max_m) {
@@ -737,7 +863,7 @@ public:
 		m++;
 		det[m-1] = de;
 
-		printf("Added det: ");
+		msgprintf("Added det: ");
 		ShortOut(m-1);
 	}
 
@@ -1,4 +1,8 @@
+import functools
+import hashlib
+import logging
 import os
+import tempfile
 
 import numpy as np
 
@@ -6,36 +10,126 @@ from .Curves import here as curvespath
 from snakebacon.records import read_14c, CalibCurve
 
 
+log = logging.getLogger(__name__)
+
+
 available_curves = dict()
 
 
+@functools.lru_cache(maxsize=None)
 def fetch_calibcurve(curvename):
-    """Get CalibCurve from name string"""
+    """Get CalibCurve from name string
+
+    Curves are cached, so repeated calls return the same read-only CalibCurve. Use `fetch_calibcurve.cache_clear()`
+    to drop cached curves.
+    """
     f = available_curves[curvename]
-    return f()
+    curve = f()
+    for a in (curve.calbp, curve.c14age, curve.error, curve.delta14c, curve.sigma):
+        a.flags.writeable = False
+    # Pickle by name, so worker processes load their own cached copy instead of receiving the arrays.
+    curve._reduce_to = (fetch_calibcurve, (curvename,))
+    return curve
 
 
 def registercurve(curvename):
     """Decorator to register functions returning CalibCurves"""
     def decor(func):
         available_curves[curvename] = func
+        fetch_calibcurve.cache_clear()
         return func
     return decor
 
 
+def read_14c_binary(fl):
+    """Create CalibCurve instance from Bacon curve file, through a memory-mapped binary copy
+
+    The text file is converted to a .npy file in the user cache directory (see `convert_14c()`) the first time it is
+    read, or whenever the text file is newer. The binary copy is then loaded with `np.load(mmap_mode='r')`, so
+    processes reading the same curve share pages instead of each parsing the text. Falls back to `read_14c()` if the
+    binary copy cannot be written.
+    """
+    binpath = convert_14c(fl)
+    if binpath is None:
+        return read_14c(fl)
+    a = np.load(binpath, mmap_mode='r')
+    return CalibCurve(calbp=a[0], c14age=a[1], error=a[2], delta14c=a[3], sigma=a[4])
+
+
+def curve_cachedir():
+    """Get directory for binary copies of calibration curves
+
+    This is 'snakebacon/curves' under `$XDG_CACHE_HOME`, or under '~/.cache' if that is not set.
+    """
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'snakebacon', 'curves')
+
+
+def convert_14c(fl, cachedir=None):
+    """Convert Bacon curve file to a binary .npy file in cachedir, if it is missing or out of date
+
+    Parameters
+    ----------
+    fl : str
+        Path of Bacon curve file.
+    cachedir : str, optional
+        Directory to write the .npy file to. Created if it does not exist. Default is `curve_cachedir()`.
+
+    Returns
+    -------
+    Path of the .npy file, or None if it could not be written. The file name has a hash of the absolute path of fl,
+    so curve files with the same name in different directories do not collide.
+    """
+    if cachedir is None:
+        cachedir = curve_cachedir()
+    fl = os.path.abspath(fl)
+    stem = os.path.splitext(os.path.basename(fl))[0]
+    pathhash = hashlib.sha256(fl.encode('utf-8')).hexdigest()[:16]
+    binpath = os.path.join(cachedir, '{0}-{1}.npy'.format(stem, pathhash))
+    try:
+        if os.path.getmtime(binpath) >= os.path.getmtime(fl):
+            return binpath
+    except OSError:
+        pass
+
+    curve = read_14c(fl)
+    a = np.array([curve.calbp, curve.c14age, curve.error, curve.delta14c, curve.sigma], dtype='float64')
+    try:
+        os.makedirs(cachedir, exist_ok=True)
+        fd, tmppath = tempfile.mkstemp(suffix='.npy', dir=cachedir)
+    except OSError as e:
+        log.info('Could not write binary calibration curve %s: %r', binpath, e)
+        return None
+    try:
+        with os.fdopen(fd, 'wb') as tmpfl:
+            np.save(tmpfl, a)
+        os.replace(tmppath, binpath)  # Atomic, so concurrent readers never see a partial file.
+    except OSError as e:
+        log.info('Could not write binary calibration curve %s: %r', binpath, e)
+        os.remove(tmppath)
+        return None
+    return binpath
+
+
+def convert_curves():
+    """Convert all shipped calibration curves to binary, ahead of first use"""
+    for fl in ('intcal13.14C', 'marine13.14C', 'shcal13.14C'):
+        convert_14c(os.path.join(curvespath, fl))
+
+
 @registercurve('IntCal13')
 def fetch_intcal13():
-    return read_14c(os.path.join(curvespath, 'intcal13.14C'))
+    return read_14c_binary(os.path.join(curvespath, 'intcal13.14C'))
 
 
 @registercurve('Marine13')
 def fetch_marine13():
-    return read_14c(os.path.join(curvespath, 'marine13.14C'))
+    return read_14c_binary(os.path.join(curvespath, 'marine13.14C'))
 
 
 @registercurve('SHCal13')
 def fetch_shcal13():
-    return read_14c(os.path.join(curvespath, 'shcal13.14C'))
+    return read_14c_binary(os.path.join(curvespath, 'shcal13.14C'))
 
 
 @registercurve('ConstCal')
@@ -38,7 +38,7 @@ int Input::GetPars() {
 }
 
 
-Input::Input(char *datafile, int emaxnumofcurves, int maxm) {
+Input::Input(char *datafile, int emaxnumofcurves, int maxm, const char *curvesdir) {
 
 
     //Open the array to hold all c. curves
@@ -73,7 +73,7 @@ Input::Input(char *datafile, int emaxnumofcurves, int maxm) {
         exit(-1);
     }
 
-    printf("Reading %s\n", datafile);
+    msgprintf("Reading %s\n", datafile);
     char line[BUFFSZ];
     char key[10];
     int i = 0, nm, j;
@@ -115,19 +115,19 @@ Input::Input(char *datafile, int emaxnumofcurves, int maxm) {
             sscanf(pars[0], " %s", line); //c. curve name
 
             if (strcmp("IntCal13", line) == 0) {   //int bomb
-                curves[numofcurves++] = new IntCal13((int) rpars[1]);
+                curves[numofcurves++] = new IntCal13((int) rpars[1], curvesdir);
 
                 continue;
             }
 
             if (strcmp("Marine13", line) == 0) {
-                curves[numofcurves++] = new Marine13();
+                curves[numofcurves++] = new Marine13(curvesdir);
 
                 continue;
             }
 
             if (strcmp("SHCal13", line) == 0) {
-                curves[numofcurves++] = new SHCal13((int) rpars[1]);
+                curves[numofcurves++] = new SHCal13((int) rpars[1], curvesdir);
 
                 continue;
             }
@@ -169,7 +169,7 @@ Input::Input(char *datafile, int emaxnumofcurves, int maxm) {
             hiatus_pars[3][H] = rpars[3]; //ha
             hiatus_pars[4][H] = rpars[4]; //hb
 
-            printf("Hiatus at: %f\n", hiatus_pars[0][H]);
+            msgprintf("Hiatus at: %f\n", hiatus_pars[0][H]);
 
             H++;
 
@@ -190,6 +190,8 @@ Input::Input(char *datafile, int emaxnumofcurves, int maxm) {
             unsigned long int seed;
             if (numofpars == 11)
                 seed = 0; //automatic seed set with time()
+            else if (numofpars > 12)
+                seed = (unsigned long int) rpars[12]; //explicit seed, after cm
             else
                 seed = (unsigned long int) rpars[11];
 
@@ -221,9 +223,29 @@ Input::Input(char *datafile, int emaxnumofcurves, int maxm) {
 
     } while (!feof(F));
 
+    fclose(F);
+
     bacon->ShowDescrip();
 
-    printf("\n");
+    msgprintf("\n");
+}
+
+
+Input::~Input() {
+
+    delete BaconTwalk;
+    delete bacon; //also deletes dets
+
+    for (int i = 0; i < numofcurves; i++)
+        delete curves[i];
+    delete[] curves;
+
+    delete[] pars;
+    delete[] rpars;
+
+    for (int i = 0; i < 5; i++)
+        delete[] hiatus_pars[i];
+    delete[] hiatus_pars;
 }
 
 
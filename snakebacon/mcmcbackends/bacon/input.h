@@ -64,7 +64,10 @@ private:
 
 public:
 
-	Input(char *datafile, int maxnumofcurves, int maxm);
+	//Calibration curves are read from curvesdir, "Curves" relative to the working dir. by default
+	Input(char *datafile, int maxnumofcurves, int maxm, const char *curvesdir = CURVESDIR);
+
+	~Input();
 
 	//Run the twalk simulation, put the output in outputfnam
 	void RunTwalk(char *outputfnam, int it, int save_every, char *mode= (char *) "w+", int silent=0) {
@@ -75,6 +78,21 @@ public:
 		BaconTwalk->simulation( it, outputfnam, mode, save_every, bacon->Getx0(), bacon->Getxp0(), silent=silent);
 		
 	}
+
+	//Run the twalk simulation, put the output in out (eg. a twalk_bufferoutput to keep it in memory)
+	//If acc_it is given, the count of accepted iterations starts from, and is left in, *acc_it
+	//progress is called every progress_every iterations, see twalk::simulation
+	void RunTwalk(twalk_output *out, int it, int save_every, int silent=0, int *acc_it=NULL,
+	              twalk_progress progress=NULL, void *progress_data=NULL, int progress_every=0) {
+
+		BaconTwalk->simulation( it, out, save_every, bacon->Getx0(), bacon->Getxp0(), silent, acc_it,
+		                        progress, progress_data, progress_every);
+
+	}
+
+	//Current points of the twalk, x and xp
+	double *Getx0() { return bacon->Getx0(); }
+	double *Getxp0() { return bacon->Getxp0(); }
 	
 	const char *GetLabNum(int j) { return dets->labnm(j); }
 	int GetNumDets(void) { return dets->Size(); }
@@ -88,6 +106,9 @@ public:
 	
 	//Returns the dimension, total number of parameters
 	int Dim() { return bacon->get_dim(); }
+
+	//=1 to only recompute the energy terms affected by each twalk move, =0 for the full energy
+	void SetIncremental(int on) { bacon->SetIncremental(on); }
 	
 	//Print number of warnings
 	void PrintNumWarnings() { return bacon->PrintNumWarnings(); }
@@ -8,6 +8,9 @@
 
 
 #include <time.h>
+#include <string.h>
+#include <stdio.h>
+#include <stdarg.h>
 #include "ranfun.h"
 
 /* interface for gsl_compare */
@@ -17,8 +20,29 @@ int fcmp(double x, double y, double epsilon) {
 }
 
 
-static gsl_rng *r;  /*static reference to the generator*/
-static unsigned long int sd = 0; /*static reference to the seed*/
+/*One generator per thread, so that several Bacon runs may share a process*/
+static thread_local gsl_rng *r = NULL;  /*static reference to the generator*/
+static thread_local unsigned long int sd = 0; /*static reference to the seed*/
+static thread_local int silent_msgs = 0; /*informational messages silenced in this thread*/
+
+
+void SetSilent(int silent) {
+    silent_msgs = silent;
+}
+
+int Silent() {
+    return silent_msgs;
+}
+
+int msgprintf(const char *format, ...) {
+    if (silent_msgs)
+        return 0;
+    va_list args;
+    va_start(args, format);
+    int rt = vprintf(format, args);
+    va_end(args);
+    return rt;
+}
 
 
 void Seed(unsigned long int s) {
@@ -45,6 +69,8 @@ This is a maximally equidistributed combined Tausworthe generator by L'Ecuyer. T
 /*Allocates space for a generator and sets the seed*/
 
 
+    if (r != NULL)
+        gsl_rng_free(r);
     r = gsl_rng_alloc(GENERATOR);
 
     if (s == 0) /*to use a seed taken from the calendar*/
@@ -59,6 +85,27 @@ unsigned long int GetSeed() {
     return sd;
 }
 
+/*Copy the generator state into buf, of size bytes, to stop and resume a run.
+Returns the size of the state; nothing is copied if buf is too small*/
+int GetRngState(unsigned char *buf, int size) {
+    int n = (int) gsl_rng_size(r);
+
+    if (n <= size)
+        memcpy(buf, gsl_rng_state(r), n);
+    return n;
+}
+
+/*Set the generator state from buf, as left by GetRngState.  Returns 0 if size is not the size of the state.
+The generator is allocated if this thread has none yet*/
+int SetRngState(const unsigned char *buf, int size) {
+    if (r == NULL)
+        r = gsl_rng_alloc(GENERATOR);
+    if (size != (int) gsl_rng_size(r))
+        return 0;
+    memcpy(gsl_rng_state(r), buf, size);
+    return 1;
+}
+
 
 double Un01()  /*Un01() */
 {
@@ -46,6 +46,16 @@ void Seed(unsigned long int s);
 
 unsigned long int GetSeed();
 
+int GetRngState(unsigned char *buf, int size); /*copy the generator state, to stop and resume a run*/
+
+int SetRngState(const unsigned char *buf, int size);
+
+void SetSilent(int silent); /*silence informational messages in this thread, errors and warnings still print*/
+
+int Silent();
+
+int msgprintf(const char *format, ...); /*printf for informational messages, unless silenced*/
+
 double Un01();  /*Un01() */
 
 double Unab(double a, double b);  /*U(a,b]*/
@@ -22,6 +22,7 @@
 //#include <iostream>
 
 #include <stdlib.h>
+#include <string.h>
 #include <string>
 #include <time.h>
 
@@ -218,6 +219,164 @@ public:
 
 
 
+/*Progress report from twalk::simulation: data, iteration, accepted iterations and current U.
+  Return non zero to stop the simulation*/
+typedef int (*twalk_progress)(void *data, int it, int acc_it, double U);
+
+
+/************** Output for the twalk samples ******************/
+
+/*Abstract class for where the twalk saves its samples*/
+class twalk_output {
+public:
+
+    virtual ~twalk_output() {};
+
+    /*Returns 1 if the output is ready to take samples, 0 otherwise*/
+    virtual int open() = 0;
+
+    /*Save point x, of dimension n, and its objective function value U*/
+    virtual void save(double *x, int n, double U) = 0;
+
+    virtual void flush() {};
+
+    virtual void close() {};
+
+    virtual const char *name() = 0;
+};
+
+
+/*Save samples as text in a file, one row per sample*/
+class twalk_fileoutput : public twalk_output {
+
+private:
+    FILE *fptr;
+    char *filename;
+    char *op;
+    int nsaved;
+
+public:
+    twalk_fileoutput(char *filename1, char *op1 = (char *) "wt") {
+        filename = strdup(filename1);
+        op = strdup(op1);
+        fptr = NULL;
+        nsaved = 0;
+    }
+
+    ~twalk_fileoutput() {
+        close();
+        free(filename);
+        free(op);
+    }
+
+    int open() {
+        nsaved = 0;
+        return ((fptr = fopen(filename, op)) != NULL);
+    }
+
+    void save(double *x, int n, double U) {
+        fver_vector(fptr, x, n);
+        if (nsaved == 0)
+            fprintf(fptr, "\t %lf", U); //the initial point
+        else
+            fprintf(fptr, "\t %13.6g", U);
+        nsaved++;
+    }
+
+    void flush() { fflush(fptr); }
+
+    void close() {
+        if (fptr != NULL)
+            fclose(fptr);
+        fptr = NULL;
+    }
+
+    const char *name() { return filename; }
+};
+
+
+/*Save samples in memory, as rows of x[0], ..., x[n-1], U in one contiguous array of doubles*/
+class twalk_bufferoutput : public twalk_output {
+
+private:
+    double *data;
+    int nrows;
+    int ncols;
+    int capacity; //number of rows we have memory for
+    int failed; //1 if memory could not be allocated; further samples are dropped
+
+    /*Make room for rows rows of ncols; returns 1, or 0 if out of memory (data is kept as it was)*/
+    int grow(int rows) {
+        double *p = (double *) realloc(data, (size_t) rows * (size_t) ncols * sizeof(double));
+        if (p == NULL) {
+            failed = 1;
+            return 0;
+        }
+        data = p;
+        capacity = rows;
+        return 1;
+    }
+
+public:
+    twalk_bufferoutput() {
+        data = NULL;
+        nrows = 0;
+        ncols = 0;
+        capacity = 0;
+        failed = 0;
+    }
+
+    ~twalk_bufferoutput() { free(data); }
+
+    /*Open memory for rows samples of dimension n, before the twalk starts.  Returns 1, or 0 if out of memory*/
+    int Reserve(int rows, int n) {
+        if (ncols != n + 1) { //rows of the old width do not fit the new one
+            ncols = n + 1;
+            nrows = 0;
+            capacity = 0;
+        }
+        if (rows > capacity)
+            return grow(rows);
+        return 1;
+    }
+
+    int open() {
+        nrows = 0;
+        return 1;
+    }
+
+    void save(double *x, int n, double U) {
+        if (ncols != n + 1) { //dimension changed, start again
+            ncols = n + 1;
+            nrows = 0;
+            capacity = 0;
+        }
+        if (failed)
+            return;
+        if (nrows == capacity && !grow((capacity > 0) ? 2 * capacity : 1024))
+            return;
+
+        double *row = data + (size_t) nrows * (size_t) ncols;
+        cp_vector(x, row, n);
+        row[n] = U;
+        nrows++;
+    }
+
+    const char *name() { return "memory"; }
+
+    double *Data() { return data; }
+
+    int NRows() { return nrows; }
+
+    int NCols() { return ncols; }
+
+    /*1 if some samples were dropped because memory could not be allocated*/
+    int Failed() { return failed; }
+};
+
+
+
+
 /****** This is the old twalk.h **************/
 
 
@@ -338,7 +497,7 @@ public:
         free_vector(mapx);
         free_vector(y);
         free_vector(yp);
-        delete phi;
+        delete[] phi;
     }
 
     /* select a kernel accordingly with krl_probs */
@@ -569,14 +728,30 @@ public:
         simulation(Tr1, filename, op = "wt", (int) 0, NULL, NULL);
     }
 
-/* Here is the implementation of the central part of the algorithm */
+/* Save the output in a text file */
     int simulation(int Tr1, char *filename, char *op = "wt", int save_every1 = 1, double *xx = NULL, double *xxp = NULL,
                    int silent = 0) {
 
+        twalk_fileoutput fout(filename, op);
+
+        return simulation(Tr1, &fout, save_every1, xx, xxp, silent);
+    }
+
+/* Here is the implementation of the central part of the algorithm */
+/* If acc_it0 is not NULL, the count of accepted iterations (used for thinning) starts from *acc_it0 and
+   is left there at the end, so that a run may be continued with the same thinning */
+/* If progress is not NULL, it is called every progress_every iterations, and after the last one, with
+   progress_data, the iteration, the accepted iterations in this simulation and the current U.  If it returns
+   non zero the simulation stops there */
+    int simulation(int Tr1, twalk_output *out, int save_every1 = 1, double *xx = NULL, double *xxp = NULL,
+                   int silent = 0, int *acc_it0 = NULL, twalk_progress progress = NULL, void *progress_data = NULL,
+                   int progress_every = 0) {
+
 
-        FILE *fptr;
         FILE *recacc;
 
+        silent = silent || Silent();
+
 
         long sec = time(NULL); //beging of the twalk
         if (silent == 0)
@@ -621,22 +796,22 @@ public:
 
 
         // ----- --- -------------- --- -----
-        if ((fptr = (fopen(filename, op)))) {
+        if (out->open()) {
 
-            fver_vector(fptr, x, n);
-            fprintf(fptr, "\t %lf", U);
+            out->save(x, n, U);
 
             if (silent == 0)
                 if (save_every < 0)
                     printf("twalk thinning: 1 out of every %d accepted iterations will be saved in file %s\n",
-                           abs(save_every), filename);
+                           abs(save_every), out->name());
                 else
-                    printf("twalk: All %d iterations to be saved in file %s\n", save_every, filename);
+                    printf("twalk: All %d iterations to be saved in file %s\n", save_every, out->name());
 
 
             int j1 = 1, j = 0, rt;
             long ax;
-            int acc_it = 0;
+            int acc_it = (acc_it0 != NULL) ? *acc_it0 : 0;
+            int acc_it_start = acc_it;
 
 
             for (int it = 1; it <= Tr1; it++) {
@@ -646,10 +821,8 @@ public:
                 if ((rt == 1) || (rt == -1)) {
                     acc_it++;
                     if (save_every < 0) //Only accepted iterations are saved
-                        if ((acc_it % abs(save_every)) == 0) {
-                            fver_vector(fptr, x, n);
-                            fprintf(fptr, "\t %13.6g", U);
-                        }
+                        if ((acc_it % abs(save_every)) == 0)
+                            out->save(x, n, U);
                     if (debugg)
                         fprintf(recacc, "%d %f\n", val, nphi / (double) n);
                 } else //Propolsal not accepted
@@ -658,14 +831,12 @@ public:
 
 
 #ifdef FLUSHEVERYIT
-                fflush(fptr);
+                out->flush();
 #endif
 
                 if (save_every > 0) //accepetd or not acc. iterations are saved
-                    if ((it % save_every) == 0) {
-                        fver_vector(fptr, x, n);
-                        fprintf(fptr, "\t %13.6g", U);
-                    }
+                    if ((it % save_every) == 0)
+                        out->save(x, n, U);
 
 
                 if ((it % (1 << j1)) == 0) {
@@ -683,9 +854,18 @@ public:
                     }
                 }
 
+                if ((progress != NULL) && (((progress_every > 0) && ((it % progress_every) == 0)) || (it == Tr1)))
+                    if (progress(progress_data, it, acc_it - acc_it_start, U) != 0) {
+                        Tr1 = it;
+                        break;
+                    }
+
             }
 
-            fclose(fptr);
+            if (acc_it0 != NULL)
+                *acc_it0 = acc_it;
+
+            out->close();
 
 #ifdef DEBUGG
             fclose(recacc);
@@ -724,7 +904,7 @@ public:
             sec = time(NULL);
             if (silent == 0)
                 printf("twalk: Finished, %4.1f%% of moved pars per iteration, ratio (%f/%d). Output in file %s,\n      %s\n",
-                       100.0 * (acc / (double) Tr1), acc, Tr1, filename, ctime(&sec));
+                       100.0 * (acc / (double) Tr1), acc, Tr1, out->name(), ctime(&sec));
 
             return (int) rint(acc);
 
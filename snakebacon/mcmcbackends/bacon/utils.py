@@ -1,5 +1,4 @@
 import numpy as np
-import scipy.stats as stats
 
 
 def d_cal(calibcurve, rcmean, w2, cutoff=0.0001, normal_distr=False, t_a=3, t_b=4):
@@ -31,6 +30,7 @@ def d_cal(calibcurve, rcmean, w2, cutoff=0.0001, normal_distr=False, t_a=3, t_b=
     assert t_b - 1 == t_a
     if normal_distr:
         # TODO(brews): Test this. Line 946 of Bacon.R.
+        import scipy.stats as stats
         std = np.sqrt(calibcurve.error ** 2 + w2)
         dens = stats.norm(loc=rcmean, scale=std).pdf(calibcurve.c14age)
     else:
@@ -49,7 +49,8 @@ def d_cal(calibcurve, rcmean, w2, cutoff=0.0001, normal_distr=False, t_a=3, t_b=
     return out
 
 
-def calibrate_dates(chron, calib_curve, d_r, d_std, cutoff=0.0001, normal_distr=False, t_a=[3], t_b=[4]):
+def calibrate_dates(chron, calib_curve, d_r, d_std, cutoff=0.0001, normal_distr=False, t_a=[3], t_b=[4], ragged=False,
+                    chunksize=None):
     """Get density of calendar dates for chron date segment in core
 
     Parameters
@@ -68,16 +69,25 @@ def calibrate_dates(chron, calib_curve, d_r, d_std, cutoff=0.0001, normal_distr=
         Student's t-distribution parameter, a. t_a - 1 must equal t_b.
     t_b : scalar or ndarray, optional
         Student's t-distribution parameter, b. t_a - 1 must equal t_b.
+    ragged : Bool, optional
+        If True, return densities packed into a single CalibratedDates instead of a list of arrays.
+    chunksize : int, optional
+        Number of determinations to evaluate against a calibration curve at once. Default keeps each chunk small
+        enough (about 256 kB) to stay in cache.
 
     Returns
     -------
     depth : ndarray
         Depth of dated sediment sample.
-    probs : list of 2d arrays
+    probs : list of 2d arrays, or CalibratedDates
         Density of calendar age for each dated sediment sample. For each
         sediment sample, the 2d array has two columns, the first is the
         calendar age. The second column is the density for that calendar age.
 
+    Notes
+    -----
+    Determinations that share a calibration curve are evaluated together, in chunks of (determination, curve row)
+    arrays. The results are the same as calling `d_cal()` for each determination.
     """
     # Python version of .bacon.calib() on line 908 in Bacon.R
 
@@ -98,7 +108,7 @@ def calibrate_dates(chron, calib_curve, d_r, d_std, cutoff=0.0001, normal_distr=
     calib_curve = np.array(calib_curve)
     t_a = np.array(t_a)
     t_b = np.array(t_b)
-    assert t_b - 1 == t_a
+    assert np.all(t_b - 1 == t_a)
     d_r = np.array(d_r)
     d_std = np.array(d_std)
     if len(t_a) == 1:
@@ -112,12 +122,120 @@ def calibrate_dates(chron, calib_curve, d_r, d_std, cutoff=0.0001, normal_distr=
     if len(calib_curve) == 1:
         calib_curve = np.repeat(calib_curve, n)
 
-    calib_probs = []
-    rcmean = chron.age - d_r
-    w2 = chron.error ** 2 + d_std ** 2
+    rcmean = np.asarray(chron.age - d_r)
+    w2 = np.asarray(chron.error ** 2 + d_std ** 2)
+
+    # Group determinations by calibration curve, so each curve is read once.
+    groups = dict()
     for i in range(n):
-        age_realizations = d_cal(calib_curve[i], rcmean=rcmean[i], w2=w2[i],
-                                 t_a=t_a[i], t_b=t_b[i],
-                                 cutoff=cutoff, normal_distr=normal_distr)
-        calib_probs.append(age_realizations)
+        groups.setdefault(id(calib_curve[i]), []).append(i)
+
+    calib_probs = [None] * n
+    for idx in groups.values():
+        cc = calib_curve[idx[0]]
+        c14age = np.asarray(cc.c14age)
+        error2 = np.asarray(cc.error) ** 2
+        calbp = np.asarray(cc.calbp, dtype='float64')
+        if chunksize is None:
+            step = max(1, 2 ** 15 // max(len(calbp), 1))
+        else:
+            step = int(chunksize)
+        for j in range(0, len(idx), step):
+            chunk = np.array(idx[j:j + step])
+            for i, age_realizations in zip(chunk, _d_cal_many(calbp, c14age, error2, rcmean=rcmean[chunk],
+                                                               w2=w2[chunk], t_a=t_a[chunk], t_b=t_b[chunk],
+                                                               cutoff=cutoff, normal_distr=normal_distr)):
+                calib_probs[i] = age_realizations
+
+    if ragged:
+        calib_probs = CalibratedDates.from_list(calib_probs)
     return np.array(chron.depth), calib_probs
+
+
+def _d_cal_many(calbp, c14age, error2, rcmean, w2, cutoff, normal_distr, t_a, t_b):
+    """Get calendar date probabilities for several determinations against one calibration curve
+
+    Same as `d_cal()`, but takes the curve's calbp, c14age and squared error, and rcmean, w2, t_a and t_b are 1d
+    arrays with one value per determination. Returns a list of 2d arrays.
+    """
+    rcmean = rcmean[:, np.newaxis]
+    w2 = w2[:, np.newaxis]
+    # Same operations as d_cal(), done in place on (determination, curve row) arrays.
+    var = error2 + w2
+    if normal_distr:
+        import scipy.stats as stats
+        dens = stats.norm(loc=rcmean, scale=np.sqrt(var)).pdf(c14age)
+    else:
+        dens = np.subtract(rcmean, c14age, dtype='float64')
+        np.square(dens, out=dens)
+        var *= 2
+        dens /= var
+        dens += t_b[:, np.newaxis]
+        if np.all(t_a == t_a[0]):
+            np.power(dens, -1 * (t_a[0] + 0.5), out=dens)
+        else:
+            np.power(dens, -1 * (t_a[:, np.newaxis] + 0.5), out=dens)
+    dens /= dens.sum(axis=1, keepdims=True)
+
+    out = []
+    cutoff_mask = dens > cutoff
+    n_over = cutoff_mask.sum(axis=1)
+    calx = None
+    for i in range(dens.shape[0]):
+        if n_over[i] > 5:
+            out.append(np.array([calbp[cutoff_mask[i]], dens[i, cutoff_mask[i]]]).T)
+        else:
+            # "ensure that also very precise dates get a range of probabilities"
+            if calx is None:
+                calx = np.linspace(calbp.min(), calbp.max(), num=50)
+            caly = np.interp(calx, calbp, dens[i])
+            out.append(np.array([calx, caly / caly.sum()]).T)
+    return out
+
+
+class CalibratedDates:
+    def __init__(self, calbp, density, indptr):
+        """Calendar age densities for many determinations, packed into flat arrays
+
+        Parameters
+        ----------
+        calbp : ndarray
+            Calendar ages for all determinations, one after another.
+        density : ndarray
+            Density at each calendar age in `calbp`.
+        indptr : ndarray
+            Determination i has values `calbp[indptr[i]:indptr[i + 1]]`, as in CSR sparse matrices.
+        """
+        self.calbp = np.asarray(calbp)
+        self.density = np.asarray(density)
+        self.indptr = np.asarray(indptr)
+
+    @classmethod
+    def from_list(cls, probs):
+        """Pack a list of 2d (calbp, density) arrays"""
+        indptr = np.zeros(len(probs) + 1, dtype='int64')
+        indptr[1:] = np.cumsum([len(p) for p in probs])
+        if len(probs) == 0:
+            return cls(np.empty(0), np.empty(0), indptr)
+        packed = np.concatenate(probs)
+        return cls(packed[:, 0], packed[:, 1], indptr)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, i):
+        """Get 2d array (calbp, density) for determination i"""
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('determination index out of range')
+        sl = slice(self.indptr[i], self.indptr[i + 1])
+        return np.array([self.calbp[sl], self.density[sl]]).T
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_list(self):
+        """Unpack into a list of 2d (calbp, density) arrays"""
+        return list(self)
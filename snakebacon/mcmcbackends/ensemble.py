@@ -0,0 +1,332 @@
+"""
+Bacon age-depth model energy in NumPy, sampled with an affine-invariant ensemble sampler.
+
+The energy is the BaconFix energy of the bacon C++ code (bacon.h), without hiatuses, evaluated for many positions
+at once. The sampler is the stretch move of Goodman & Weare (2010), updating half of the walkers at a time
+against the other half, as in Foreman-Mackey et al. (2013) "emcee: The MCMC Hammer".
+"""
+import logging
+import time
+
+import numpy as np
+
+from snakebacon import profiling
+from .bacon import fetch_calibcurve
+
+
+log = logging.getLogger(__name__)
+
+
+class BaconEnergy:
+    def __init__(self, core_labid, core_age, core_error, core_depth, *, depth_min, depth_max, cc, d_r, d_std, k,
+                 minyr, maxyr, mem_strength, mem_mean, acc_shape, acc_mean, t_a=None, t_b=None, cc1='IntCal13',
+                 cc2='Marine13', cc3='SHCal13', cc4='ConstCal', postbomb=0, normal=False, **kwargs):
+        """Bacon energy (negative log posterior density) of age-depth model parameters
+
+        Takes the core dates and MCMC parameters of `run_baconmcmc()`. Other MCMC parameters in kwargs are ignored.
+
+        Parameters are x[0], the age at depth_min, x[1] to x[k], the accumulation rates (yr/cm) of the k segments
+        from the top down, and x[k + 1], the memory w. This is the parameter vector of the bacon twalk, and
+        energies are the same as its 'objective' output.
+        """
+        if postbomb:
+            raise ValueError('postbomb calibration curves are not supported')
+        core_labid = np.asarray(core_labid)
+        core_age = np.asarray(core_age, dtype='float64')
+        core_error = np.asarray(core_error, dtype='float64')
+        core_depth = np.asarray(core_depth, dtype='float64')
+        n = len(core_depth)
+        self.top_error = float(core_error[np.argmin(core_depth)])
+        cc = np.broadcast_to(np.asarray(cc, dtype=int), (n,)).copy()
+        d_r = np.broadcast_to(np.asarray(d_r, dtype='float64'), (n,)).copy()
+        d_std = np.broadcast_to(np.asarray(d_std, dtype='float64'), (n,)).copy()
+        t_a = np.broadcast_to(np.asarray([3] if t_a is None else t_a, dtype='float64'), (n,))
+        t_b = np.broadcast_to(np.asarray([4] if t_b is None else t_b, dtype='float64'), (n,))
+
+        # Pin the ends of the model with vague dates, as `_baconin_str()` does.
+        pin_error = np.max([1e4, np.max(100 * core_error)])
+        if depth_min < np.min(core_depth):
+            core_age = np.insert(core_age, 0, np.min(core_age))
+            core_error = np.insert(core_error, 0, pin_error)
+            core_depth = np.insert(core_depth, 0, depth_min)
+            cc, d_r, d_std = (np.insert(a, 0, 0) for a in (cc, d_r, d_std))
+            t_a, t_b = (np.insert(a, 0, a[0]) for a in (t_a, t_b))
+        if depth_max > np.max(core_depth):
+            core_age = np.append(core_age, np.max(core_age))
+            core_error = np.append(core_error, pin_error)
+            core_depth = np.append(core_depth, depth_max)
+            cc, d_r, d_std = (np.append(a, 0) for a in (cc, d_r, d_std))
+            t_a, t_b = (np.append(a, a[-1]) for a in (t_a, t_b))
+        # Non-14C values do not have C-reservoir adjustments.
+        d_r[cc == 0] = 0
+        d_std[cc == 0] = 0
+
+        self.k = int(k)
+        self.dim = self.k + 2
+        self.c0 = float(depth_min)
+        self.dc = (float(depth_max) - self.c0) / self.k
+        self.minyr = float(minyr)
+        self.maxyr = float(maxyr)
+        self.normal = bool(normal)
+        self._c = self.c0 + np.arange(self.k + 1) * self.dc
+        self._cdiff = np.diff(self._c)
+
+        # Determinations, reservoir corrected.
+        self._y = core_age - d_r
+        self._vr = core_error ** 2 + d_std ** 2
+        self._t_a = np.asarray(t_a, dtype='float64')
+        self._t_b = np.asarray(t_b, dtype='float64')
+        # Segment of each determination, extrapolating from the end segments outside them.
+        self._seg = np.clip(np.floor((core_depth - self.c0) / self.dc).astype(int), 0, self.k - 1)
+        self._offset = core_depth - self._c[self._seg]
+
+        # Calibration curves of the determinations, as knots with slopes for linear interpolation.
+        names = {0: 'ConstCal', 1: str(cc1), 2: str(cc2), 3: str(cc3), 4: str(cc4)}
+        self._curves = []
+        for i in np.unique(cc):
+            idx = np.flatnonzero(cc == i)
+            name = names[int(i)]
+            knots = None
+            if name != 'ConstCal':
+                knots = _curve_knots(fetch_calibcurve(name))
+            self._curves.append((idx, knots))
+
+        # Priors: beta for the memory, gamma for the accumulation rates.
+        self.w_a = mem_strength * mem_mean
+        self.w_b = mem_strength * (1 - mem_mean)
+        self.acc_alpha = float(acc_shape)
+        self.acc_beta = acc_shape / acc_mean
+
+    def __repr__(self):
+        return '%s(k=%r, n_dates=%r)' % (type(self).__name__, self.k, len(self._y))
+
+    def __call__(self, x):
+        """Get energy of parameters x, a 2d array (position, parameter) or a single position
+
+        Positions out of the support, including ages at depth_min before minyr, have infinite energy.
+        """
+        x = np.asarray(x, dtype='float64')
+        single = x.ndim == 1
+        x = np.atleast_2d(x)
+        k = self.k
+        w = x[:, k + 1]
+        support = (w > 0) & (w < 1) & (x[:, k] > 0) & (x[:, 0] >= self.minyr)
+        support[support] = np.all(x[support, 1:k] > w[support, np.newaxis] * x[support, 2:k + 1], axis=1)
+        u = np.full(len(x), np.inf)
+        if np.any(support):
+            x = x[support]
+            w = x[:, k + 1]
+            rates = x[:, 1:k + 1]
+            e = (rates[:, :-1] - w[:, np.newaxis] * rates[:, 1:]) / (1 - w)[:, np.newaxis]
+            u[support] = self._prior(w, rates[:, -1], e) + self._likelihood(x[:, 0], rates)
+        if single:
+            return u[0]
+        return u
+
+    def ages(self, x):
+        """Get 2d array (position, segment boundary) of ages at the k + 1 segment boundaries for parameters x"""
+        x = np.atleast_2d(np.asarray(x, dtype='float64'))
+        out = np.empty((len(x), self.k + 1))
+        out[:, 0] = x[:, 0]
+        np.cumsum(x[:, 1:self.k + 1] * self._cdiff, axis=1, out=out[:, 1:])
+        out[:, 1:] += x[:, :1]
+        return out
+
+    def _prior(self, w, x_k, e):
+        """Prior energy of memory w, the bottom accumulation rate x_k, and the innovations e of the others"""
+        ds = 1.0 / self.dc
+        logw = np.log(w)
+        out = ds * (1 - self.w_a) * logw + (1 - self.w_b) * np.log(1 - np.exp(ds * logw))
+        out += (1 - self.acc_alpha) * np.log(x_k) + self.acc_beta * x_k
+        out += np.sum((1 - self.acc_alpha) * np.log(e) + self.acc_beta * e, axis=1)
+        return out
+
+    def _likelihood(self, theta0, rates):
+        """Likelihood energy of the determinations for ages theta0 at depth_min and segment rates"""
+        theta = self.ages(np.column_stack([theta0, rates]))
+        age = theta[:, self._seg] + rates[:, self._seg] * self._offset
+        out = np.zeros(len(theta0))
+        for idx, knots in self._curves:
+            y = self._y[idx]
+            vr = self._vr[idx]
+            t = age[:, idx]
+            if knots is None:
+                # ConstCal
+                d2 = 0.5 * (y - t) ** 2 / vr
+                if self.normal:
+                    out += np.sum(d2, axis=1)
+                    continue
+            else:
+                mu, sig = _interp_curve(knots, t)
+                tau = 1 / (vr + sig ** 2)
+                d2 = tau * 0.5 * (y - mu) ** 2
+                if self.normal:
+                    out += np.sum(0.5 * np.log(2 * np.pi) - 0.5 * np.log(tau) + d2, axis=1)
+                    continue
+            out += np.sum((self._t_a[idx] + 0.5) * np.log(self._t_b[idx] + d2), axis=1)
+        return out
+
+    def sample_prior(self, n, theta_mean, theta_sd, random_state):
+        """Draw n positions with rates and memory from their priors, and normal ages at depth_min
+
+        Ages at depth_min before minyr are moved to minyr.
+        """
+        k = self.k
+        x = np.empty((n, self.dim))
+        x[:, 0] = np.maximum(random_state.normal(theta_mean, theta_sd, size=n), self.minyr)
+        w = random_state.beta(self.w_a, self.w_b, size=n)
+        x[:, k + 1] = w
+        x[:, k] = random_state.gamma(self.acc_alpha, 1 / self.acc_beta, size=n)
+        for j in range(k - 1, 0, -1):
+            x[:, j] = w * x[:, j + 1] + (1 - w) * random_state.gamma(self.acc_alpha, 1 / self.acc_beta, size=n)
+        return x
+
+
+def _curve_knots(curve):
+    """Get (start, step, c14age, error, c14age slope, error slope) of a CalibCurve for `_interp_curve()`
+
+    Knots are in increasing calbp. If the knot spacings are all multiples of the smallest one, the curve is
+    resampled to that spacing, which is exact for a piecewise linear curve, and step is that spacing. Otherwise
+    step is None, and start is the array of knot calbp.
+    """
+    order = np.argsort(curve.calbp, kind='mergesort')
+    calbp = np.asarray(curve.calbp, dtype='float64')[order]
+    mu = np.asarray(curve.c14age, dtype='float64')[order]
+    sig = np.asarray(curve.error, dtype='float64')[order]
+    start = calbp
+    step = np.min(np.diff(calbp))
+    n_steps = np.round((calbp - calbp[0]) / step)
+    if step > 0 and np.allclose(calbp, calbp[0] + n_steps * step, rtol=0, atol=1e-6 * step):
+        grid = calbp[0] + np.arange(int(n_steps[-1]) + 1) * step
+        mu = np.interp(grid, calbp, mu)
+        sig = np.interp(grid, calbp, sig)
+        start = calbp[0]
+        calbp = grid
+    else:
+        step = None
+    dmu = np.diff(mu) / np.diff(calbp)
+    dsig = np.diff(sig) / np.diff(calbp)
+    return start, step, mu, sig, np.append(dmu, dmu[-1]), np.append(dsig, dsig[-1])
+
+
+def _interp_curve(knots, theta):
+    """Get c14 mean and sd of a calibration curve at calendar ages theta, extrapolating from the end knots"""
+    start, step, mu, sig, dmu, dsig = knots
+    if step is None:
+        i = np.searchsorted(start, theta, side='right') - 1
+    else:
+        i = np.floor((theta - start) / step).astype(int)
+    np.clip(i, 0, len(mu) - 2, out=i)
+    if step is None:
+        dt = theta - start[i]
+    else:
+        dt = theta - (start + i * step)
+    return mu[i] + dt * dmu[i], sig[i] + dt * dsig[i]
+
+
+# twalk run options without an ensemble counterpart.
+_UNSUPPORTED = ('state', 'checkpoint', 'checkpoint_every', 'target_ess')
+
+
+def run_ensemblemcmc(core_labid, core_age, core_error, core_depth, *, th01, th02, ssize=2000, n_walkers=None,
+                     thin=None, warmup=None, stretch=2.0, seed=None, max_iterations=None, time_budget=None, **kwargs):
+    """Run the Bacon age-depth model with an affine-invariant ensemble sampler
+
+    Parameters
+    ----------
+    core_labid, core_age, core_error, core_depth :
+        Core dates, as for `run_baconmcmc()`.
+    th01, th02 : float
+        Range of starting ages at depth_min.
+    ssize : int, optional
+        Number of ensemble members to return, after 200 members of burn-in, as for bacon.
+    n_walkers : int, optional
+        Number of walkers. Even, and at least 2 * (k + 2). Default is 4 * (k + 2).
+    thin : int, optional
+        Number of sampler steps between saved walker positions. Default is k + 2.
+    warmup : int, optional
+        Number of sampler steps before positions are saved. Default is 150 * (k + 2).
+    stretch : float, optional
+        Scale parameter of the stretch move.
+    seed : int, optional
+        Seed for the sampler.
+    max_iterations : int, optional
+        Stop after about max_iterations walker moves.
+    time_budget : float, optional
+        Stop after about time_budget seconds. It is checked each time positions are saved.
+    **kwargs :
+        MCMC parameters for `BaconEnergy`. twalk output options, such as `silent` or `in_memory`, are ignored.
+        Passing `state`, `checkpoint`, `checkpoint_every` or `target_ess` raises ValueError.
+
+    Returns
+    -------
+    Dictionary of output, as from `read_baconout()`: 'theta', 'x', 'w' and 'objective' (Bacon energy). Each saved
+    step adds the positions of all walkers, so successive members come from different walkers. Also
+    'acceptance_rate', the fraction of moves accepted.
+    """
+    unsupported = [k for k in _UNSUPPORTED if kwargs.get(k) is not None]
+    if unsupported:
+        raise ValueError('ensemble sampler does not support {0}'.format(', '.join(unsupported)))
+    with profiling.stage('ensemble_setup'):
+        energy = BaconEnergy(core_labid, core_age, core_error, core_depth, **kwargs)
+    dim = energy.dim
+    if n_walkers is None:
+        n_walkers = 4 * dim
+    if n_walkers < 2 * dim or n_walkers % 2:
+        raise ValueError('n_walkers must be even and at least 2 * (k + 2) = {0}'.format(2 * dim))
+    if thin is None:
+        thin = dim
+    if warmup is None:
+        warmup = 150 * dim
+    random_state = np.random.RandomState(seed)
+
+    # Walkers start from the prior, with ages at depth_min spread around th01 and th02 by at least the error of the
+    # top date, as rbacon draws th01 and th02. The stretch move cannot spread walkers in directions they start
+    # out flat in.
+    theta_mean = (th01 + th02) / 2
+    theta_sd = max(abs(th01 - th02), energy.top_error)
+    x = energy.sample_prior(n_walkers, theta_mean, theta_sd, random_state)
+    u = energy(x)
+    while not np.all(np.isfinite(u)):
+        bad = ~np.isfinite(u)
+        x[bad] = energy.sample_prior(np.sum(bad), theta_mean, theta_sd, random_state)
+        u[bad] = energy(x[bad])
+
+    n_saves = -(-(int(ssize) + 200) // n_walkers)
+    n_steps = warmup + n_saves * thin
+    if max_iterations is not None:
+        n_steps = min(n_steps, max(1, int(max_iterations) // n_walkers))
+    saved = []
+    n_accepted = 0
+    start = time.monotonic()
+    half = n_walkers // 2
+    with profiling.stage('ensemble'):
+        for step in range(1, n_steps + 1):
+            for first in (0, half):
+                active = slice(first, first + half)
+                zs = ((stretch - 1) * random_state.uniform(size=half) + 1) ** 2 / stretch
+                partner = x[half - first:n_walkers - first][random_state.randint(half, size=half)]
+                proposal = partner + zs[:, np.newaxis] * (x[active] - partner)
+                u_prop = energy(proposal)
+                log_accept = (dim - 1) * np.log(zs) - (u_prop - u[active])
+                accept = np.log(random_state.uniform(size=half)) < log_accept
+                idx = np.flatnonzero(accept) + first
+                x[idx] = proposal[accept]
+                u[idx] = u_prop[accept]
+                n_accepted += len(idx)
+            if step > warmup and (step - warmup) % thin == 0:
+                saved.append(np.column_stack([x, u]))
+                if time_budget is not None and time.monotonic() - start > time_budget:
+                    log.debug('Ensemble sampler stopped at step %d of %d for time_budget', step, n_steps)
+                    break
+
+    if saved:
+        values = np.concatenate(saved)
+    else:
+        values = np.empty((0, dim + 1))
+    out = {'theta': values[:, 0],
+           'x': values[:, 1:-2].T,
+           'w': values[:, -2],
+           'objective': values[:, -1],
+           'acceptance_rate': n_accepted / max(1, step * n_walkers)}
+    return out
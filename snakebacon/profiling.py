@@ -0,0 +1,175 @@
+"""Stage timings for fits
+
+Fits time their stages (writing bacon input, the twalk, parsing output, burn-in, building the age ensemble...) with
+`stage()`. Each finished stage is a StageTiming, which is
+
+- added to every Timings being recorded with `record()`. McmcResults and AgeDepthModel keep theirs in `timings`.
+- logged at DEBUG level to the 'snakebacon.profiling' logger.
+- passed to each callback added with `add_callback()`.
+
+A stage costs a few clock reads, so timings are always on.
+"""
+import contextlib
+import cProfile
+import logging
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+log = logging.getLogger(__name__)
+
+_local = threading.local()
+_callbacks = []
+
+
+class StageTiming:
+    def __init__(self, name, wall, cpu, max_rss=None):
+        """Timing of a single stage
+
+        Parameters
+        ----------
+        name : str
+            Stage name.
+        wall : float
+            Wall time of the stage, in seconds.
+        cpu : float
+            CPU time of the process during the stage, in seconds. This includes other threads that were running at
+            the same time.
+        max_rss : int, optional
+            Peak resident memory of the process at the end of the stage, in bytes. None if not available.
+        """
+        self.name = name
+        self.wall = wall
+        self.cpu = cpu
+        self.max_rss = max_rss
+
+    def __repr__(self):
+        return '%s(name=%r, wall=%r, cpu=%r, max_rss=%r)' % (type(self).__name__, self.name, self.wall, self.cpu,
+                                                             self.max_rss)
+
+
+class Timings:
+    def __init__(self):
+        """Stage timings, in the order stages finished
+
+        Attributes
+        ----------
+        stages : list of StageTiming
+        profile : cProfile.Profile or None
+            Profile of the recording, if it was recorded with `record(profile=True)`.
+        """
+        self.stages = []
+        self.profile = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.stages)
+
+    def __iter__(self):
+        return iter(self.stages)
+
+    def __len__(self):
+        return len(self.stages)
+
+    def add(self, stage):
+        """Add a finished StageTiming"""
+        self.stages.append(stage)
+
+    def wall(self, name):
+        """Get total wall time of stages named name
+
+        Stages nest (the 'twalk' stages are inside 'mcmc'), so totals of different stages can overlap.
+        """
+        return sum(s.wall for s in self.stages if s.name == name)
+
+    def cpu(self, name):
+        """Get total CPU time of stages named name"""
+        return sum(s.cpu for s in self.stages if s.name == name)
+
+    def to_pandas(self):
+        """Get pandas.DataFrame with one row per stage, in the order stages finished"""
+        import pandas as pd
+        return pd.DataFrame({'stage': [s.name for s in self.stages],
+                             'wall': [s.wall for s in self.stages],
+                             'cpu': [s.cpu for s in self.stages],
+                             'max_rss': [s.max_rss for s in self.stages]})
+
+
+def add_callback(func):
+    """Call func(StageTiming) for every stage that finishes, in the thread that ran it"""
+    _callbacks.append(func)
+
+
+def remove_callback(func):
+    """Stop calling func added with `add_callback()`"""
+    _callbacks.remove(func)
+
+
+@contextlib.contextmanager
+def record(timings=None, profile=False):
+    """Record timings of stages run in the block, in the current thread
+
+    Recordings nest, so a stage is added to every Timings being recorded.
+
+    Parameters
+    ----------
+    timings : Timings, optional
+        Timings to add stages to. Default is a new Timings.
+    profile : bool, optional
+        If True, also run cProfile over the block, and keep the profile in `timings.profile`.
+
+    Yields
+    ------
+    Timings
+    """
+    if timings is None:
+        timings = Timings()
+    outer = _active()
+    _local.active = outer + (timings,)
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield timings
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            timings.profile = profiler
+        _local.active = outer
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Time the block as stage name"""
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield
+    finally:
+        out = StageTiming(name, time.perf_counter() - wall, time.process_time() - cpu, _max_rss())
+        for timings in _active():
+            timings.add(out)
+        log.debug('%s: %.3f s wall, %.3f s cpu', name, out.wall, out.cpu)
+        for func in list(_callbacks):
+            func(out)
+
+
+def _active():
+    """Timings being recorded in the current thread"""
+    return getattr(_local, 'active', ())
+
+
+def _max_rss():
+    """Peak resident memory of the process in bytes, or None if not available"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return rss
+    return rss * 1024
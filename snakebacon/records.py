@@ -1,11 +1,9 @@
 import logging
+import os
+import pathlib
 
-import matplotlib.pylab as plt
 import numpy as np
 import pandas as pd
-import scipy.stats as stats
-from matplotlib.collections import PatchCollection
-from matplotlib.patches import Polygon
 
 
 log = logging.getLogger(__name__)
@@ -24,10 +22,27 @@ def read_14c(fl):
     return outcurve
 
 
+# Columns of Bacon core date files and their types.
+_CHRON_DTYPES = {'labID': str, 'age': 'float64', 'error': 'float64', 'depth': 'float64'}
+
+_TABLE_FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.feather': 'feather', '.npz': 'npz'}
+
+
 def read_chron(fl):
     """Create ChronRecord instance from Bacon file
+
+    Parameters
+    ----------
+    fl : str or file-like
+        Comma-separated file with 'labID', 'age', 'error' and 'depth' columns, or a Parquet ('.parquet', '.pq'),
+        Feather ('.feather') or NumPy ('.npz') file with those columns. See `read_proxy()`.
+
+    Returns
+    -------
+    ChronRecord
     """
-    indata = pd.read_csv(fl, sep=r'\s*\,\s*', index_col=None, engine='python')
+    indata = _read_table(fl)
+    indata = indata[list(_CHRON_DTYPES)].astype(_CHRON_DTYPES)
     outcore = ChronRecord(age=indata['age'],
                           error=indata['error'],
                           depth=indata['depth'],
@@ -35,11 +50,86 @@ def read_chron(fl):
     return outcore
 
 
-def read_proxy(fl):
+def read_proxy(fl, chunksize=None):
     """Read a file to create a proxy record instance
+
+    Parameters
+    ----------
+    fl : str, pathlib.Path or file-like
+        Comma-separated file with a 'depth' column, and a column for each proxy. Whitespace around values and column
+        names is dropped. Files ending in '.parquet' or '.pq' are read as Parquet, '.feather' as Feather (both need
+        pyarrow), and '.npz' as a NumPy archive with one array per column. The ending of a file-like object is taken
+        from its `name`, if it has one.
+    chunksize : int, optional
+        If given, return an iterator of ProxyRecords of up to chunksize rows, read from the file as they are used.
+
+    Returns
+    -------
+    ProxyRecord, or iterator of ProxyRecord if chunksize is given.
+
+    Examples
+    --------
+    Date a large proxy file without reading all of it at once:
+
+    >>> for i, proxy in enumerate(read_proxy('proxies.csv', chunksize=100000)):  # doctest: +SKIP
+    ...     model.date(proxy).to_csv('dated_{0}.csv'.format(i))
     """
-    outcore = ProxyRecord(data=pd.read_csv(fl, sep=r'\s*\,\s*', index_col=None, engine='python'))
-    return outcore
+    if chunksize is None:
+        return ProxyRecord(data=_proxy_types(_read_table(fl)))
+    return (ProxyRecord(data=_proxy_types(df)) for df in _read_table(fl, chunksize=chunksize))
+
+
+def _proxy_types(data):
+    """Cast proxy record depths to float"""
+    data['depth'] = data['depth'].astype('float64')
+    return data
+
+
+def _read_table(fl, chunksize=None):
+    """Read table file fl to a DataFrame, or an iterator of DataFrames of up to chunksize rows
+
+    The format comes from the file extension, see `read_proxy()`. Comma-separated files are parsed by pandas' C
+    parser, and whitespace is stripped from column names and text columns afterwards.
+    """
+    if isinstance(fl, pathlib.PurePath):
+        fl = str(fl)
+    name = fl if isinstance(fl, str) else getattr(fl, 'name', None)
+    fmt = 'csv'
+    if isinstance(name, str):
+        fmt = _TABLE_FORMATS.get(os.path.splitext(name)[1].lower(), 'csv')
+
+    if fmt == 'csv':
+        out = pd.read_csv(fl, index_col=None, skipinitialspace=True, chunksize=chunksize)
+        if chunksize is None:
+            return _strip_table(out)
+        return (_strip_table(df) for df in out)
+
+    if fmt == 'parquet':
+        if chunksize is None:
+            return pd.read_parquet(fl)
+        import pyarrow.parquet as pq
+        return (batch.to_pandas() for batch in pq.ParquetFile(fl).iter_batches(batch_size=chunksize))
+
+    if fmt == 'feather':
+        if chunksize is None:
+            return pd.read_feather(fl)
+        import pyarrow.feather
+        table = pyarrow.feather.read_table(fl, memory_map=True)
+        return (table.slice(start, chunksize).to_pandas() for start in range(0, table.num_rows, chunksize))
+
+    with np.load(fl, allow_pickle=False) as npz:
+        out = pd.DataFrame({name: npz[name] for name in npz.files})
+    if chunksize is None:
+        return out
+    return (out.iloc[start:start + chunksize].reset_index(drop=True) for start in range(0, len(out), chunksize))
+
+
+def _strip_table(df):
+    """Strip whitespace from column names and text columns of DataFrame df, in place"""
+    df.columns = [c.strip() if isinstance(c, str) else c for c in df.columns]
+    for c in df.columns[df.dtypes == object]:
+        df[c] = df[c].str.strip()
+    return df
 
 
 class ProxyRecord:
@@ -60,7 +150,7 @@ class ProxyRecord:
 
 
 class DatedProxyRecord(ProxyRecord):
-    def __init__(self, data, age):
+    def __init__(self, data, age, quantiles=None):
         """Create a dated proxy record instance
 
         Parameters
@@ -70,12 +160,21 @@ class DatedProxyRecord(ProxyRecord):
         age : iterable
             Iterable containing calendar year, or a list of years (cal yr BP) for corresponding to each sample depth in
             data.depth.
+        quantiles : iterable, optional
+            If given, each column of `age` is the age at this percentile of the MCMC ensemble, rather than an ensemble
+            member.
         """
         super().__init__(data)
         assert len(data.depth) == len(age)
-        self.age = np.array(age)
+        self.age = np.ascontiguousarray(age)
+        self.quantiles = None
+        if quantiles is not None:
+            self.quantiles = np.asarray(quantiles)
+            assert self.age.shape[1:] == self.quantiles.shape
 
     def __repr__(self):
+        if self.quantiles is not None:
+            return '%s(data=%r, age=%r, quantiles=%r)' % (type(self).__name__, self.data, self.age, self.quantiles)
         return '%s(data=%r, age=%r)' % (type(self).__name__, self.data, self.age)
 
     def n_members(self):
@@ -87,17 +186,109 @@ class DatedProxyRecord(ProxyRecord):
         return n
 
     def to_pandas(self):
-        """Convert record to pandas.DataFrame"""
+        """Convert record to pandas.DataFrame
+
+        Ensemble ages are melted into an 'mciter' column, or into a 'quantile' column if the record holds quantiles.
+        """
         agedepthdf = pd.DataFrame(self.age, index=self.data.depth)
-        agedepthdf.columns = list(range(self.n_members()))
+        if self.quantiles is not None:
+            var_name = 'quantile'
+            agedepthdf.columns = list(self.quantiles)
+        else:
+            var_name = 'mciter'
+            agedepthdf.columns = list(range(self.n_members()))
         out = (agedepthdf.join(self.data.set_index('depth'))
                .reset_index()
-               .melt(id_vars=self.data.columns.values, var_name='mciter', value_name='age'))
-        out['mciter'] = pd.to_numeric(out.loc[:, 'mciter'])
-        if self.n_members() == 1:
+               .melt(id_vars=self.data.columns.values, var_name=var_name, value_name='age'))
+        out[var_name] = pd.to_numeric(out.loc[:, var_name])
+        if self.n_members() == 1 and self.quantiles is None:
             out = out.drop('mciter', axis=1)
         return out
 
+    def iter_pandas(self, chunksize=None):
+        """Convert record to long-format pandas.DataFrames, a chunk of depths at a time
+
+        Parameters
+        ----------
+        chunksize : int, optional
+            Number of depths in each chunk. Default gives about a million rows per DataFrame.
+
+        Yields
+        ------
+        DataFrame with the columns of `to_pandas()`, for each chunk of depths. Within a chunk, rows are ordered by
+        ensemble member (or quantile) and then depth, as in `to_pandas()`.
+        """
+        n = len(self.data)
+        m = self.n_members()
+        if self.quantiles is not None:
+            var_name = 'quantile'
+            var_values = self.quantiles
+        elif m > 1:
+            var_name = 'mciter'
+            var_values = np.arange(m)
+        else:
+            var_name = None
+        age = self.age.reshape(n, -1)
+        if chunksize is None:
+            chunksize = max(1, 2 ** 20 // m)
+
+        for start in range(0, n, chunksize):
+            chunk = slice(start, min(start + chunksize, n))
+            nrows = chunk.stop - chunk.start
+            out = {c: np.tile(self.data[c].values[chunk], m) for c in self.data.columns}
+            if var_name is not None:
+                out[var_name] = np.repeat(var_values, nrows)
+            out['age'] = age[chunk].T.ravel()
+            yield pd.DataFrame(out)
+
+    def to_csv(self, path, chunksize=None, **kwargs):
+        """Write long-format record to CSV, a chunk of depths at a time
+
+        Parameters
+        ----------
+        path : str
+            Path of output CSV file.
+        chunksize : int, optional
+            Number of depths to write at once. See `iter_pandas()`.
+        **kwargs :
+            Passed to `pandas.DataFrame.to_csv()`.
+        """
+        kwargs.setdefault('index', False)
+        mode = 'w'
+        header = True
+        for df in self.iter_pandas(chunksize=chunksize):
+            df.to_csv(path, mode=mode, header=header, **kwargs)
+            mode = 'a'
+            header = False
+
+    def to_parquet(self, path, chunksize=None):
+        """Write long-format record to Parquet, a chunk of depths at a time
+
+        Requires pyarrow. Each chunk is written as a row group.
+
+        Parameters
+        ----------
+        path : str
+            Path of output Parquet file.
+        chunksize : int, optional
+            Number of depths to write at once. See `iter_pandas()`.
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError('DatedProxyRecord.to_parquet() requires pyarrow')
+        writer = None
+        try:
+            for df in self.iter_pandas(chunksize=chunksize):
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
 
 class ChronRecord:
     def __init__(self, obj=None, **kwargs):
@@ -148,15 +339,22 @@ class CalibCurve:
         sigma : ndarray
 
         """
-        self.calbp = np.array(calbp)
-        self.c14age = np.array(c14age)
-        self.error = np.array(error)
+        self.calbp = np.asarray(calbp)
+        self.c14age = np.asarray(c14age)
+        self.error = np.asarray(error)
         if delta14c is None:
-            delta14c = np.zeros(calbp.shape)
-        self.delta14c = np.array(delta14c)  # d_R
+            delta14c = np.zeros(self.calbp.shape)
+        self.delta14c = np.asarray(delta14c)  # d_R
         if sigma is None:
-            sigma = np.zeros(calbp.shape)
-        self.sigma = np.array(sigma)  # d_R variance?
+            sigma = np.zeros(self.calbp.shape)
+        self.sigma = np.asarray(sigma)  # d_R variance?
+        self._reduce_to = None
 
     def __repr__(self):
         return '%s(calbp=%r, c14age=%r, error=%r, delta14c=%r, sigma=%r)' % (type(self).__name__, self.calbp, self.c14age, self.error, self.delta14c, self.sigma)
+
+    def __reduce_ex__(self, protocol):
+        # Curves from a registry are pickled as a call back into that registry.
+        if self._reduce_to is not None:
+            return self._reduce_to
+        return super().__reduce_ex__(protocol)
@@ -0,0 +1,23 @@
+"""MSB2K test core and MCMC parameters shared by the tests"""
+
+from os import path
+
+from snakebacon import read_chron
+
+
+here = path.abspath(path.dirname(__file__))
+msb2k_path = path.join(here, 'MSB2K.csv')
+
+mcmc_kws = dict(depth_min=1.5, depth_max=99.5, cc=[1],
+                cc1='IntCal13', cc2='Marine13', cc3='SHCal13', cc4='ConstCal',
+                d_r=[0], d_std=[0], t_a=[3], t_b=[4], k=20,
+                minyr=-1000, maxyr=1e6, th01=4147, th02=4145,
+                acc_mean=20, acc_shape=1.5, mem_strength=4, mem_mean=0.7)
+
+
+def baconmcmc_kws(**kwargs):
+    """Get `run_baconmcmc()` arguments for the MSB2K core dates and `mcmc_kws`, updated with kwargs"""
+    c = read_chron(msb2k_path)
+    out = dict(core_labid=c.labid, core_age=c.age, core_error=c.error, core_depth=c.depth, **mcmc_kws)
+    out.update(kwargs)
+    return out
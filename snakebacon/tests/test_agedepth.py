@@ -1,23 +1,19 @@
+import tempfile
 import unittest
 from copy import deepcopy
+from unittest import mock
 from os import path
 
 import numpy as np
 import pandas as pd
+import scipy.stats
 
 from snakebacon import read_chron, ProxyRecord
-from snakebacon.agedepth import AgeDepthModel
+from snakebacon.agedepth import AgeDepthModel, knot_ages
+from snakebacon.tests.common import mcmc_kws, msb2k_path
 
 
-here = path.abspath(path.dirname(__file__))
-
-mcmc_kws = dict(depth_min=1.5, depth_max=99.5, cc=[1],
-                   cc1='IntCal13', cc2='Marine13', cc3='SHCal13', cc4='ConstCal',
-                   d_r=[0], d_std=[0], t_a=[3], t_b=[4], k=20,
-                   minyr=-1000, maxyr=1e6, th01=4147, th02=4145,
-                   acc_mean=20, acc_shape=1.5, mem_strength=4, mem_mean=0.7)
-fullrun_agemodel = AgeDepthModel(read_chron(path.join(here, 'MSB2K.csv')),
-                                 mcmc_kws=mcmc_kws)
+fullrun_agemodel = AgeDepthModel(read_chron(msb2k_path), mcmc_kws=mcmc_kws)
 
 
 class TestAgeDepth(unittest.TestCase):
@@ -79,6 +75,55 @@ class TestAgeDepth(unittest.TestCase):
         np.testing.assert_allclose(victim.mean(), goal_mean, atol=10)
         np.testing.assert_allclose(victim.var(), goal_var, atol=550)
 
+    def test_agedepth_array(self):
+        depths = np.array([1.5, 2.5, 50.0, 99.5])
+        victim = self.testdummy.agedepth(depths)
+        self.assertTupleEqual((len(depths), self.testdummy.mcmcfit.n_members()), victim.shape)
+        for i, d in enumerate(depths):
+            np.testing.assert_array_equal(victim[i], self.testdummy.agedepth(d))
+
+    def test_agedepth_members(self):
+        depths = np.array([1.5, 2.5, 50.0, 99.5])
+        members = np.array([5, 0, 5, 10])
+        victim = self.testdummy.agedepth(depths, members=members)
+        np.testing.assert_array_equal(victim, self.testdummy.agedepth(depths)[:, members])
+
+    def test_agedepth_above_core(self):
+        with self.assertRaises(ValueError):
+            self.testdummy.agedepth(np.array([1.0, 2.5]))
+
+    def test_agedepth_knot_cache(self):
+        testproxy = ProxyRecord(pd.DataFrame({'depth': np.linspace(1.5, 99.5, 101), 'a': np.arange(101)}))
+        self.testdummy._knot_ages = None
+        with mock.patch('snakebacon.agedepth.knot_ages', wraps=knot_ages) as knot_mock:
+            self.testdummy.date(testproxy, how='ensemble', n=20, chunksize=7)
+            self.testdummy.agedepth(2.5)
+            self.assertEqual(1, knot_mock.call_count)
+            self.testdummy.mcmcfit.burnin(10)
+            victim = self.testdummy.agedepth(2.5)
+            self.assertEqual(2, knot_mock.call_count)
+        self.assertEqual(self.testdummy.mcmcfit.n_members(), len(victim))
+
+    def test_date_chunked(self):
+        testproxy = ProxyRecord(pd.DataFrame({'depth': np.linspace(1.5, 99.5, 101), 'a': np.arange(101)}))
+        for how in ['median', 'ensemble', 'quantiles']:
+            np.random.seed(123)
+            goal = self.testdummy.date(testproxy, how=how, n=20)
+            np.random.seed(123)
+            victim = self.testdummy.date(testproxy, how=how, n=20, chunksize=7)
+            np.testing.assert_array_equal(victim.age, goal.age)
+            self.assertEqual(victim.age.dtype, np.float64)
+            self.assertTrue(victim.age.flags.c_contiguous)
+
+    def test_date_quantiles(self):
+        testproxy = ProxyRecord(pd.DataFrame({'depth': np.arange(1.5, 4.5), 'a': np.arange(20, 23)}))
+        victim = self.testdummy.date(testproxy, how='quantiles', q=[2.5, 50, 97.5])
+        self.assertTupleEqual((3, 3), victim.age.shape)
+        np.testing.assert_array_equal(victim.quantiles, [2.5, 50, 97.5])
+        goal = self.testdummy.date(testproxy, how='median')
+        np.testing.assert_allclose(victim.age[:, 1], goal.age)
+        self.assertTrue(np.all(np.diff(victim.age, axis=1) >= 0))
+
     def test_prior_sediment_memory(self):
         goal_mean = 0.98457848264590286
         goal_std = 0.71613816177236256
@@ -102,6 +147,105 @@ class TestAgeDepth(unittest.TestCase):
         np.testing.assert_allclose(victim.mean(), goal_mean, atol=1e-3)
         np.testing.assert_allclose(victim.std(), goal_std, atol=1e-3)
 
+    def test_posterior_density(self):
+        victim, x = self.testdummy.posterior_density('sediment_rate')
+        np.testing.assert_array_equal(x, self.testdummy.prior_sediment_rate()[1])
+        goal = scipy.stats.gaussian_kde(self.testdummy.mcmcfit.sediment_rate.flat, bw_method=0.25)(x)
+        np.testing.assert_allclose(victim, goal, rtol=0, atol=1e-4 * goal.max())
+
+        x = np.linspace(0, 1, 11)
+        victim, _ = self.testdummy.posterior_density('sediment_memory', x)
+        goal = scipy.stats.gaussian_kde(self.testdummy.mcmcfit.sediment_memory ** (1 / self.testdummy.thick),
+                                        bw_method=0.25)(x)
+        np.testing.assert_allclose(victim, goal, rtol=0, atol=1e-4 * goal.max())
+        with self.assertRaises(ValueError):
+            self.testdummy.posterior_density('headage')
+
+    def test_summary_mode(self):
+        goal = deepcopy(fullrun_agemodel)
+        victim = deepcopy(fullrun_agemodel)
+        victim.keep_ensemble = False
+        victim.summary_q = (2.5, [10, 90])
+        victim._set_depth()
+        with mock.patch('snakebacon.agedepth._depth_chunksize', return_value=7):
+            np.testing.assert_array_equal(victim.age_median(), goal.age_median())
+        self.assertIsNone(victim._age_ensemble)
+        self.assertEqual(len(victim._age_summary), 3)
+        np.testing.assert_array_equal(victim.age_percentile(2.5), goal.age_percentile(2.5))
+        np.testing.assert_array_equal(victim.age_percentile([10, 90]), goal.age_percentile([10, 90]))
+        # Not in summary_q, computed in chunks when asked for.
+        np.testing.assert_array_equal(victim.age_percentile(75), goal.age_percentile(75))
+        np.testing.assert_array_equal(victim.age_ensemble, goal.age_ensemble)
+        self.assertIsNone(victim._age_ensemble)
+
+    def test_depth_grid(self):
+        victim = deepcopy(fullrun_agemodel)
+        victim.depth_grid = 0.5
+        victim._set_depth()
+        self.assertIsNone(victim._age_ensemble)
+        np.testing.assert_allclose(victim.depth, np.arange(1.5, 99.501, 0.5))
+        np.testing.assert_array_equal(victim.age_ensemble, victim.agedepth(victim.depth))
+        self.assertIsNotNone(victim._age_ensemble)
+
+        victim.depth_grid = [10, 20.5, 30]
+        victim._set_depth()
+        np.testing.assert_array_equal(victim.depth, [10, 20.5, 30])
+        self.assertTupleEqual(victim.age_median().shape, (3,))
+
+    def test_age_window(self):
+        goal = self.testdummy.age_ensemble
+        victim = deepcopy(fullrun_agemodel)
+        victim._set_depth()
+        depth, ages = victim.age_window(10, 20)
+        self.assertIsNone(victim._age_ensemble)
+        np.testing.assert_array_equal(depth, np.arange(10.5, 20))
+        np.testing.assert_array_equal(ages, goal[(self.testdummy.depth >= 10) & (self.testdummy.depth <= 20)])
+        depth, ages = self.testdummy.age_window(depth_max=3)
+        np.testing.assert_array_equal(ages, goal[:2])
+
+    def test_age_histogram(self):
+        ensemble = self.testdummy.age_ensemble
+        counts, edges = self.testdummy.age_histogram(agebins=30)
+        np.testing.assert_allclose(edges, np.linspace(ensemble.min(), ensemble.max(), 31))
+        self.assertTupleEqual(counts.shape, (len(self.testdummy.depth), 30))
+        for i in (0, 40, len(ensemble) - 1):
+            np.testing.assert_array_equal(counts[i], np.histogram(ensemble[i], bins=edges)[0])
+        self.assertIs(self.testdummy.age_histogram(agebins=30)[0], counts)
+
+        counts, edges = self.testdummy.age_histogram(agebins=10, age_range=(2000, 4000))
+        np.testing.assert_array_equal(counts[50], np.histogram(ensemble[50], bins=edges)[0])
+
+        victim = deepcopy(fullrun_agemodel)
+        victim.keep_ensemble = False
+        victim._set_depth()
+        with mock.patch('snakebacon.agedepth._depth_chunksize', return_value=7):
+            np.testing.assert_array_equal(victim.age_histogram(agebins=30)[0],
+                                          self.testdummy.age_histogram(agebins=30)[0])
+        self.assertIsNone(victim._age_ensemble)
+
+    def test_save_load(self):
+        testproxy = ProxyRecord(pd.DataFrame({'depth': np.linspace(1.5, 99.5, 11), 'a': np.arange(11)}))
+        goal = self.testdummy
+        with tempfile.TemporaryDirectory() as tmpdir:
+            savepath = path.join(tmpdir, 'model')
+            goal.save(savepath, ensemble=True)
+            with self.assertRaises(FileExistsError):
+                goal.save(savepath)
+            victim = AgeDepthModel.load(savepath)
+            self.assertIsInstance(victim.mcmcfit.headage, np.memmap)
+            self.assertEqual(victim.burnin, goal.burnin)
+            self.assertEqual(victim.mcmcsetup.mcmc_kws['k'], 20)
+            np.testing.assert_array_equal(victim.mcmcsetup.coredates.age, goal.mcmcsetup.coredates.age)
+            np.testing.assert_array_equal(victim.mcmcsetup.coredates.labid, goal.mcmcsetup.coredates.labid)
+            np.testing.assert_array_equal(victim.mcmcfit.sediment_rate, goal.mcmcfit.sediment_rate)
+            np.testing.assert_array_equal(victim.depth, goal.depth)
+            np.testing.assert_array_equal(victim.age_ensemble, goal.age_ensemble)
+            np.testing.assert_array_equal(victim.date(testproxy).age, goal.date(testproxy).age)
+            self.assertEqual(victim.thick, goal.thick)
+            self.assertEqual(victim.mcmcfit.state['acc_it'], goal.mcmcfit.state['acc_it'])
+            self.assertEqual(victim.mcmcfit.state['rng'], goal.mcmcfit.state['rng'])
+            del victim
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -4,7 +4,7 @@ import os
 import numpy as np
 
 from snakebacon.mcmcbackends.bacon import fetch_calibcurve
-from snakebacon.mcmcbackends.bacon.utils import d_cal, calibrate_dates
+from snakebacon.mcmcbackends.bacon.utils import d_cal, calibrate_dates, CalibratedDates
 from snakebacon import read_chron
 import snakebacon.records as curve
 
@@ -86,6 +86,38 @@ class TestBaconUtils(unittest.TestCase):
         np.testing.assert_allclose(np.std(p_target[-1][:, 1]),
                                    pgoal_density_std, atol=1e-2)
 
+    def test_calibrate_dates_matches_d_cal(self):
+        chron = read_chron(os.path.join(here, 'MSB2K.csv'))
+        n = len(chron.depth)
+        cc = [fetch_calibcurve('IntCal13') if i % 3 else fetch_calibcurve('Marine13') for i in range(n)]
+        d_r = np.linspace(0, 100, n)
+        d_std = np.linspace(0, 50, n)
+        # Very precise, falls back to interpolated densities.
+        chron.error[0] = 0.01
+        cc[0] = fetch_calibcurve('ConstCal')
+        d_std[0] = 0
+        for normal_distr in [False, True]:
+            d_target, p_target = calibrate_dates(chron, calib_curve=cc, d_r=d_r, d_std=d_std,
+                                                 normal_distr=normal_distr, chunksize=7)
+            for i in range(n):
+                goal = d_cal(cc[i], rcmean=chron.age[i] - d_r[i], w2=chron.error[i] ** 2 + d_std[i] ** 2,
+                             normal_distr=normal_distr)
+                np.testing.assert_array_equal(p_target[i], goal)
+        self.assertEqual(len(p_target[0]), 50)
+
+    def test_calibrate_dates_ragged(self):
+        chron = read_chron(os.path.join(here, 'MSB2K.csv'))
+        cc = [fetch_calibcurve('IntCal13')]
+        d_goal, p_goal = calibrate_dates(chron, calib_curve=cc, d_r=[0], d_std=[0])
+        d_target, p_target = calibrate_dates(chron, calib_curve=cc, d_r=[0], d_std=[0], ragged=True)
+        self.assertIsInstance(p_target, CalibratedDates)
+        self.assertEqual(len(p_target), len(p_goal))
+        self.assertEqual(p_target.indptr[-1], sum(len(p) for p in p_goal))
+        np.testing.assert_array_equal(d_target, d_goal)
+        for victim, goal in zip(p_target, p_goal):
+            np.testing.assert_array_equal(victim, goal)
+        np.testing.assert_array_equal(p_target[-1], p_goal[-1])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,23 +1,21 @@
+import tempfile
 import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
 from os import path
 
 import numpy as np
 
-import snakebacon as snek
+from snakebacon.diagnostics import ess
 from snakebacon.mcmcbackends.bacon import baconwrap
-
-here = path.abspath(path.dirname(__file__))
+from snakebacon.tests.common import baconmcmc_kws, mcmc_kws
 
 
 class TestBaconwrap(unittest.TestCase):
     def test__baconin_str(self):
         # Not very clever test, but okay first pass.
         victim = baconwrap._baconin_str(core_labid=np.array(['a', 'b', 'c']), core_age=np.array([1, 2, 3]),
-                                        core_error=np.array([1, 2, 1]), core_depth=np.array([2, 3, 4]), depth_min=1.5,
-                                        depth_max=99.5, cc=[1], cc1='IntCal13', cc2='Marine13', cc3='SHCal13',
-                                        cc4='ConstCal', d_r=[0], d_std=[0], t_a=[3], t_b=[4], k=20,
-                                        minyr=-1000, maxyr=1e6, th01=4147, th02=4145, acc_mean=20, acc_shape=1.5,
-                                        mem_strength=4, mem_mean=0.7)
+                                        core_error=np.array([1, 2, 1]), core_depth=np.array([2, 3, 4]), **mcmc_kws)
         goal = ['## Ran on Tue 09 May 2017 02:57:05 PM \n\n',
                 'Cal 0 : ConstCal;\n',
                 'Cal 1 : IntCal13, 0;\n',
@@ -34,14 +32,7 @@ class TestBaconwrap(unittest.TestCase):
         self.assertCountEqual(victim[1:], goal[1:])  # Skip first line because datetime won't match.
 
     def test_run_baconmcmc(self):
-        testcore_path = path.join(here, 'MSB2K.csv')
-        c = snek.read_chron(testcore_path)
-        fullrun_victim = baconwrap.run_baconmcmc(core_labid=c.labid, core_age=c.age, core_error=c.error,
-                                                 core_depth=c.depth, depth_min=1.5, depth_max=99.5, cc=[1],
-                                                 cc1='IntCal13', cc2='Marine13', cc3='SHCal13', cc4='ConstCal',
-                                                 d_r=[0], d_std=[0], t_a=[3], t_b=[4], k=20,
-                                                 minyr=-1000, maxyr=1e6, th01=4147, th02=4145,
-                                                 acc_mean=20, acc_shape=1.5, mem_strength=4, mem_mean=0.7)
+        fullrun_victim = baconwrap.run_baconmcmc(**baconmcmc_kws())
 
         niter_goal = 3432
         nsegs_goal = 20
@@ -62,6 +53,133 @@ class TestBaconwrap(unittest.TestCase):
         np.testing.assert_allclose(fullrun_victim['x'][0].mean(), x0_mean_goal, atol=2)
         np.testing.assert_allclose(fullrun_victim['x'][-1].mean(), xneg1_mean_goal, atol=2)
 
+    def test_run_baconmcmc_in_memory(self):
+        kwargs = baconmcmc_kws()
+        victim = baconwrap.run_baconmcmc(in_memory=True, **kwargs)
+        goal = baconwrap.run_baconmcmc(in_memory=False, **kwargs)
+        self.assertCountEqual(goal.keys(), victim.keys())
+        for k in goal.keys():
+            # Text output only keeps ~6 significant digits.
+            np.testing.assert_allclose(victim[k], goal[k], rtol=1e-5)
+
+    def test_run_baconmcmc_threaded(self):
+        # Concurrent runs with explicit seeds should give the same draws as serial runs.
+        kwargs = baconmcmc_kws(ssize=20)
+        seeds = [1, 2, 3, 4]
+
+        def run(seed):
+            return baconwrap.run_baconmcmc(seed=seed, **kwargs)
+
+        serial = [run(s) for s in seeds]
+        with ThreadPoolExecutor(max_workers=len(seeds)) as pool:
+            threaded = list(pool.map(run, seeds))
+
+        for goal, victim in zip(serial, threaded):
+            for key in ['theta', 'x', 'w', 'objective']:
+                np.testing.assert_array_equal(victim[key], goal[key])
+        self.assertFalse(np.array_equal(serial[0]['theta'], serial[1]['theta']))
+
+    def test_run_baconmcmc_incremental(self):
+        # The incremental energy should give exactly the same draws as recomputing the full energy.
+        kwargs = baconmcmc_kws(ssize=20, seed=5)
+        for normal in [False, True]:
+            goal = baconwrap.run_baconmcmc(incremental=False, normal=normal, **kwargs)
+            victim = baconwrap.run_baconmcmc(incremental=True, normal=normal, **kwargs)
+            for key in ['theta', 'x', 'w', 'objective']:
+                np.testing.assert_array_equal(victim[key], goal[key])
+
+    def test_run_baconmcmc_checkpoint(self):
+        kwargs = baconmcmc_kws(seed=7)
+        goal = baconwrap.run_baconmcmc(ssize=20, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ckpath = path.join(tmpdir, 'run.ckpt')
+            write_checkpoint = baconwrap._write_checkpoint
+            calls = []
+
+            def killed_after_two(*args):
+                write_checkpoint(*args)
+                calls.append(args)
+                if len(calls) == 2:
+                    raise KeyboardInterrupt
+
+            with mock.patch.object(baconwrap, '_write_checkpoint', killed_after_two):
+                with self.assertRaises(KeyboardInterrupt):
+                    baconwrap.run_baconmcmc(ssize=20, checkpoint=ckpath, checkpoint_every=50, **kwargs)
+            # Resume from the second checkpoint, with a new '## Ran on' time in the bacon input.
+            later = mock.Mock()
+            later.datetime.today.return_value.strftime.return_value = 'Fri Jan  1 00:00:00 2100'
+            with mock.patch.object(baconwrap, 'datetime', later):
+                victim = baconwrap.run_baconmcmc(ssize=20, checkpoint=ckpath, checkpoint_every=50, **kwargs)
+            with np.load(ckpath) as ck:
+                self.assertIn('2100', str(ck['baconin']))
+            for key in ['theta', 'x', 'w', 'objective']:
+                np.testing.assert_array_equal(victim[key], goal[key])
+
+            with self.assertRaises(ValueError):
+                baconwrap.run_baconmcmc(ssize=30, checkpoint=ckpath, **kwargs)
+
+    def test_run_baconmcmc_state(self):
+        # Continuing from the state of a run gives the same samples as one longer run.
+        kwargs = baconmcmc_kws(seed=7)
+        goal = baconwrap.run_baconmcmc(ssize=30, **kwargs)
+        first, state = baconwrap.run_baconmcmc(ssize=20, return_state=True, **kwargs)
+        second = baconwrap.run_baconmcmc(ssize=10, state=state, **kwargs)
+        np.testing.assert_array_equal(np.concatenate([first['theta'], second['theta']]), goal['theta'])
+        np.testing.assert_array_equal(np.concatenate([first['x'], second['x']], axis=1), goal['x'])
+        np.testing.assert_array_equal(np.concatenate([first['objective'], second['objective']]), goal['objective'])
+
+    def test_run_baconmcmc_target_ess(self):
+        # Runs that stop early give the first samples of the full run.
+        kwargs = baconmcmc_kws(seed=7, ssize=300)
+        goal = baconwrap.run_baconmcmc(**kwargs)
+        n_goal = len(goal['theta'])
+
+        victim = baconwrap.run_baconmcmc(target_ess=5, **kwargs)
+        n = len(victim['theta'])
+        self.assertLess(n, n_goal)
+        np.testing.assert_array_equal(victim['x'], goal['x'][:, :n])
+        self.assertGreaterEqual(ess(victim['theta'][np.newaxis, 201:]), 5)
+
+        victim = baconwrap.run_baconmcmc(max_iterations=20 * 5 * 22 * 100, **kwargs)
+        n = len(victim['theta'])
+        self.assertLess(n, n_goal)
+        np.testing.assert_array_equal(victim['theta'], goal['theta'][:n])
+
+        # max_iterations only caps the run, it does not run past ssize.
+        victim = baconwrap.run_baconmcmc(max_iterations=10 ** 8, **kwargs)
+        np.testing.assert_array_equal(victim['theta'], goal['theta'])
+
+        victim = baconwrap.run_baconmcmc(time_budget=0, checkpoint_every=50, **kwargs)
+        n = len(victim['theta'])
+        self.assertLess(n, n_goal)
+        np.testing.assert_array_equal(victim['theta'], goal['theta'][:n])
+
+    def test_run_baconmcmc_progress(self):
+        kwargs = baconmcmc_kws(seed=7, ssize=20)
+        goal = baconwrap.run_baconmcmc(**kwargs)
+
+        seen = []
+        victim = baconwrap.run_baconmcmc(progress=seen.append, progress_every=10000, checkpoint_every=10, silent=True,
+                                         **kwargs)
+        np.testing.assert_array_equal(victim['x'], goal['x'])
+        n_iter = 20 * 5 * 22 * (20 + 200)
+        iterations = [p.iteration for p in seen]
+        self.assertEqual(iterations[0], 10000)
+        self.assertEqual(iterations[-1], n_iter)
+        self.assertTrue(np.all(np.diff(iterations) > 0))
+        self.assertTrue(all(p.n_iterations == n_iter for p in seen))
+        self.assertTrue(0 < seen[-1].acceptance_rate < 1)
+        self.assertGreater(seen[-1].iterations_per_second, 0)
+        self.assertEqual(seen[-1].eta, 0)
+        self.assertTrue(np.isfinite(seen[-1].energy))
+
+        def stop(p):
+            if p.iteration >= 50000:
+                raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            baconwrap.run_baconmcmc(progress=stop, progress_every=10000, **kwargs)
+
 
 # class TestRead14c(unittest.TestCase):
 #
@@ -0,0 +1,76 @@
+import pathlib
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from os import path
+from unittest import mock
+
+import numpy as np
+
+import snakebacon as snek
+from snakebacon.batch import fit_cost
+from snakebacon.tests.common import mcmc_kws, msb2k_path
+
+
+here = path.abspath(path.dirname(__file__))
+
+
+class TestFitMany(unittest.TestCase):
+    def test_fit_many(self):
+        cores = [msb2k_path, snek.read_chron(msb2k_path), path.join(here, 'notafile.csv'), pathlib.Path(msb2k_path)]
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            victim = sorted(snek.fit_many(cores, dict(mcmc_kws, ssize=20), executor=pool, burnin=0),
+                            key=lambda r: r.index)
+        self.assertEqual([0, 1, 2, 3], [r.index for r in victim])
+        self.assertTrue(victim[0].ok)
+        self.assertTrue(victim[1].ok)
+        self.assertTrue(victim[3].ok)
+        self.assertIsInstance(victim[0].model, snek.AgeDepthModel)
+        self.assertEqual(victim[0].model.age_ensemble.shape, victim[1].model.age_ensemble.shape)
+        self.assertEqual(victim[0].model.age_ensemble.shape, victim[3].model.age_ensemble.shape)
+        self.assertFalse(victim[2].ok)
+        self.assertIsNone(victim[2].model)
+        self.assertIsInstance(victim[2].error, OSError)
+
+    def test_fit_many_processes(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = snek.FitCache(tmpdir)
+            victim = list(snek.fit_many([msb2k_path, msb2k_path], dict(mcmc_kws, ssize=20, seed=3), max_workers=2,
+                                        burnin=0, cache=cache))
+            self.assertTrue(all(r.ok for r in victim))
+            for r in victim:
+                self.assertIsInstance(r.model, snek.AgeDepthModel)
+                self.assertIn('twalk', [s.name for s in r.model.timings])
+            self.assertEqual(len(cache.entries()), 1)
+            np.testing.assert_array_equal(victim[0].model.age_ensemble, victim[1].model.age_ensemble)
+
+    def test_fit_many_close_cancels(self):
+        calls = []
+
+        def slow_fit(*args):
+            calls.append(args)
+            time.sleep(0.05)
+            return 'model'
+
+        cores = [snek.read_chron(msb2k_path)] * 5
+        with ThreadPoolExecutor(max_workers=1) as pool, mock.patch('snakebacon.batch._fit_one', slow_fit):
+            results = snek.fit_many(cores, mcmc_kws, executor=pool)
+            self.assertTrue(next(results).ok)
+            results.close()
+        self.assertLess(len(calls), len(cores))
+
+    def test_fit_many_bad_mcmc_kws(self):
+        with self.assertRaises(ValueError):
+            list(snek.fit_many([msb2k_path], [mcmc_kws, mcmc_kws]))
+
+    def test_fit_cost(self):
+        c = snek.read_chron(msb2k_path)
+        small = fit_cost(c, dict(k=20, ssize=100))
+        self.assertGreater(fit_cost(c, dict(k=40, ssize=100)), small)
+        self.assertGreater(fit_cost(c, dict(k=20, ssize=2000)), small)
+        self.assertGreater(fit_cost(c, dict(k=20)), small)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import time
+import unittest
+from os import path
+from unittest import mock
+
+import numpy as np
+
+import snakebacon.mcmcbackends
+from snakebacon import FitCache, read_chron
+from snakebacon.mcmc import McmcChains, McmcSetup
+from snakebacon.tests.common import mcmc_kws, msb2k_path
+
+
+class TestFitCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = FitCache(path.join(self.tmpdir.name, 'cache'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_put(self):
+        key = FitCache.key(a=np.arange(3), b='x')
+        self.assertEqual(key, FitCache.key(b='x', a=[0, 1, 2]))
+        self.assertNotEqual(key, FitCache.key(a=np.arange(3), b='y'))
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, {'a': np.arange(3)}, {'n': 3})
+        # A second writer with the same key leaves the first entry.
+        self.cache.put(key, {'a': np.arange(4)}, {'n': 4})
+        arrays, meta = self.cache.get(key)
+        np.testing.assert_array_equal(arrays['a'], np.arange(3))
+        self.assertEqual(meta, {'n': 3})
+        self.assertEqual(os.listdir(self.cache.directory), [key])
+
+    def test_evict(self):
+        a = np.zeros(1000)
+        for i in range(3):
+            self.cache.put(str(i), {'a': a}, {})
+            os.utime(path.join(self.cache.directory, str(i)), (i, i))
+        self.cache.get('0')  # Now most recently used.
+        entry_size = self.cache.entries()[0][1]
+        self.cache.max_bytes = 2 * entry_size
+        self.cache.evict()
+        self.assertCountEqual([key for _, _, key in self.cache.entries()], ['0', '2'])
+        self.assertEqual(self.cache.size(), 2 * entry_size)
+        self.cache.clear()
+        self.assertEqual(self.cache.entries(), [])
+
+    def test_stale_tmp(self):
+        stale = path.join(self.cache.directory, '.tmp-stale')
+        os.mkdir(stale)
+        os.utime(stale, (time.time() - 2 * 24 * 3600,) * 2)
+        self.assertEqual(self.cache.entries(), [])
+        self.assertFalse(path.exists(stale))
+
+
+class TestMcmcCache(unittest.TestCase):
+    def test_key(self):
+        chron = read_chron(msb2k_path)
+        goal = McmcSetup(chron, ssize=20, seed=3, **mcmc_kws)._cache_key()
+        victim = McmcSetup(chron, ssize=20, seed=3, progress=print, silent=True, **mcmc_kws)._cache_key()
+        self.assertEqual(victim, goal)
+        self.assertNotEqual(McmcSetup(chron, ssize=20, seed=4, **mcmc_kws)._cache_key(), goal)
+
+    def test_run(self):
+        chron = read_chron(msb2k_path)
+        setup = McmcSetup(chron, ssize=20, seed=3, **mcmc_kws)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            goal = setup.run(cache=tmpdir)
+            self.assertEqual(len(FitCache(tmpdir).entries()), 1)
+            runmcmc = mock.Mock(side_effect=AssertionError('MCMC should not run on a cache hit'))
+            with mock.patch.object(snakebacon.mcmcbackends.Bacon, 'runmcmc', runmcmc):
+                victim = McmcSetup(read_chron(msb2k_path), ssize=20, seed=3, **mcmc_kws).run(cache=FitCache(tmpdir))
+            np.testing.assert_array_equal(victim.sediment_rate, goal.sediment_rate)
+            np.testing.assert_array_equal(victim.objective, goal.objective)
+            # A different seed, or chains, is a miss.
+            setup.run(seed=4, cache=tmpdir)
+            chains = setup.run(n_chains=2, cache=tmpdir)
+            self.assertEqual(len(FitCache(tmpdir).entries()), 3)
+            victim = setup.run(n_chains=2, cache=tmpdir)
+            self.assertIsInstance(victim, McmcChains)
+            np.testing.assert_array_equal(victim.headage, chains.headage)
+            # A cached fit can still be extended.
+            victim.extend(ssize=10)
+            chains.extend(ssize=10)
+            np.testing.assert_array_equal(victim.headage, chains.headage)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from snakebacon import read_14c
+from snakebacon.mcmcbackends.bacon import fetch_calibcurve
+from snakebacon.mcmcbackends.bacon.calibcurves import convert_14c, read_14c_binary
+from snakebacon.mcmcbackends.bacon.Curves import here as curvespath
+
+
+class TestCalibCurves(unittest.TestCase):
+    def test_fetch_calibcurve_cached(self):
+        victim = fetch_calibcurve('IntCal13')
+        self.assertIs(victim, fetch_calibcurve('IntCal13'))
+        self.assertFalse(victim.c14age.flags.writeable)
+        with self.assertRaises(ValueError):
+            victim.c14age[0] = 0
+
+    def test_fetch_calibcurve_pickle(self):
+        victim = fetch_calibcurve('Marine13')
+        self.assertIs(pickle.loads(pickle.dumps(victim)), victim)
+        self.assertLess(len(pickle.dumps(victim)), 1000)
+
+    def test_read_14c_binary(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fl = os.path.join(tmpdir, 'curve', 'shcal13.14C')
+            os.mkdir(os.path.dirname(fl))
+            shutil.copy(os.path.join(curvespath, 'shcal13.14C'), fl)
+            cachedir = os.path.join(tmpdir, 'cache')
+            goal = read_14c(fl)
+            with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cachedir}):
+                victim = read_14c_binary(fl)
+                binpath = convert_14c(fl)
+            self.assertEqual(os.path.join(cachedir, 'snakebacon', 'curves'), os.path.dirname(binpath))
+            self.assertTrue(os.path.exists(binpath))
+            self.assertEqual(['shcal13.14C'], os.listdir(os.path.dirname(fl)))  # Nothing written next to the curve.
+            self.assertFalse(victim.calbp.flags.writeable)  # Read-only memory map.
+            for k in ['calbp', 'c14age', 'error', 'delta14c', 'sigma']:
+                np.testing.assert_array_equal(getattr(victim, k), getattr(goal, k))
+            del victim
+
+    def test_convert_14c_distinct_paths(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = []
+            for d in ['a', 'b']:
+                fl = os.path.join(tmpdir, d, 'shcal13.14C')
+                os.mkdir(os.path.dirname(fl))
+                shutil.copy(os.path.join(curvespath, 'shcal13.14C'), fl)
+                paths.append(convert_14c(fl, cachedir=os.path.join(tmpdir, 'cache')))
+            self.assertNotEqual(paths[0], paths[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
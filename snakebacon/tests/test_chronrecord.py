@@ -1,8 +1,14 @@
+import io
+import os
+import tempfile
 import unittest
 
 import numpy as np
 
-from snakebacon.records import ChronRecord
+from snakebacon.records import ChronRecord, read_chron
+
+
+here = os.path.abspath(os.path.dirname(__file__))
 
 
 class TestChronRecordMethods(unittest.TestCase):
@@ -13,5 +19,33 @@ class TestChronRecordMethods(unittest.TestCase):
         self.assertTrue(testcore == eval(repr(testcore)))
 
 
+class TestReadChron(unittest.TestCase):
+
+    def test_read_chron(self):
+        victim = read_chron(os.path.join(here, 'MSB2K.csv'))
+        self.assertEqual(len(victim.age), 40)
+        self.assertEqual(victim.labid[0], 'GrA-19478')
+        self.assertEqual(victim.age.dtype, np.float64)
+        np.testing.assert_array_equal(victim.age[:3], [4128, 4106, 4046])
+        np.testing.assert_array_equal(victim.depth[:3], [1.5, 4.5, 8.5])
+
+    def test_read_chron_whitespace(self):
+        victim = read_chron(io.StringIO('labID , age,error ,depth\n a-1 ,\t10 , 2,1.5\nb ,20,3 , 2.5 \n'))
+        np.testing.assert_array_equal(victim.labid, ['a-1', 'b'])
+        np.testing.assert_array_equal(victim.age, [10, 20])
+        np.testing.assert_array_equal(victim.error, [2, 3])
+        np.testing.assert_array_equal(victim.depth, [1.5, 2.5])
+
+    def test_read_chron_npz(self):
+        goal = read_chron(os.path.join(here, 'MSB2K.csv'))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fl = os.path.join(tmpdir, 'core.npz')
+            np.savez(fl, labID=goal.labid.astype(str), age=goal.age, error=goal.error, depth=goal.depth)
+            victim = read_chron(fl)
+        np.testing.assert_array_equal(victim.labid, goal.labid)
+        np.testing.assert_array_equal(victim.age, goal.age)
+        np.testing.assert_array_equal(victim.depth, goal.depth)
+
+
 if __name__ == '__main__':
     unittest.main()
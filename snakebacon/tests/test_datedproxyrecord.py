@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 
 import numpy as np
@@ -28,5 +30,51 @@ class TestDatedProxyRecord(unittest.TestCase):
         assert_frame_equal(goal_ensemble.sort_index(axis=1), self.testdummy_ensemble.to_pandas().sort_index(axis=1))
 
 
+    def test_to_pandas_quantiles(self):
+        victim = DatedProxyRecord(pd.DataFrame({'depth': [1, 2], 'a': [2, 3]}),
+                                  age=[[9.0, 10.0], [10.0, 11.0]], quantiles=[2.5, 97.5])
+        goal = pd.DataFrame({'a': [2, 3] * 2, 'depth': [1, 2] * 2,
+                             'quantile': np.repeat([2.5, 97.5], 2),
+                             'age': [9.0, 10.0, 10.0, 11.0]})
+        self.assertEqual(2, victim.n_members())
+        assert_frame_equal(goal.sort_index(axis=1), victim.to_pandas().sort_index(axis=1))
+
+
+    def test_iter_pandas(self):
+        victim = DatedProxyRecord(pd.DataFrame({'depth': np.arange(5.0), 'a': np.arange(5)}),
+                                  age=np.arange(15.0).reshape(5, 3))
+        chunks = list(victim.iter_pandas(chunksize=2))
+        self.assertEqual(3, len(chunks))
+        goal = victim.to_pandas()
+        key = ['mciter', 'depth']
+        assert_frame_equal(goal.sort_values(key).reset_index(drop=True),
+                           pd.concat(chunks).sort_values(key).reset_index(drop=True))
+        assert_frame_equal(self.testdummy_median.to_pandas(), next(self.testdummy_median.iter_pandas()))
+
+    def test_to_csv(self):
+        goal = self.testdummy_ensemble.to_pandas()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fl = os.path.join(tmpdir, 'dated.csv')
+            self.testdummy_ensemble.to_csv(fl, chunksize=1)
+            victim = pd.read_csv(fl)
+        key = ['mciter', 'depth']
+        assert_frame_equal(goal.sort_values(key).reset_index(drop=True),
+                           victim.sort_values(key).reset_index(drop=True))
+
+    def test_to_parquet(self):
+        try:
+            import pyarrow
+        except ImportError:
+            self.skipTest('pyarrow not installed')
+        goal = self.testdummy_ensemble.to_pandas()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fl = os.path.join(tmpdir, 'dated.parquet')
+            self.testdummy_ensemble.to_parquet(fl, chunksize=1)
+            victim = pd.read_parquet(fl)
+        key = ['mciter', 'depth']
+        assert_frame_equal(goal.sort_values(key).reset_index(drop=True),
+                           victim.sort_values(key).reset_index(drop=True))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+
+import numpy as np
+
+from snakebacon.diagnostics import ess, rhat
+
+
+class TestDiagnostics(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(42)
+        self.iid = rng.normal(size=(4, 1000))
+        ar = np.zeros((4, 1000))
+        for i in range(1, 1000):
+            ar[:, i] = 0.9 * ar[:, i - 1] + rng.normal(size=4)
+        self.ar = ar
+
+    def test_rhat(self):
+        np.testing.assert_allclose(rhat(self.iid), 1, atol=0.01)
+        shifted = self.iid + np.arange(4)[:, np.newaxis]
+        self.assertGreater(rhat(shifted), 1.1)
+
+    def test_rhat_trailing(self):
+        victim = rhat(np.stack([self.iid, self.iid + np.arange(4)[:, np.newaxis]], axis=-1))
+        self.assertEqual(victim.shape, (2,))
+        self.assertLess(victim[0], victim[1])
+
+    def test_ess(self):
+        np.testing.assert_allclose(ess(self.iid), 4000, rtol=0.15)
+        # AR(1) with phi=0.9 has an ESS about (1 - 0.9) / (1 + 0.9) of the draws.
+        np.testing.assert_allclose(ess(self.ar), 4000 * 0.1 / 1.9, rtol=0.3)
+
+    def test_ess_trailing(self):
+        victim = ess(np.stack([self.iid, self.ar], axis=-1))
+        self.assertEqual(victim.shape, (2,))
+        np.testing.assert_allclose(victim, [ess(self.iid), ess(self.ar)])
+
+
+if __name__ == '__main__':
+    unittest.main()
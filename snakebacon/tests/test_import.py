@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import snakebacon
+
+
+# Imported only when plotting, fitting or using scipy-backed functions.
+deferred = ('matplotlib', 'scipy', 'snakebacon.mcmcbackends.bacon.baconwrap')
+
+
+def imported_modules(statement):
+    """Get set of module names in sys.modules after running statement in a fresh interpreter"""
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(snakebacon.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + [p for p in env.get('PYTHONPATH', '').split(os.pathsep) if p])
+    code = statement + '; import sys; print("\\n".join(sys.modules))'
+    out = subprocess.check_output([sys.executable, '-c', code], env=env, universal_newlines=True)
+    return set(out.split())
+
+
+class TestImport(unittest.TestCase):
+    def test_import_snakebacon(self):
+        victim = imported_modules('import snakebacon')
+        self.assertIn('snakebacon', victim)
+        for name in deferred:
+            self.assertNotIn(name, victim)
+
+    def test_import_on_use(self):
+        victim = imported_modules('from snakebacon.mcmcbackends.bacon.baconwrap import run_baconmcmc')
+        self.assertIn('snakebacon.mcmcbackends.bacon.baconwrap', victim)
+        self.assertNotIn('matplotlib', victim)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,14 @@
 import unittest
 from copy import deepcopy
-from os import path
 
 import numpy as np
 
 from snakebacon import read_chron
-from snakebacon.mcmc import McmcResults, McmcSetup
+from snakebacon.mcmc import McmcChains, McmcResults, McmcSetup, _dump_results, _load_results
+from snakebacon.tests.common import mcmc_kws, msb2k_path
 
 
-here = path.abspath(path.dirname(__file__))
-
-
-mcmc_kws = dict(depth_min=1.5, depth_max=99.5, cc=[1],
-                   cc1='IntCal13', cc2='Marine13', cc3='SHCal13', cc4='ConstCal',
-                   d_r=[0], d_std=[0], t_a=[3], t_b=[4], k=20,
-                   minyr=-1000, maxyr=1e6, th01=4147, th02=4145,
-                   acc_mean=20, acc_shape=1.5, mem_strength=4, mem_mean=0.7)
-fullrun_setup = McmcSetup(read_chron(path.join(here, 'MSB2K.csv')), **mcmc_kws)
+fullrun_setup = McmcSetup(read_chron(msb2k_path), **mcmc_kws)
 fullrun_victim = McmcResults(fullrun_setup)
 
 
@@ -59,5 +51,117 @@ class TestMcmcResults(unittest.TestCase):
         np.testing.assert_allclose(len(self.testdummy.sediment_rate[0]), n_goal, atol=50)
 
 
+class TestMcmcChains(unittest.TestCase):
+    def setUp(self):
+        setup = McmcSetup(read_chron(msb2k_path), ssize=20, **mcmc_kws)
+        self.testdummy = setup.run(n_chains=3, seed=10)
+
+    def test_init(self):
+        self.assertIsInstance(self.testdummy, McmcChains)
+        self.assertEqual(self.testdummy.n_chains(), 3)
+        self.assertEqual(self.testdummy.seeds, [10, 11, 12])
+        n = min(c.n_members() for c in self.testdummy.chains)
+        self.assertEqual(self.testdummy.n_members(), 3 * n)
+        self.assertEqual(self.testdummy.sediment_rate.shape, (20, 3 * n))
+        np.testing.assert_array_equal(self.testdummy.headage[n:2 * n], self.testdummy.chains[1].headage[:n])
+        self.assertFalse(np.array_equal(self.testdummy.chains[0].headage, self.testdummy.chains[1].headage))
+
+    def test_burnin(self):
+        n = min(c.n_members() for c in self.testdummy.chains)
+        self.testdummy.burnin(n=10)
+        self.assertEqual(self.testdummy.n_members(), 3 * (n - 10))
+        self.assertEqual(self.testdummy.sediment_rate.shape, (20, 3 * (n - 10)))
+
+    def test_diagnostics(self):
+        rhat = self.testdummy.rhat()
+        ess = self.testdummy.ess()
+        self.assertCountEqual(rhat.keys(), ['headage', 'sediment_rate', 'sediment_memory'])
+        self.assertCountEqual(ess.keys(), ['headage', 'sediment_rate', 'sediment_memory'])
+        self.assertEqual(rhat['sediment_rate'].shape, (20,))
+        self.assertEqual(ess['sediment_rate'].shape, (20,))
+        self.assertTrue(np.isfinite(rhat['headage']))
+        self.assertGreater(ess['headage'], 0)
+
+    def test_save_load(self):
+        arrays, meta = _dump_results(self.testdummy)
+        victim = _load_results(self.testdummy.chains[0]._setup, arrays, meta)
+        self.assertIsInstance(victim, McmcChains)
+        self.assertEqual(victim.seeds, self.testdummy.seeds)
+        np.testing.assert_array_equal(victim.sediment_rate, self.testdummy.sediment_rate)
+        np.testing.assert_array_equal(victim.chains[2].objective, self.testdummy.chains[2].objective)
+        victim.extend(ssize=10)
+        self.testdummy.extend(ssize=10)
+        np.testing.assert_array_equal(victim.headage, self.testdummy.headage)
+
+    def test_extend(self):
+        n = self.testdummy.chains[0].n_members()
+        self.testdummy.extend(ssize=10)
+        self.assertGreater(self.testdummy.chains[0].n_members(), n)
+        m = min(c.n_members() for c in self.testdummy.chains)
+        self.assertEqual(self.testdummy.n_members(), 3 * m)
+
+
+class CountingBackend:
+    """MCMC backend whose members count up from 0, with ssize + seed members in each run"""
+    def runmcmc(*args, **kwargs):
+        state = kwargs.get('state')
+        start = 0 if state is None else state['acc_it']
+        n = int(kwargs['ssize']) + int(kwargs['seed'])
+        theta = np.arange(start, start + n, dtype='float64')
+        return {'theta': theta, 'x': np.tile(theta, (int(kwargs['k']), 1)), 'w': theta, 'objective': theta,
+                'state': {'x': theta[-1:], 'xp': theta[-1:], 'acc_it': start + n, 'rng': b''}}
+
+
+class TestMcmcChainsUneven(unittest.TestCase):
+    def setUp(self):
+        setup = McmcSetup(read_chron(msb2k_path), mcmcbackend=CountingBackend, ssize=10,
+                          **mcmc_kws)
+        self.testdummy = setup.run(n_chains=3, seed=0)
+
+    def test_init(self):
+        self.assertEqual([c.n_members() for c in self.testdummy.chains], [10, 11, 12])
+        self.assertEqual(self.testdummy.n_members(), 3 * 10)
+        np.testing.assert_array_equal(self.testdummy.headage, np.tile(np.arange(10), 3))
+        self.assertEqual(self.testdummy.rhat()['sediment_rate'].shape, (20,))
+
+    def test_extend(self):
+        # Each chain carries on from the end of its full run, with no gap.
+        self.testdummy.extend(ssize=5)
+        for i, c in enumerate(self.testdummy.chains):
+            np.testing.assert_array_equal(c.headage, np.arange(10 + i + 5 + i))
+            np.testing.assert_array_equal(c.sediment_rate[-1], np.arange(10 + i + 5 + i))
+        self.assertEqual(self.testdummy.n_members(), 3 * 15)
+        np.testing.assert_array_equal(self.testdummy.headage[15:30], np.arange(15))
+
+    def test_save_load(self):
+        arrays, meta = _dump_results(self.testdummy)
+        victim = _load_results(self.testdummy.chains[0]._setup, arrays, meta)
+        self.assertEqual([c.n_members() for c in victim.chains], [10, 11, 12])
+        np.testing.assert_array_equal(victim.chains[2].headage, np.arange(12))
+        np.testing.assert_array_equal(victim.headage, self.testdummy.headage)
+
+
+class TestMcmcExtend(unittest.TestCase):
+    def test_extend(self):
+        # Extending a run gives the same members as a single longer run, with no new burn-in.
+        chron = read_chron(msb2k_path)
+        goal = McmcSetup(chron, ssize=30, seed=3, **mcmc_kws).run()
+        victim = McmcSetup(chron, ssize=20, seed=3, **mcmc_kws).run()
+        victim.extend(ssize=10)
+        np.testing.assert_array_equal(victim.headage, goal.headage)
+        np.testing.assert_array_equal(victim.sediment_rate, goal.sediment_rate)
+        np.testing.assert_array_equal(victim.sediment_memory, goal.sediment_memory)
+        np.testing.assert_array_equal(victim.objective, goal.objective)
+
+    def test_target_ess(self):
+        chron = read_chron(msb2k_path)
+        setup = McmcSetup(chron, ssize=300, seed=3, **mcmc_kws)
+        goal = setup.run()
+        victim = setup.run(target_ess=5)
+        n = victim.n_members()
+        self.assertLess(n, goal.n_members())
+        np.testing.assert_array_equal(victim.headage, goal.headage[:n])
+
+
 if __name__ == '__main__':
     unittest.main()
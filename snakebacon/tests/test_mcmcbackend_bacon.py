@@ -1,23 +1,16 @@
 import unittest
-import os
 
 import numpy as np
 
 from snakebacon.mcmcbackends import Bacon
 from snakebacon import read_chron
-
-
-here = os.path.abspath(os.path.dirname(__file__))
+from snakebacon.tests.common import mcmc_kws, msb2k_path
 
 
 class TestBaconMethods(unittest.TestCase):
 
     def setUp(self):
-        self.mcmc_kws = dict(depth_min=1.5, depth_max=99.5, cc=[1],
-                                cc1='IntCal13', cc2='Marine13', cc3='SHCal13', cc4='ConstCal',
-                                d_r=[0], d_std=[0], t_a=[3], t_b=[4], k=20,
-                                minyr=-1000, maxyr=1e6, th01=4147, th02=4145,
-                                acc_mean=20, acc_shape=1.5, mem_strength=4, mem_mean=0.7)
+        self.mcmc_kws = dict(mcmc_kws)
 
     def test_prior_dates(self):
         pgoal_age_mean = 6726.8
@@ -30,7 +23,7 @@ class TestBaconMethods(unittest.TestCase):
         dgoal_n = 40
         pgoal_n = dgoal_n
 
-        chron = read_chron(os.path.join(here, 'MSB2K.csv'))
+        chron = read_chron(msb2k_path)
         d_target, p_target = Bacon.prior_dates(chron, **self.mcmc_kws)
         np.testing.assert_allclose(d_target[-3:], dgoal)
         np.testing.assert_equal(len(d_target), dgoal_n)
@@ -0,0 +1,96 @@
+import unittest
+
+import numpy as np
+
+from snakebacon import read_chron
+from snakebacon.mcmc import McmcSetup
+from snakebacon.mcmcbackends import Bacon, BaconEnsemble
+from snakebacon.mcmcbackends.ensemble import BaconEnergy, run_ensemblemcmc
+from snakebacon.tests.common import mcmc_kws, msb2k_path
+
+
+class TestBaconEnergy(unittest.TestCase):
+    def setUp(self):
+        self.chron = read_chron(msb2k_path)
+
+    def test_call(self):
+        # Same energy as the twalk objective.
+        c = self.chron
+        for normal in (False, True):
+            twalk = Bacon.runmcmc(core_labid=c.labid, core_age=c.age, core_error=c.error, core_depth=c.depth,
+                                  ssize=100, seed=1, normal=normal, silent=True, **mcmc_kws)
+            x = np.column_stack([twalk['theta'], twalk['x'].T, twalk['w']])
+            victim = BaconEnergy(c.labid, c.age, c.error, c.depth, normal=normal, **mcmc_kws)
+            np.testing.assert_allclose(victim(x), twalk['objective'], rtol=1e-8)
+            np.testing.assert_allclose(victim(x[0]), twalk['objective'][0], rtol=1e-8)
+
+    def test_call_support(self):
+        c = self.chron
+        victim = BaconEnergy(c.labid, c.age, c.error, c.depth, **mcmc_kws)
+        x = victim.sample_prior(4, 4146, 60, np.random.RandomState(0))
+        x[0, -1] = 1  # w
+        x[1, 1] = 0.5 * x[1, -1] * x[1, 2]  # Negative innovation.
+        x[2, 0] = -2000  # Before minyr.
+        victim = victim(x)
+        np.testing.assert_equal(victim[:3], np.inf)
+        self.assertTrue(np.isfinite(victim[3]))
+
+    def test_ages(self):
+        c = self.chron
+        victim = BaconEnergy(c.labid, c.age, c.error, c.depth, **mcmc_kws)
+        x = np.concatenate([[4000], np.arange(1, 21), [0.5]])
+        ages = victim.ages(x)
+        self.assertEqual(ages.shape, (1, 21))
+        np.testing.assert_allclose(ages[0, [0, 1, -1]], [4000, 4000 + 4.9, 4000 + 4.9 * 210])
+
+    def test_postbomb(self):
+        c = self.chron
+        with self.assertRaises(ValueError):
+            BaconEnergy(c.labid, c.age, c.error, c.depth, postbomb=1, **mcmc_kws)
+
+
+class TestRunEnsembleMcmc(unittest.TestCase):
+    def setUp(self):
+        self.chron = read_chron(msb2k_path)
+
+    def test_seed(self):
+        c = self.chron
+        kws = dict(ssize=100, seed=2, warmup=20, **mcmc_kws)
+        victim = run_ensemblemcmc(c.labid, c.age, c.error, c.depth, **kws)
+        goal = run_ensemblemcmc(c.labid, c.age, c.error, c.depth, **kws)
+        self.assertEqual(victim['x'].shape, (20, 352))
+        for k in ('theta', 'x', 'w', 'objective'):
+            np.testing.assert_equal(victim[k], goal[k])
+        energy = BaconEnergy(c.labid, c.age, c.error, c.depth, **mcmc_kws)
+        x = np.column_stack([victim['theta'], victim['x'].T, victim['w']])
+        np.testing.assert_allclose(energy(x), victim['objective'])
+
+    def test_max_iterations(self):
+        c = self.chron
+        victim = run_ensemblemcmc(c.labid, c.age, c.error, c.depth, ssize=100, warmup=0, thin=1,
+                                  max_iterations=88 * 3, **mcmc_kws)
+        self.assertEqual(len(victim['theta']), 88 * 3)
+
+    def test_unsupported(self):
+        c = self.chron
+        with self.assertRaises(ValueError):
+            run_ensemblemcmc(c.labid, c.age, c.error, c.depth, checkpoint='victim.chk', **mcmc_kws)
+        with self.assertRaises(ValueError):
+            run_ensemblemcmc(c.labid, c.age, c.error, c.depth, n_walkers=10, **mcmc_kws)
+
+
+class TestBaconEnsemble(unittest.TestCase):
+    def test_run(self):
+        setup = McmcSetup(read_chron(msb2k_path), mcmcbackend=BaconEnsemble, **mcmc_kws)
+        victim = setup.run(seed=3)
+        victim.burnin(200)
+        self.assertIsNone(victim.state)
+        self.assertEqual(victim.sediment_rate.shape, (20, 2000))
+        # Posterior means of the twalk, with about twice their posterior sd.
+        np.testing.assert_allclose(np.mean(victim.headage), 4566, atol=140)
+        np.testing.assert_allclose(np.mean(victim.sediment_memory), 0.064, atol=0.1)
+        np.testing.assert_allclose(np.mean(victim.objective), 218, atol=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
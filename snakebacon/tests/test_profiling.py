@@ -0,0 +1,60 @@
+import threading
+import unittest
+
+import numpy as np
+
+from snakebacon import profiling, read_chron
+from snakebacon.agedepth import AgeDepthModel
+from snakebacon.tests.common import mcmc_kws, msb2k_path
+
+
+class TestProfiling(unittest.TestCase):
+    def test_record(self):
+        seen = []
+        profiling.add_callback(seen.append)
+        try:
+            with profiling.record() as outer:
+                with profiling.stage('a'):
+                    pass
+                with profiling.record(profile=True) as inner:
+                    with profiling.stage('b'):
+                        sum(range(1000))
+            with profiling.stage('c'):
+                pass
+        finally:
+            profiling.remove_callback(seen.append)
+        self.assertEqual([s.name for s in outer], ['a', 'b'])
+        self.assertEqual([s.name for s in inner], ['b'])
+        self.assertEqual([s.name for s in seen], ['a', 'b', 'c'])
+        self.assertIsNone(outer.profile)
+        self.assertIsNotNone(inner.profile)
+        self.assertGreaterEqual(outer.wall('b'), 0)
+        self.assertEqual(list(outer.to_pandas().stage), ['a', 'b'])
+
+    def test_record_thread(self):
+        def other():
+            with profiling.stage('other'):
+                pass
+
+        with profiling.record() as outer:
+            worker = threading.Thread(target=other)
+            worker.start()
+            worker.join()
+            with profiling.stage('mine'):
+                pass
+        self.assertEqual([s.name for s in outer], ['mine'])
+
+    def test_fit(self):
+        victim = AgeDepthModel(read_chron(msb2k_path), mcmc_kws=dict(mcmc_kws, ssize=20, seed=3))
+        victim.age_median()
+        names = [s.name for s in victim.timings]
+        for name in ['write_baconin', 'twalk', 'split_baconout', 'mcmc', 'burnin', 'age_ensemble']:
+            self.assertIn(name, names)
+        self.assertEqual(names[-1], 'age_ensemble')
+        self.assertGreater(victim.timings.wall('mcmc'), victim.timings.wall('twalk'))
+        self.assertIn('twalk', [s.name for s in victim.mcmcfit.timings])
+        self.assertTrue(np.isfinite(victim.timings.cpu('twalk')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import io
+import os
+import pathlib
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from pandas.util.testing import assert_frame_equal
+
+from snakebacon import ProxyRecord, read_proxy
+
+
+goal = pd.DataFrame({'depth': np.linspace(1.5, 99.5, 25), 'a': np.arange(25, dtype='float64'),
+                     'b': np.arange(25) % 3})
+
+
+class TestReadProxy(unittest.TestCase):
+
+    def test_read_proxy_csv(self):
+        fl = io.StringIO('depth , a,\tb\n' + ''.join(' {0} ,{1},  {2} \n'.format(*row)
+                                                     for row in goal.itertuples(index=False)))
+        victim = read_proxy(fl)
+        self.assertIsInstance(victim, ProxyRecord)
+        assert_frame_equal(victim.data, goal)
+
+    def test_read_proxy_formats(self):
+        writers = {'npz': lambda fl: np.savez(fl, **{c: goal[c].values for c in goal.columns})}
+        try:
+            import pyarrow
+        except ImportError:
+            pass
+        else:
+            writers['parquet'] = lambda fl: goal.to_parquet(fl)
+            writers['feather'] = lambda fl: goal.to_feather(fl)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for ext, write in writers.items():
+                fl = os.path.join(tmpdir, 'proxy.' + ext)
+                write(fl)
+                assert_frame_equal(read_proxy(fl).data, goal)
+                assert_frame_equal(read_proxy(pathlib.Path(fl)).data, goal)
+                with open(fl, 'rb') as fileobj:
+                    assert_frame_equal(read_proxy(fileobj).data, goal)
+                victim = list(read_proxy(fl, chunksize=10))
+                self.assertListEqual([len(p.data) for p in victim], [10, 10, 5])
+                assert_frame_equal(pd.concat([p.data for p in victim], ignore_index=True), goal)
+
+    def test_read_proxy_chunks(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fl = os.path.join(tmpdir, 'proxy.csv')
+            goal.to_csv(fl, index=False)
+            victim = read_proxy(fl, chunksize=10)
+            self.assertNotIsInstance(victim, ProxyRecord)
+            victim = list(victim)
+            self.assertListEqual([len(p.data) for p in victim], [10, 10, 5])
+            assert_frame_equal(pd.concat([p.data for p in victim], ignore_index=True), goal)
+
+
+if __name__ == '__main__':
+    unittest.main()
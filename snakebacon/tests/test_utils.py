@@ -1,8 +1,10 @@
 import unittest
 
 import numpy as np
+import scipy.stats
 
 from snakebacon import suggest_accumulation_rate
+from snakebacon.utils import binned_kde
 from snakebacon.records import ChronRecord
 
 
@@ -14,6 +16,16 @@ class TestUtils(unittest.TestCase):
         test_victim = suggest_accumulation_rate(testcore)
         self.assertEqual(test_victim, goal)
 
+    def test_binned_kde(self):
+        data = np.random.RandomState(1).gamma(1.5, 10, size=(20, 500))
+        x = np.linspace(-10, 200, 100)
+        goal = scipy.stats.gaussian_kde(data.flat, bw_method=0.25)(x)
+        victim = binned_kde(data, x, bw_factor=0.25)
+        self.assertTupleEqual(victim.shape, x.shape)
+        np.testing.assert_allclose(victim, goal, rtol=0, atol=1e-4 * goal.max())
+        with self.assertRaises(ValueError):
+            binned_kde(np.ones(10), x)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,10 +1,10 @@
 import numpy as np
-import scipy.stats as stats
 
 
 def suggest_accumulation_rate(chron):
     """From core age-depth data, suggest mean accumulation rate (cm/y)
     """
+    import scipy.stats as stats
     # Follow's Bacon's method @ Bacon.R ln 30 - 44
     # Suggested round vals.
     sugg = np.tile([1, 2, 5], (4, 1)) * np.reshape(np.repeat([0.1, 1.0, 10, 100], 3), (4, 3))
@@ -14,3 +14,53 @@ def suggest_accumulation_rate(chron):
     sugg = sugg.flat[ballpacc.argmin()]  # Suggest rounded acc.rate with lowest abs diff.
     return sugg
 
+
+
+def binned_kde(data, points, bw_factor=0.25, gridsize=2 ** 12):
+    """Gaussian kernel density estimate of 1d data, from linear binning and an FFT convolution
+
+    Parameters
+    ----------
+    data : array-like
+        Data to estimate the density of. Flattened.
+    points : array-like
+        Points to evaluate the density at.
+    bw_factor : float, optional
+        Kernel bandwidth as a factor of the standard deviation of data. Same as the covariance factor of
+        `scipy.stats.gaussian_kde()`.
+    gridsize : int, optional
+        Number of grid points data is binned onto, spanning the data and five bandwidths beyond on each side.
+
+    Returns
+    -------
+    Array of density at points, with the shape of points. Zero more than five bandwidths outside the data.
+
+    Notes
+    -----
+    Each datum is split between its two neighbouring grid points, and the binned counts are convolved with the
+    kernel on the grid, so the cost is O(N + G log G) for N data and G grid points, rather than O(N M) for M points.
+    The estimate matches the exact one to within the grid spacing over the bandwidth.
+    """
+    data = np.asarray(data, dtype=float).ravel()
+    points = np.asarray(points, dtype=float)
+    h = bw_factor * np.std(data, ddof=1)
+    if not h > 0:
+        raise ValueError('data needs a positive, finite standard deviation')
+    lo = data.min() - 5 * h
+    grid = np.linspace(lo, data.max() + 5 * h, gridsize)
+    delta = grid[1] - grid[0]
+
+    pos = (data - lo) / delta
+    i = np.minimum(pos.astype(np.intp), gridsize - 2)
+    w = pos - i
+    counts = np.bincount(i, weights=1 - w, minlength=gridsize)
+    counts += np.bincount(i + 1, weights=w, minlength=gridsize)
+
+    # The grid spans at least ten bandwidths, so the kernel fits within it.
+    half = int(np.ceil(5 * h / delta))
+    kernel = np.exp(-0.5 * (np.arange(-half, half + 1) * delta / h) ** 2) / (h * np.sqrt(2 * np.pi))
+    # Zero padded to a power of two, so the circular convolution is linear.
+    nfft = 2 ** int(np.ceil(np.log2(gridsize + 2 * half)))
+    dens = np.fft.irfft(np.fft.rfft(counts, nfft) * np.fft.rfft(kernel, nfft), nfft)[half:half + gridsize]
+    dens /= len(data)
+    return np.interp(points, grid, dens, left=0, right=0)